@@ -0,0 +1,393 @@
+# [file name]: almacen_resultados.py
+# ================================================
+# 🗄️ ALMACÉN DE RESULTADOS (SQLite)
+# Guarda cada hoja calificada (puntaje, alumno, versión)
+# y cada pregunta (opción elegida, confianza, acierto)
+# en una base local. Los lotes se escriben en bloques,
+# una transacción por bloque, y las consultas por examen,
+# grupo, alumno, fecha o lote usan índices en lugar de
+# volver a leer los reportes de texto.
+# ================================================
+
+import os
+import time
+import sqlite3
+import argparse
+
+# Junto al programa, no en la carpeta desde la que se lanza
+RUTA_ALMACEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados_calificacion.db")
+
+TAMAÑO_BLOQUE = 500  # Hojas por transacción al registrar un lote
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lotes (
+    id INTEGER PRIMARY KEY,
+    examen TEXT NOT NULL,
+    hash_clave TEXT,
+    origen TEXT,
+    fecha TEXT NOT NULL,
+    hojas INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_lotes_examen ON lotes (examen, fecha);
+CREATE TABLE IF NOT EXISTS hojas (
+    id INTEGER PRIMARY KEY,
+    lote_id INTEGER NOT NULL REFERENCES lotes (id) ON DELETE CASCADE,
+    examen TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    matricula TEXT,
+    nombre TEXT,
+    grupo TEXT,
+    variante INTEGER,
+    puntaje REAL,
+    correctas INTEGER,
+    preguntas INTEGER,
+    error TEXT,
+    fecha TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hojas_examen ON hojas (examen, grupo, puntaje);
+CREATE INDEX IF NOT EXISTS idx_hojas_matricula ON hojas (matricula, examen);
+CREATE INDEX IF NOT EXISTS idx_hojas_fecha ON hojas (fecha);
+CREATE INDEX IF NOT EXISTS idx_hojas_lote ON hojas (lote_id);
+CREATE TABLE IF NOT EXISTS respuestas (
+    hoja_id INTEGER NOT NULL REFERENCES hojas (id) ON DELETE CASCADE,
+    pregunta INTEGER NOT NULL,
+    seleccionada INTEGER,
+    correcta INTEGER,
+    es_correcta INTEGER NOT NULL,
+    confianza REAL,
+    PRIMARY KEY (hoja_id, pregunta)
+) WITHOUT ROWID;
+"""
+
+COLUMNAS_HOJA = ("id", "lote_id", "examen", "ruta", "matricula", "nombre", "grupo", "variante",
+                 "puntaje", "correctas", "preguntas", "error", "fecha")
+
+
+def fecha_actual():
+    """Fecha local en el formato guardado (se ordena igual como texto que como fecha)"""
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RegistroLote:
+    """
+    Acumula los resultados de un lote y los escribe en bloques de `tamaño_bloque`
+    hojas, cada bloque en una sola transacción. Se obtiene con
+    AlmacenResultados.iniciar_lote; cerrar() escribe lo que quede pendiente
+    """
+
+    def __init__(self, almacen, id_lote, examen, tamaño_bloque=TAMAÑO_BLOQUE):
+        self.almacen = almacen
+        self.id_lote = id_lote
+        self.examen = examen
+        self.tamaño_bloque = tamaño_bloque
+        self.pendientes = []
+        self.guardadas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def agregar(self, resultado):
+        """
+        Agrega el resultado de una hoja, con el formato de calificar_lote:
+        {'ruta', 'puntaje', 'resultados', 'matricula', 'alumno', 'variante', 'error'}
+        """
+        error = resultado.get('error')
+        alumno = resultado.get('alumno') or {}
+        resultados = [] if error else resultado.get('resultados') or []
+        variante = resultado.get('variante')
+
+        # Los valores pueden venir como enteros de NumPy: SQLite solo acepta tipos de Python
+        hoja = (
+            resultado['ruta'],
+            alumno.get('matricula', resultado.get('matricula')),
+            alumno.get('nombre'),
+            alumno.get('grupo') or None,
+            None if variante is None else int(variante),
+            None if error else float(resultado['puntaje']),
+            None if error else sum(1 for r in resultados if r['es_correcta']),
+            None if error else len(resultados),
+            error or None,
+            fecha_actual()
+        )
+        respuestas = [(int(r['pregunta']),
+                       None if r['seleccionada'] is None else int(r['seleccionada']),
+                       int(r['correcta']),
+                       int(bool(r['es_correcta'])),
+                       None if r.get('confianza') is None else float(r['confianza']))
+                      for r in resultados]
+        self.pendientes.append((hoja, respuestas))
+
+        if len(self.pendientes) >= self.tamaño_bloque:
+            self.guardar()
+
+    def guardar(self):
+        """Escribe las hojas pendientes en una transacción"""
+        if self.pendientes:
+            self.almacen.guardar_hojas(self.id_lote, self.examen, self.pendientes)
+            self.guardadas += len(self.pendientes)
+            self.pendientes = []
+
+    def cerrar(self):
+        self.guardar()
+
+
+class AlmacenResultados:
+    """
+    Resultados de calificación en un archivo SQLite: lotes, hojas y respuestas
+    por pregunta. Se usa con `with` o llamando a cerrar(); la conexión pertenece
+    al hilo que la abre
+    """
+
+    VERSION = 1  # PRAGMA user_version del esquema
+
+    def __init__(self, ruta=RUTA_ALMACEN):
+        self.ruta = ruta
+        # Transacciones explícitas: cada bloque de hojas se escribe de una vez
+        self.conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        self.conexion.execute("PRAGMA foreign_keys = ON")
+        self._crear_esquema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def _crear_esquema(self):
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] == self.VERSION:
+            return
+
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            for sentencia in ESQUEMA.split(";"):
+                if sentencia.strip():
+                    self.conexion.execute(sentencia)
+            self.conexion.execute(f"PRAGMA user_version = {self.VERSION}")
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------
+    # Escritura
+    # ------------------------------------------------
+    def iniciar_lote(self, examen, hash_clave=None, origen=None, tamaño_bloque=TAMAÑO_BLOQUE):
+        """
+        Registra un lote nuevo
+
+        Args:
+            examen (str): Nombre del examen (por ejemplo, el archivo de la clave sin extensión)
+            hash_clave (str): Hash de la clave con la que se calificó
+            origen (str): Carpeta o programa del que vienen las hojas
+
+        Returns:
+            RegistroLote: Para agregar los resultados del lote
+        """
+        cursor = self.conexion.execute(
+            "INSERT INTO lotes (examen, hash_clave, origen, fecha) VALUES (?, ?, ?, ?)",
+            (examen, hash_clave, origen, fecha_actual()))
+        return RegistroLote(self, cursor.lastrowid, examen, tamaño_bloque)
+
+    def guardar_hojas(self, id_lote, examen, hojas):
+        """
+        Escribe varias hojas y sus respuestas en una sola transacción
+
+        Args:
+            id_lote (int): Lote al que pertenecen
+            examen (str): Examen del lote
+            hojas (list): Tuplas (hoja, respuestas) como las arma RegistroLote.agregar
+        """
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            # Con la escritura bloqueada, los ids siguientes son de este bloque
+            siguiente = self.conexion.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM hojas").fetchone()[0]
+            self.conexion.executemany(
+                "INSERT INTO hojas (id, lote_id, examen, ruta, matricula, nombre, grupo, variante, puntaje, "
+                "correctas, preguntas, error, fecha) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((siguiente + i, id_lote, examen) + hoja for i, (hoja, _) in enumerate(hojas)))
+            self.conexion.executemany(
+                "INSERT INTO respuestas (hoja_id, pregunta, seleccionada, correcta, es_correcta, confianza) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((siguiente + i,) + respuesta for i, (_, respuestas) in enumerate(hojas) for respuesta in respuestas))
+            self.conexion.execute("UPDATE lotes SET hojas = hojas + ? WHERE id = ?", (len(hojas), id_lote))
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+
+    def eliminar_lote(self, id_lote):
+        """Elimina un lote con sus hojas y respuestas; devuelve cuántas hojas tenía"""
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            hojas = self.conexion.execute("SELECT COUNT(*) FROM hojas WHERE lote_id = ?", (id_lote,)).fetchone()[0]
+            self.conexion.execute("DELETE FROM lotes WHERE id = ?", (id_lote,))
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        return hojas
+
+    # ------------------------------------------------
+    # Consultas
+    # ------------------------------------------------
+    @staticmethod
+    def _condiciones(examen=None, grupo=None, matricula=None, id_lote=None, desde=None, hasta=None,
+                     incluir_errores=False, alias=""):
+        """
+        Cláusula WHERE y parámetros de los filtros sobre hojas
+
+        Args:
+            examen, grupo, matricula (str): Valores exactos
+            id_lote (int): Lote
+            desde, hasta (str): Fechas 'AAAA-MM-DD[ HH:MM:SS]'; `hasta` no se incluye
+            incluir_errores (bool): Incluir las hojas que no se pudieron calificar
+        """
+        condiciones = []
+        parametros = []
+        for columna, valor in (("examen", examen), ("grupo", grupo), ("matricula", matricula), ("lote_id", id_lote)):
+            if valor is not None:
+                condiciones.append(f"{alias}{columna} = ?")
+                parametros.append(valor)
+        if desde is not None:
+            condiciones.append(f"{alias}fecha >= ?")
+            parametros.append(desde)
+        if hasta is not None:
+            condiciones.append(f"{alias}fecha < ?")
+            parametros.append(hasta)
+        if not incluir_errores:
+            # Las hojas con error no tienen puntaje; así el filtro se resuelve con idx_hojas_examen
+            condiciones.append(f"{alias}puntaje IS NOT NULL")
+
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def consultar_hojas(self, limite=None, **filtros):
+        """
+        Hojas que cumplen los filtros (ver _condiciones), en orden de calificación
+
+        Returns:
+            list: Diccionarios con las columnas de COLUMNAS_HOJA
+        """
+        donde, parametros = self._condiciones(**filtros)
+        consulta = f"SELECT {', '.join(COLUMNAS_HOJA)} FROM hojas{donde} ORDER BY id"
+        if limite is not None:
+            consulta += " LIMIT ?"
+            parametros.append(int(limite))
+        return [dict(zip(COLUMNAS_HOJA, fila)) for fila in self.conexion.execute(consulta, parametros)]
+
+    def resumen(self, **filtros):
+        """
+        Estadísticas de puntaje de las hojas que cumplen los filtros
+
+        Returns:
+            dict: {'hojas', 'promedio', 'minimo', 'maximo'} (None sin hojas)
+        """
+        donde, parametros = self._condiciones(**filtros)
+        hojas, promedio, minimo, maximo = self.conexion.execute(
+            f"SELECT COUNT(*), AVG(puntaje), MIN(puntaje), MAX(puntaje) FROM hojas{donde}", parametros).fetchone()
+        return {'hojas': hojas, 'promedio': promedio, 'minimo': minimo, 'maximo': maximo}
+
+    def respuestas_hoja(self, id_hoja):
+        """Respuestas de una hoja: [{'pregunta', 'seleccionada', 'correcta', 'es_correcta', 'confianza'}]"""
+        filas = self.conexion.execute(
+            "SELECT pregunta, seleccionada, correcta, es_correcta, confianza FROM respuestas "
+            "WHERE hoja_id = ? ORDER BY pregunta", (id_hoja,))
+        return [{'pregunta': pregunta, 'seleccionada': seleccionada, 'correcta': correcta,
+                 'es_correcta': bool(es_correcta), 'confianza': confianza}
+                for pregunta, seleccionada, correcta, es_correcta, confianza in filas]
+
+    def aciertos_por_pregunta(self, **filtros):
+        """
+        Aciertos de cada pregunta en las hojas que cumplen los filtros
+
+        Returns:
+            list: [{'pregunta', 'hojas', 'correctas', 'en_blanco', 'porcentaje'}] por pregunta
+        """
+        donde, parametros = self._condiciones(alias="h.", **filtros)
+        filas = self.conexion.execute(
+            "SELECT r.pregunta, COUNT(*), SUM(r.es_correcta), SUM(r.seleccionada IS NULL) "
+            f"FROM hojas h JOIN respuestas r ON r.hoja_id = h.id{donde} GROUP BY r.pregunta ORDER BY r.pregunta",
+            parametros)
+        return [{'pregunta': pregunta, 'hojas': hojas, 'correctas': correctas, 'en_blanco': en_blanco,
+                 'porcentaje': correctas / hojas * 100 if hojas else 0.0}
+                for pregunta, hojas, correctas, en_blanco in filas]
+
+    def iterar_respuestas(self, tamaño_bloque=10000, **filtros):
+        """
+        Recorre las respuestas de las hojas que cumplen los filtros, hoja por hoja y
+        en orden de pregunta, leyendo de la base por bloques (ver analisis_items.py)
+
+        Yields:
+            tuple: (id de hoja, pregunta, opción seleccionada o None, opción correcta)
+        """
+        donde, parametros = self._condiciones(alias="h.", **filtros)
+        cursor = self.conexion.execute(
+            "SELECT r.hoja_id, r.pregunta, r.seleccionada, r.correcta "
+            f"FROM hojas h JOIN respuestas r ON r.hoja_id = h.id{donde} ORDER BY h.id, r.pregunta",
+            parametros)
+        while True:
+            filas = cursor.fetchmany(tamaño_bloque)
+            if not filas:
+                return
+            yield from filas
+
+    def examenes(self):
+        """Diccionario {examen: hojas calificadas}"""
+        return dict(self.conexion.execute("SELECT examen, SUM(hojas) FROM lotes GROUP BY examen ORDER BY examen"))
+
+    def lotes(self, examen=None):
+        """Lotes registrados, del más reciente al más antiguo"""
+        columnas = ("id", "examen", "hash_clave", "origen", "fecha", "hojas")
+        consulta = f"SELECT {', '.join(columnas)} FROM lotes"
+        parametros = []
+        if examen is not None:
+            consulta += " WHERE examen = ?"
+            parametros.append(examen)
+        consulta += " ORDER BY id DESC"
+        return [dict(zip(columnas, fila)) for fila in self.conexion.execute(consulta, parametros)]
+
+
+# ------------------------------------------------
+# 🚀 Consultar desde la línea de comandos
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta los resultados guardados; sin filtros, lista los exámenes")
+    parser.add_argument("--almacen", default=RUTA_ALMACEN, help="Archivo SQLite de resultados")
+    parser.add_argument("--examen", help="Nombre del examen")
+    parser.add_argument("--grupo", help="Grupo de los alumnos")
+    parser.add_argument("--matricula", help="Matrícula de un alumno")
+    parser.add_argument("--lote", type=int, help="Número de lote")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha final, sin incluir (AAAA-MM-DD)")
+    parser.add_argument("--preguntas", action="store_true", help="Mostrar los aciertos por pregunta")
+    args = parser.parse_args()
+
+    filtros = {'examen': args.examen, 'grupo': args.grupo, 'matricula': args.matricula,
+               'id_lote': args.lote, 'desde': args.desde, 'hasta': args.hasta}
+
+    with AlmacenResultados(args.almacen) as almacen:
+        if all(valor is None for valor in filtros.values()):
+            for examen, hojas in almacen.examenes().items():
+                print(f"📝 {examen}: {hojas} hojas")
+            raise SystemExit(0)
+
+        for hoja in almacen.consultar_hojas(**filtros):
+            alumno = f" {hoja['matricula']} {hoja['nombre'] or ''}".rstrip() if hoja['matricula'] else ""
+            print(f"{hoja['fecha']} {hoja['examen']}{alumno}: {hoja['puntaje']:.2f}%")
+
+        resumen = almacen.resumen(**filtros)
+        if resumen['hojas']:
+            print(f"📊 {resumen['hojas']} hojas | promedio {resumen['promedio']:.2f}% | "
+                  f"mínimo {resumen['minimo']:.2f}% | máximo {resumen['maximo']:.2f}%")
+        else:
+            print("📊 No hay hojas con esos filtros")
+
+        if args.preguntas:
+            for pregunta in almacen.aciertos_por_pregunta(**filtros):
+                print(f"   P{pregunta['pregunta']}: {pregunta['porcentaje']:.1f}% correctas "
+                      f"({pregunta['en_blanco']} en blanco)")
@@ -0,0 +1,301 @@
+# [file name]: analisis_items.py
+# ================================================
+# 📈 ANÁLISIS DE ÍTEMS
+# Guarda las respuestas de un examen como una matriz
+# (alumnos, preguntas) de int8 en disco y la recorre con
+# np.memmap por bloques: dificultad, discriminación
+# (punto biserial), frecuencia de distractores y
+# confiabilidad KR-20 en una sola pasada, sin convertir
+# las hojas en objetos de Python.
+# ================================================
+
+import os
+import json
+import argparse
+
+import numpy as np
+
+from almacen_resultados import AlmacenResultados, RUTA_ALMACEN
+
+SIN_RESPUESTA = -1  # Valor de la matriz para una pregunta en blanco
+
+TAMAÑO_BLOQUE = 65536  # Alumnos por bloque al analizar
+
+
+class MatrizRespuestas:
+    """
+    Respuestas de un examen en dos archivos:
+    - {ruta}.dat: matriz (alumnos, preguntas) de int8 con la opción elegida
+      (SIN_RESPUESTA si ninguna), fila tras fila; agregar alumnos solo escribe al final
+    - {ruta}.json: número de preguntas y de opciones y la clave
+
+    El número de alumnos se deduce del tamaño del archivo de datos
+    """
+
+    VERSION = 1
+
+    def __init__(self, ruta):
+        """Abre una matriz existente (ver crear)"""
+        self.ruta = ruta
+        self.ruta_datos = f"{ruta}.dat"
+        with open(f"{ruta}.json", 'r', encoding='utf-8') as f:
+            metadatos = json.load(f)
+        if metadatos.get('version') != self.VERSION:
+            raise ValueError(f"Versión de matriz no soportada: {metadatos.get('version')}")
+
+        self.num_preguntas = metadatos['num_preguntas']
+        self.num_opciones = metadatos['num_opciones']
+        self.clave = np.asarray(metadatos['clave'], dtype=np.int8)
+
+    def __repr__(self):
+        return f"MatrizRespuestas({self.num_alumnos} alumnos, {self.num_preguntas} preguntas)"
+
+    @classmethod
+    def crear(cls, ruta, clave, num_opciones=5):
+        """
+        Crea una matriz vacía (reemplaza la que hubiera en la misma ruta)
+
+        Args:
+            ruta (str): Ruta sin extensión
+            clave (array): Opción correcta de cada pregunta (-1 si no se califica)
+            num_opciones (int): Opciones por pregunta
+        """
+        clave = np.asarray(clave, dtype=np.int8).reshape(-1)
+        with open(f"{ruta}.json", 'w', encoding='utf-8') as f:
+            json.dump({'version': cls.VERSION, 'num_preguntas': len(clave), 'num_opciones': num_opciones,
+                       'clave': clave.tolist()}, f)
+        open(f"{ruta}.dat", 'wb').close()
+        return cls(ruta)
+
+    @classmethod
+    def desde_almacen(cls, ruta, almacen, examen, num_opciones=5, **filtros):
+        """
+        Crea la matriz de un examen con las respuestas guardadas en la base de
+        resultados, leyendo por bloques. Las preguntas están en el orden original
+        (también con versiones barajadas) y la clave es la de la primera hoja
+
+        Args:
+            ruta (str): Ruta sin extensión de la matriz
+            almacen (AlmacenResultados): Base de resultados
+            examen (str): Examen a exportar
+            filtros: Filtros adicionales (grupo, id_lote, desde, hasta...)
+
+        Returns:
+            MatrizRespuestas: La matriz creada, o None si el examen no tiene hojas
+        """
+        primera = almacen.consultar_hojas(limite=1, examen=examen, **filtros)
+        if not primera:
+            return None
+
+        clave_primera = almacen.respuestas_hoja(primera[0]['id'])
+        clave = np.full(max((r['pregunta'] for r in clave_primera), default=0), SIN_RESPUESTA, dtype=np.int8)
+        for respuesta in clave_primera:
+            clave[respuesta['pregunta'] - 1] = respuesta['correcta']
+        matriz = cls.crear(ruta, clave, num_opciones)
+
+        # Una fila por hoja, escritas en bloques para no acumular el examen en memoria
+        bloque = np.full((TAMAÑO_BLOQUE, matriz.num_preguntas), SIN_RESPUESTA, dtype=np.int8)
+        fila = -1
+        hoja_actual = None
+        for id_hoja, pregunta, seleccionada, _ in almacen.iterar_respuestas(examen=examen, **filtros):
+            if id_hoja != hoja_actual:
+                hoja_actual = id_hoja
+                fila += 1
+                if fila == TAMAÑO_BLOQUE:
+                    matriz.agregar(bloque)
+                    bloque.fill(SIN_RESPUESTA)
+                    fila = 0
+            if seleccionada is not None and 1 <= pregunta <= matriz.num_preguntas:
+                bloque[fila, pregunta - 1] = seleccionada
+
+        matriz.agregar(bloque[:fila + 1])
+        return matriz
+
+    @property
+    def num_alumnos(self):
+        if self.num_preguntas == 0:
+            return 0
+        return os.path.getsize(self.ruta_datos) // self.num_preguntas
+
+    def agregar(self, filas):
+        """
+        Agrega alumnos al final del archivo
+
+        Args:
+            filas (list o ndarray): Filas de opciones elegidas (None o -1 si ninguna), o
+                                    diccionarios {pregunta (desde 1): opción}
+        """
+        if isinstance(filas, np.ndarray):
+            matriz = filas.astype(np.int8, copy=False).reshape(-1, self.num_preguntas)
+        else:
+            matriz = np.full((len(filas), self.num_preguntas), SIN_RESPUESTA, dtype=np.int8)
+            for i, fila in enumerate(filas):
+                if isinstance(fila, dict):
+                    for pregunta, opcion in fila.items():
+                        if opcion is not None and 1 <= pregunta <= self.num_preguntas:
+                            matriz[i, pregunta - 1] = opcion
+                else:
+                    matriz[i] = [SIN_RESPUESTA if opcion is None else opcion for opcion in fila]
+
+        with open(self.ruta_datos, 'ab') as f:
+            f.write(np.ascontiguousarray(matriz).tobytes())
+
+    def agregar_resultados(self, resultados_lote):
+        """
+        Agrega las hojas calificadas sin error de calificar_lote (u otros resultados
+        con 'resultados' y 'error'), con las preguntas en el orden original
+
+        Returns:
+            int: Hojas agregadas
+        """
+        filas = [{r['pregunta']: r['seleccionada'] for r in resultado['resultados']}
+                 for resultado in resultados_lote if not resultado.get('error')]
+        if filas:
+            self.agregar(filas)
+        return len(filas)
+
+    def matriz(self):
+        """Matriz (alumnos, preguntas) de solo lectura mapeada desde el disco"""
+        if self.num_alumnos == 0:
+            return np.empty((0, self.num_preguntas), dtype=np.int8)
+        return np.memmap(self.ruta_datos, dtype=np.int8, mode='r', shape=(self.num_alumnos, self.num_preguntas))
+
+    def analizar(self, tamaño_bloque=TAMAÑO_BLOQUE):
+        """Análisis de ítems de todos los alumnos (ver analizar_items)"""
+        return analizar_items(self.matriz(), self.clave, self.num_opciones, tamaño_bloque)
+
+
+def analizar_items(matriz, clave, num_opciones=5, tamaño_bloque=TAMAÑO_BLOQUE):
+    """
+    Estadísticas de ítems en una sola pasada por bloques de alumnos: de cada bloque
+    solo se acumulan sumas (aciertos, puntaje total, su cuadrado, acierto × total y
+    conteo de opciones), así que la memoria no depende del número de alumnos
+
+    Args:
+        matriz (ndarray): (alumnos, preguntas) int8 con la opción elegida (-1 en blanco);
+                          puede ser un np.memmap
+        clave (array): Opción correcta de cada pregunta (-1: la pregunta no se califica)
+        num_opciones (int): Opciones por pregunta
+        tamaño_bloque (int): Alumnos por bloque
+
+    Returns:
+        dict: {
+            'alumnos': int,
+            'dificultad': (Q,) proporción de aciertos (índice de dificultad p),
+            'discriminacion': (Q,) correlación punto biserial entre el acierto y el
+                              puntaje del resto del examen (NaN si no varía),
+            'frecuencias': (Q, num_opciones + 1) alumnos por opción; la última columna
+                           son los que la dejaron en blanco,
+            'kr20': confiabilidad KR-20 (NaN con menos de dos preguntas o sin varianza),
+            'media', 'varianza': del número de aciertos por alumno
+        }
+    """
+    clave = np.asarray(clave, dtype=np.int8).reshape(-1)
+    num_alumnos, num_preguntas = matriz.shape
+    calificadas = clave >= 0
+
+    suma_acierto_total = np.zeros(num_preguntas, dtype=np.int64)
+    frecuencias = np.zeros((num_preguntas, num_opciones + 1), dtype=np.int64)
+    suma_total = 0
+    suma_total_cuadrado = 0
+
+    for inicio in range(0, num_alumnos, tamaño_bloque):
+        # Solo este bloque se lee del disco
+        bloque = np.asarray(matriz[inicio:inicio + tamaño_bloque])
+
+        aciertos = (bloque == clave) & calificadas
+        total = aciertos.sum(axis=1, dtype=np.int32)
+        # En float64 el producto es exacto y lo resuelve BLAS (el de enteros no)
+        suma_acierto_total += (total.astype(np.float64) @ aciertos.astype(np.float64)).astype(np.int64)
+        suma_total += int(total.sum(dtype=np.int64))
+        suma_total_cuadrado += int(np.dot(total, total.astype(np.int64)))
+
+        # Una comparación por opción es más rápida que bincount; lo que no es
+        # ninguna opción (en blanco o fuera de rango) queda en la última columna
+        for opcion in range(num_opciones):
+            frecuencias[:, opcion] += (bloque == opcion).sum(axis=0, dtype=np.int32)
+    frecuencias[:, num_opciones] = num_alumnos - frecuencias[:, :num_opciones].sum(axis=1)
+
+    # Los aciertos de cada pregunta son los alumnos que eligieron la opción correcta
+    suma_aciertos = np.where(calificadas, frecuencias[np.arange(num_preguntas), np.maximum(clave, 0)], 0)
+
+    n = max(num_alumnos, 1)
+    p = suma_aciertos / n
+    media = suma_total / n
+    varianza = suma_total_cuadrado / n - media ** 2
+
+    # Punto biserial corregido: se compara con el puntaje sin la propia pregunta
+    # (resto = total - acierto; como acierto² = acierto, todo sale de las mismas sumas)
+    media_resto = media - p
+    producto_resto = (suma_acierto_total - suma_aciertos) / n
+    varianza_resto = (suma_total_cuadrado - 2 * suma_acierto_total + suma_aciertos) / n - media_resto ** 2
+    covarianza = producto_resto - p * media_resto
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discriminacion = covarianza / np.sqrt(p * (1 - p) * varianza_resto)
+    discriminacion[~calificadas] = np.nan
+
+    k = int(calificadas.sum())
+    if k > 1 and varianza > 0:
+        kr20 = k / (k - 1) * (1 - float(np.sum(p * (1 - p))) / varianza)
+    else:
+        kr20 = float('nan')
+
+    return {
+        'alumnos': num_alumnos,
+        'dificultad': np.where(calificadas, p, np.nan),
+        'discriminacion': discriminacion,
+        'frecuencias': frecuencias,
+        'kr20': kr20,
+        'media': media,
+        'varianza': varianza
+    }
+
+
+def generar_reporte_items(analisis, clave):
+    """Reporte de texto del análisis de ítems (en el estilo de generar_reporte_calificacion)"""
+    frecuencias = analisis['frecuencias']
+    num_opciones = frecuencias.shape[1] - 1
+    alumnos = max(analisis['alumnos'], 1)
+
+    reporte = "ANÁLISIS DE ÍTEMS\n"
+    reporte += "=================\n"
+    reporte += f"Alumnos: {analisis['alumnos']}\n"
+    reporte += f"Aciertos promedio: {analisis['media']:.2f} (varianza {analisis['varianza']:.2f})\n"
+    reporte += f"Confiabilidad KR-20: {analisis['kr20']:.3f}\n\n"
+
+    reporte += "DETALLE POR PREGUNTA (p: dificultad, r: discriminación):\n"
+    reporte += "-------------------\n"
+    for i, (p, r) in enumerate(zip(analisis['dificultad'], analisis['discriminacion'])):
+        opciones = " ".join(
+            f"{'*' if j == clave[i] else ''}{chr(65 + j)}:{frecuencias[i, j] / alumnos * 100:.0f}%"
+            for j in range(num_opciones))
+        reporte += (f"P{i + 1}: p={p:.2f} r={r:+.2f} | {opciones} "
+                    f"| blanco:{frecuencias[i, num_opciones] / alumnos * 100:.0f}%\n")
+
+    return reporte
+
+
+# ------------------------------------------------
+# 🚀 Ejecutar desde la línea de comandos
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Análisis de ítems de un examen")
+    parser.add_argument("matriz", help="Ruta (sin extensión) de la matriz de respuestas")
+    parser.add_argument("--examen", help="Crear antes la matriz con las hojas de este examen en la base de resultados")
+    parser.add_argument("--almacen", default=RUTA_ALMACEN, help="Archivo SQLite de resultados")
+    parser.add_argument("--grupo", help="Solo las hojas de este grupo (con --examen)")
+    parser.add_argument("--opciones", type=int, default=5, help="Opciones por pregunta (con --examen)")
+    args = parser.parse_args()
+
+    if args.examen:
+        with AlmacenResultados(args.almacen) as almacen:
+            matriz = MatrizRespuestas.desde_almacen(args.matriz, almacen, args.examen, args.opciones,
+                                                    grupo=args.grupo)
+        if matriz is None:
+            print(f"❌ No hay hojas calificadas de {args.examen}")
+            raise SystemExit(1)
+        print(f"✅ Matriz creada: {matriz}")
+    else:
+        matriz = MatrizRespuestas(args.matriz)
+
+    print(generar_reporte_items(matriz.analizar(), matriz.clave))
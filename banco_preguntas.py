@@ -0,0 +1,500 @@
+# [file name]: banco_preguntas.py
+# ================================================
+# 🗃️ BANCO DE PREGUNTAS (SQLite)
+# Guarda cientos de miles de preguntas por tema, con
+# dificultad y etiquetas indexadas. La importación desde
+# CSV o JSON se hace por lotes, leyendo el archivo fila a
+# fila, y el muestreo aleatorio con filtros se resuelve
+# dentro de la base: generar un examen solo lee las
+# preguntas elegidas, nunca el banco completo.
+# ================================================
+
+import os
+import csv
+import json
+import random
+import sqlite3
+import hashlib
+import argparse
+
+# Junto al programa, no en la carpeta desde la que se lanza
+RUTA_BANCO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "banco_preguntas.db")
+
+DIFICULTAD_MINIMA = 1  # Fácil
+DIFICULTAD_MAXIMA = 5  # Difícil
+
+TAMAÑO_LOTE = 1000  # Preguntas por executemany al importar
+MAX_RANGOS_CONSULTA = 500  # Posiciones por consulta al muestrear (límite de parámetros de SQLite)
+
+# Nombres de columna aceptados en CSV (sin distinguir mayúsculas)
+COLUMNAS_TEMA = ("tema", "materia", "asignatura")
+COLUMNAS_ENUNCIADO = ("enunciado", "pregunta")
+COLUMNAS_OPCIONES = ("opciones",)
+COLUMNAS_RESPUESTA = ("respuesta_correcta", "respuesta", "correcta")
+COLUMNAS_DIFICULTAD = ("dificultad", "nivel")
+COLUMNAS_ETIQUETAS = ("etiquetas", "etiqueta")
+
+SEPARADOR_CELDA = "|"  # Separa opciones y etiquetas dentro de una celda CSV
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS preguntas (
+    id INTEGER PRIMARY KEY,
+    tema TEXT NOT NULL,
+    dificultad INTEGER,
+    enunciado TEXT NOT NULL,
+    opciones TEXT NOT NULL,
+    respuesta_correcta INTEGER,
+    huella TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_preguntas_tema ON preguntas (tema, dificultad);
+CREATE INDEX IF NOT EXISTS idx_preguntas_dificultad ON preguntas (dificultad);
+CREATE TABLE IF NOT EXISTS etiquetas (
+    etiqueta TEXT NOT NULL,
+    pregunta_id INTEGER NOT NULL REFERENCES preguntas (id) ON DELETE CASCADE,
+    PRIMARY KEY (etiqueta, pregunta_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_etiquetas_pregunta ON etiquetas (pregunta_id);
+"""
+
+
+def calcular_huella(tema, enunciado, opciones):
+    """Huella de una pregunta: reimportar el mismo archivo no la duplica"""
+    contenido = json.dumps([tema, enunciado, opciones], ensure_ascii=False)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def normalizar_pregunta(pregunta, tema=None):
+    """
+    Valida una pregunta y la lleva al formato del banco
+
+    Args:
+        pregunta (dict): {'enunciado', 'opciones', 'tema'?, 'respuesta_correcta'? (índice desde 0),
+                          'dificultad'?, 'etiquetas'?}
+        tema (str): Tema por defecto si la pregunta no trae uno
+
+    Returns:
+        dict: {'tema', 'enunciado', 'opciones', 'respuesta_correcta', 'dificultad', 'etiquetas'}
+
+    Raises:
+        ValueError: Si falta el tema o el enunciado, hay menos de dos opciones o
+                    la respuesta o la dificultad están fuera de rango
+    """
+    tema = str(pregunta.get('tema') or tema or "").strip()
+    enunciado = str(pregunta.get('enunciado') or "").strip()
+    opciones = [str(opcion).strip() for opcion in pregunta.get('opciones') or []]
+    # Las columnas de opción vacías al final (preguntas con menos opciones) se descartan
+    while opciones and not opciones[-1]:
+        opciones.pop()
+
+    if not tema:
+        raise ValueError("la pregunta no tiene tema")
+    if not enunciado:
+        raise ValueError("la pregunta no tiene enunciado")
+    if len(opciones) < 2:
+        raise ValueError("la pregunta necesita al menos dos opciones")
+    if not all(opciones):
+        raise ValueError("hay una opción vacía entre las opciones")
+
+    respuesta = pregunta.get('respuesta_correcta')
+    if respuesta is not None and not 0 <= int(respuesta) < len(opciones):
+        raise ValueError(f"la respuesta correcta {respuesta} no es una de las {len(opciones)} opciones")
+
+    dificultad = pregunta.get('dificultad')
+    if dificultad is not None and not DIFICULTAD_MINIMA <= int(dificultad) <= DIFICULTAD_MAXIMA:
+        raise ValueError(f"la dificultad debe estar entre {DIFICULTAD_MINIMA} y {DIFICULTAD_MAXIMA}")
+
+    etiquetas = pregunta.get('etiquetas') or []
+    if isinstance(etiquetas, str):
+        etiquetas = etiquetas.split(SEPARADOR_CELDA)
+
+    return {
+        'tema': tema,
+        'enunciado': enunciado,
+        'opciones': opciones,
+        'respuesta_correcta': None if respuesta is None else int(respuesta),
+        'dificultad': None if dificultad is None else int(dificultad),
+        'etiquetas': sorted({str(etiqueta).strip().lower() for etiqueta in etiquetas if str(etiqueta).strip()})
+    }
+
+
+# ------------------------------------------------
+# Lectura de archivos (fila a fila)
+# ------------------------------------------------
+def _buscar_columna(encabezados, candidatos):
+    for encabezado in encabezados:
+        if encabezado is not None and encabezado.strip().lower() in candidatos:
+            return encabezado
+    return None
+
+
+def leer_preguntas_csv(ruta_csv):
+    """
+    Lee preguntas de un CSV con encabezados, una por fila (separado por comas,
+    punto y coma o tabuladores)
+
+    Columnas: tema, enunciado, opciones (separadas por '|') u opcion_a, opcion_b, ...;
+    opcionales: respuesta_correcta (letra, o número de opción empezando en 1),
+    dificultad (1 a 5) y etiquetas (separadas por '|')
+
+    Yields:
+        tuple: (número de línea, diccionario de la pregunta)
+    """
+    with open(ruta_csv, 'r', encoding='utf-8-sig', newline='') as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+
+        lector = csv.DictReader(f, dialect=dialecto)
+        encabezados = lector.fieldnames or []
+        columna_tema = _buscar_columna(encabezados, COLUMNAS_TEMA)
+        columna_enunciado = _buscar_columna(encabezados, COLUMNAS_ENUNCIADO)
+        columna_opciones = _buscar_columna(encabezados, COLUMNAS_OPCIONES)
+        columna_respuesta = _buscar_columna(encabezados, COLUMNAS_RESPUESTA)
+        columna_dificultad = _buscar_columna(encabezados, COLUMNAS_DIFICULTAD)
+        columna_etiquetas = _buscar_columna(encabezados, COLUMNAS_ETIQUETAS)
+        # opcion_a, opcion_b, ... en el orden del archivo
+        columnas_opcion = [e for e in encabezados if e is not None and e.strip().lower().startswith("opcion_")]
+
+        if columna_enunciado is None or (columna_opciones is None and not columnas_opcion):
+            raise ValueError("El CSV debe tener columnas 'enunciado' y 'opciones' (u 'opcion_a', 'opcion_b', ...)")
+
+        for numero_linea, fila in enumerate(lector, start=2):
+            if columna_opciones is not None:
+                opciones = (fila.get(columna_opciones) or "").split(SEPARADOR_CELDA)
+            else:
+                opciones = [fila.get(columna) or "" for columna in columnas_opcion]
+
+            respuesta = (fila.get(columna_respuesta) or "").strip() if columna_respuesta else ""
+            if respuesta.isdigit():
+                respuesta = int(respuesta) - 1
+            elif len(respuesta) == 1 and respuesta.isalpha():
+                respuesta = ord(respuesta.upper()) - 65
+            elif respuesta:
+                raise ValueError(f"Línea {numero_linea}: respuesta '{respuesta}' no válida (use A, B, ... o 1, 2, ...)")
+            else:
+                respuesta = None
+
+            dificultad = (fila.get(columna_dificultad) or "").strip() if columna_dificultad else ""
+            if dificultad and not dificultad.isdigit():
+                raise ValueError(f"Línea {numero_linea}: dificultad '{dificultad}' no válida")
+
+            yield numero_linea, {
+                'tema': fila.get(columna_tema) if columna_tema else None,
+                'enunciado': fila.get(columna_enunciado),
+                'opciones': opciones,
+                'respuesta_correcta': respuesta,
+                'dificultad': int(dificultad) if dificultad else None,
+                'etiquetas': fila.get(columna_etiquetas) if columna_etiquetas else None
+            }
+
+
+def leer_preguntas_json(ruta_json):
+    """
+    Lee preguntas de un archivo JSON
+
+    - .jsonl: una pregunta por línea (se lee línea a línea; el formato para bancos grandes)
+    - .json: un cuestionario guardado ({'tema', 'preguntas'}), una lista de preguntas
+      o un diccionario {tema: [preguntas]}; se carga completo
+
+    Yields:
+        tuple: (número de línea o de pregunta, diccionario de la pregunta)
+    """
+    with open(ruta_json, 'r', encoding='utf-8-sig') as f:
+        if ruta_json.lower().endswith('.jsonl'):
+            for numero_linea, linea in enumerate(f, start=1):
+                if linea.strip():
+                    try:
+                        yield numero_linea, json.loads(linea)
+                    except ValueError as e:
+                        raise ValueError(f"Línea {numero_linea}: JSON no válido ({str(e)})")
+            return
+
+        datos = json.load(f)
+
+    if isinstance(datos, dict) and 'preguntas' in datos:
+        for numero, pregunta in enumerate(datos['preguntas'], start=1):
+            yield numero, dict(pregunta, tema=pregunta.get('tema') or datos.get('tema'))
+    elif isinstance(datos, list):
+        yield from enumerate(datos, start=1)
+    elif isinstance(datos, dict):
+        numero = 0
+        for tema, preguntas in datos.items():
+            for pregunta in preguntas:
+                numero += 1
+                yield numero, dict(pregunta, tema=pregunta.get('tema') or tema)
+    else:
+        raise ValueError("Formato JSON de preguntas no reconocido")
+
+
+class BancoPreguntas:
+    """
+    Banco de preguntas en un archivo SQLite
+
+    Cada pregunta tiene tema, dificultad (1 a 5, opcional), enunciado, opciones,
+    respuesta correcta (opcional) y etiquetas. Se usa con `with` o llamando a cerrar()
+    """
+
+    VERSION = 1  # PRAGMA user_version del esquema
+
+    def __init__(self, ruta=RUTA_BANCO, preguntas_iniciales=None):
+        """
+        Args:
+            ruta (str): Archivo de la base de datos (se crea si no existe)
+            preguntas_iniciales (dict): {tema: [preguntas]} que se importan al crear el banco
+        """
+        self.ruta = ruta
+        # Transacciones explícitas: el conteo y el muestreo deben ver el mismo banco
+        self.conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        self.conexion.execute("PRAGMA foreign_keys = ON")
+        self._crear_esquema(preguntas_iniciales)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def _crear_esquema(self, preguntas_iniciales):
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] == self.VERSION:
+            return
+
+        # BEGIN IMMEDIATE: si varios procesos abren a la vez un banco nuevo, solo uno lo crea
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            if self.conexion.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+                for sentencia in ESQUEMA.split(";"):
+                    if sentencia.strip():
+                        self.conexion.execute(sentencia)
+                if preguntas_iniciales:
+                    self._insertar(enumerate((dict(p, tema=tema) for tema, preguntas in preguntas_iniciales.items()
+                                              for p in preguntas), start=1))
+                self.conexion.execute(f"PRAGMA user_version = {self.VERSION}")
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------
+    # Importación
+    # ------------------------------------------------
+    def _insertar(self, preguntas, tema=None):
+        """Inserta por lotes dentro de la transacción abierta; devuelve cuántas eran nuevas"""
+        antes = self.conexion.total_changes
+        nuevas_etiquetas = 0
+        lote = []
+
+        def volcar():
+            nonlocal nuevas_etiquetas
+            self.conexion.executemany(
+                "INSERT OR IGNORE INTO preguntas (tema, dificultad, enunciado, opciones, respuesta_correcta, huella) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(p['tema'], p['dificultad'], p['enunciado'], json.dumps(p['opciones'], ensure_ascii=False),
+                  p['respuesta_correcta'], huella) for huella, p in lote])
+            etiquetas = [(etiqueta, huella) for huella, p in lote for etiqueta in p['etiquetas']]
+            if etiquetas:
+                cambios = self.conexion.total_changes
+                self.conexion.executemany(
+                    "INSERT OR IGNORE INTO etiquetas (etiqueta, pregunta_id) "
+                    "SELECT ?, id FROM preguntas WHERE huella = ?", etiquetas)
+                nuevas_etiquetas += self.conexion.total_changes - cambios
+            lote.clear()
+
+        for numero, pregunta in preguntas:
+            try:
+                pregunta = normalizar_pregunta(pregunta, tema)
+            except (ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"Pregunta {numero}: {str(e)}")
+            lote.append((calcular_huella(pregunta['tema'], pregunta['enunciado'], pregunta['opciones']), pregunta))
+            if len(lote) >= TAMAÑO_LOTE:
+                volcar()
+        if lote:
+            volcar()
+
+        return self.conexion.total_changes - antes - nuevas_etiquetas
+
+    def importar(self, preguntas, tema=None):
+        """
+        Importa preguntas en una sola transacción: si una no es válida no se importa ninguna
+
+        Args:
+            preguntas (iterable): Diccionarios de pregunta, o tuplas (número, pregunta) para
+                                  que los errores indiquen la línea; se consumen por lotes
+            tema (str): Tema de las preguntas que no traen uno
+
+        Returns:
+            int: Preguntas nuevas (las repetidas se ignoran)
+
+        Raises:
+            ValueError: Si alguna pregunta no es válida
+        """
+        def numeradas():
+            for numero, pregunta in enumerate(preguntas, start=1):
+                yield pregunta if isinstance(pregunta, tuple) else (numero, pregunta)
+
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            nuevas = self._insertar(numeradas(), tema)
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        return nuevas
+
+    def importar_archivo(self, ruta, tema=None):
+        """
+        Importa un CSV, JSONL o JSON (ver leer_preguntas_csv y leer_preguntas_json)
+
+        Returns:
+            int: Preguntas nuevas
+        """
+        if ruta.lower().endswith('.csv'):
+            return self.importar(leer_preguntas_csv(ruta), tema)
+        if ruta.lower().endswith(('.json', '.jsonl')):
+            return self.importar(leer_preguntas_json(ruta), tema)
+        raise ValueError(f"Formato no soportado: {os.path.basename(ruta)} (use .csv, .json o .jsonl)")
+
+    # ------------------------------------------------
+    # Consultas
+    # ------------------------------------------------
+    @staticmethod
+    def _condiciones(tema=None, dificultad=None, etiquetas=None):
+        """
+        Cláusula WHERE y parámetros de los filtros
+
+        Args:
+            tema (str): Tema exacto (None: todos)
+            dificultad (int o tuple): Dificultad exacta o rango (mínima, máxima)
+            etiquetas (list): La pregunta debe tener todas estas etiquetas
+        """
+        condiciones = []
+        parametros = []
+        if tema is not None:
+            condiciones.append("tema = ?")
+            parametros.append(tema)
+        if isinstance(dificultad, (tuple, list)):
+            condiciones.append("dificultad BETWEEN ? AND ?")
+            parametros.extend(int(valor) for valor in dificultad)
+        elif dificultad is not None:
+            condiciones.append("dificultad = ?")
+            parametros.append(int(dificultad))
+        if etiquetas:
+            # Una subconsulta por etiqueta: cada una recorre solo su tramo de la llave primaria
+            for etiqueta in sorted({str(etiqueta).strip().lower() for etiqueta in etiquetas}):
+                condiciones.append("id IN (SELECT pregunta_id FROM etiquetas WHERE etiqueta = ?)")
+                parametros.append(etiqueta)
+
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def contar(self, tema=None, dificultad=None, etiquetas=None):
+        """Número de preguntas que cumplen los filtros (se resuelve con los índices)"""
+        donde, parametros = self._condiciones(tema, dificultad, etiquetas)
+        return self.conexion.execute(f"SELECT COUNT(*) FROM preguntas{donde}", parametros).fetchone()[0]
+
+    def muestrear(self, tema=None, num_preguntas=5, dificultad=None, etiquetas=None, rng=None):
+        """
+        Elige preguntas al azar, sin repetir, entre las que cumplen los filtros
+
+        Se cuentan las candidatas y se sortean sus posiciones (en el orden de id);
+        la base numera las candidatas y devuelve solo las de esas posiciones, así
+        que en memoria solo quedan las preguntas elegidas. Con el mismo estado del
+        generador (random.seed) se eligen las mismas preguntas
+
+        Args:
+            tema, dificultad, etiquetas: Filtros (ver _condiciones)
+            num_preguntas (int): Preguntas a elegir (todas si hay menos)
+            rng (random.Random): Generador a usar (por defecto, el del módulo random)
+
+        Returns:
+            list: Preguntas {'enunciado', 'opciones', 'tema', 'dificultad'?,
+                  'respuesta_correcta'?} en el orden del sorteo
+        """
+        rng = rng or random
+        donde, parametros = self._condiciones(tema, dificultad, etiquetas)
+
+        self.conexion.execute("BEGIN")
+        try:
+            total = self.conexion.execute(f"SELECT COUNT(*) FROM preguntas{donde}", parametros).fetchone()[0]
+            rangos = rng.sample(range(total), min(num_preguntas, total))
+
+            filas = {}
+            for inicio in range(0, len(rangos), MAX_RANGOS_CONSULTA):
+                bloque = rangos[inicio:inicio + MAX_RANGOS_CONSULTA]
+                consulta = (
+                    "WITH candidatas AS ("
+                    f"  SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS rango FROM preguntas{donde}) "
+                    "SELECT c.rango, p.tema, p.dificultad, p.enunciado, p.opciones, p.respuesta_correcta "
+                    "FROM candidatas c JOIN preguntas p ON p.id = c.id "
+                    f"WHERE c.rango IN ({', '.join('?' * len(bloque))})")
+                for rango, *fila in self.conexion.execute(consulta, parametros + bloque):
+                    filas[rango] = fila
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+
+        preguntas = []
+        for rango in rangos:
+            tema_pregunta, dificultad_pregunta, enunciado, opciones, respuesta = filas[rango]
+            pregunta = {'enunciado': enunciado, 'opciones': json.loads(opciones), 'tema': tema_pregunta}
+            if dificultad_pregunta is not None:
+                pregunta['dificultad'] = dificultad_pregunta
+            if respuesta is not None:
+                pregunta['respuesta_correcta'] = respuesta
+            preguntas.append(pregunta)
+        return preguntas
+
+    def temas(self):
+        """Diccionario {tema: número de preguntas}"""
+        return dict(self.conexion.execute("SELECT tema, COUNT(*) FROM preguntas GROUP BY tema ORDER BY tema"))
+
+    def etiquetas(self, tema=None):
+        """Diccionario {etiqueta: número de preguntas}, opcionalmente de un tema"""
+        if tema is None:
+            consulta, parametros = "SELECT etiqueta, COUNT(*) FROM etiquetas GROUP BY etiqueta ORDER BY etiqueta", []
+        else:
+            consulta = ("SELECT e.etiqueta, COUNT(*) FROM etiquetas e JOIN preguntas p ON p.id = e.pregunta_id "
+                        "WHERE p.tema = ? GROUP BY e.etiqueta ORDER BY e.etiqueta")
+            parametros = [tema]
+        return dict(self.conexion.execute(consulta, parametros))
+
+    def eliminar_tema(self, tema):
+        """Elimina todas las preguntas de un tema (y sus etiquetas); devuelve cuántas eran"""
+        self.conexion.execute("BEGIN IMMEDIATE")
+        try:
+            eliminadas = self.conexion.execute("DELETE FROM preguntas WHERE tema = ?", (tema,)).rowcount
+            self.conexion.execute("COMMIT")
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        return eliminadas
+
+
+# ------------------------------------------------
+# 🚀 Importar desde la línea de comandos
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa preguntas al banco; sin archivos, muestra su contenido")
+    parser.add_argument("archivos", nargs="*", help="Archivos .csv, .json o .jsonl con preguntas")
+    parser.add_argument("--banco", default=RUTA_BANCO, help="Archivo SQLite del banco")
+    parser.add_argument("--tema", help="Tema de las preguntas que no traen uno")
+    args = parser.parse_args()
+
+    with BancoPreguntas(args.banco) as banco:
+        for archivo in args.archivos:
+            try:
+                nuevas = banco.importar_archivo(archivo, args.tema)
+                print(f"✅ {archivo}: {nuevas} preguntas nuevas")
+            except (OSError, ValueError) as e:
+                print(f"❌ {archivo}: {str(e)}")
+                raise SystemExit(1)
+
+        temas = banco.temas()
+        print(f"🗃️ {args.banco}: {sum(temas.values())} preguntas en {len(temas)} temas")
+        for tema, total in temas.items():
+            print(f"   {tema}: {total}")
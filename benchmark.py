@@ -0,0 +1,393 @@
+# [file name]: benchmark.py
+# ================================================
+# ⏱️ BENCHMARK DE CALIFICACIÓN
+# Mide el rendimiento de procesar_hoja_respuestas y de
+# procesar_imagen_con_json sobre un corpus de imágenes:
+# hojas por segundo, latencias p50/p95/p99, memoria pico
+# y el desglose por etapa. Los resultados se guardan en
+# JSON y se pueden comparar contra una línea base.
+# ================================================
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+from calificador_automatico import CalificadorAutomatico, ETAPAS
+from clave_respuestas import cargar_clave
+from logica import procesar_imagen_con_json
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+PERCENTILES = (50, 95, 99)
+
+
+# ------------------------------------------------
+# 📏 Memoria
+# ------------------------------------------------
+def memoria_pico_mb():
+    """Memoria residente pico del proceso en MB (None si no se puede medir)"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB, macOS bytes
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        pass
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class CONTADORES_MEMORIA(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        contadores = CONTADORES_MEMORIA()
+        contadores.cb = ctypes.sizeof(contadores)
+        proceso = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+            return contadores.PeakWorkingSetSize / (1024 * 1024)
+    except Exception:
+        pass
+
+    return None
+
+
+# ------------------------------------------------
+# 🏃 Mediciones
+# ------------------------------------------------
+def listar_imagenes(carpeta):
+    """Imágenes de una carpeta, en orden alfabético"""
+    return sorted(
+        os.path.join(carpeta, f) for f in os.listdir(carpeta)
+        if f.lower().endswith(EXTENSIONES_IMAGEN)
+    )
+
+def medir_calificador(rutas, ruta_clave, ruta_layout=None, estrategia_lectura='color',
+                      carpeta_salida=None, calentamiento=1, paginas=None):
+    """
+    Mide CalificadorAutomatico.procesar_hoja_respuestas hoja por hoja
+
+    Args:
+        rutas (list): Imágenes a calificar
+        ruta_clave (str): Clave de respuestas
+        ruta_layout (str): Manifiesto de layout (opcional)
+        estrategia_lectura (str): Estrategia de decodificación del calificador
+        carpeta_salida (str): Si se indica, también se mide la escritura de resultados
+        calentamiento (int): Hojas que se califican antes de medir
+        paginas (dict): Página de la hoja de cada imagen (nombre de archivo -> página),
+                        para layouts de varias páginas
+
+    Returns:
+        list: Una muestra por hoja {'ruta', 'total_ms', 'etapas', 'error', 'seleccionadas'}
+    """
+    calificador = CalificadorAutomatico()
+    calificador.usar_clave(cargar_clave(ruta_clave))
+    if ruta_layout and not calificador.cargar_layout(ruta_layout):
+        raise ValueError(f"No se pudo cargar el layout: {ruta_layout}")
+    calificador.estrategia_lectura = estrategia_lectura
+    calificador.generar_imagen_resultado = carpeta_salida is not None
+
+    paginas = paginas or {}
+
+    def calificar(ruta):
+        # También la página 0: con un layout de varias páginas no se puede omitir
+        return calificador.procesar_hoja_respuestas(ruta, paginas.get(os.path.basename(ruta)))
+
+    for ruta in rutas[:calentamiento]:
+        calificar(ruta)
+
+    muestras = []
+    for ruta in rutas:
+        inicio = time.perf_counter()
+        puntaje, imagen, resultados, error = calificar(ruta)
+        etapas = dict(calificador.tiempos_etapas)
+
+        if carpeta_salida and not error and imagen is not None:
+            inicio_escritura = time.perf_counter()
+            calificador.guardar_resultados(ruta, imagen, resultados, puntaje, carpeta_salida)
+            etapas['escritura'] = (time.perf_counter() - inicio_escritura) * 1000
+
+        muestras.append({
+            'ruta': ruta,
+            'total_ms': (time.perf_counter() - inicio) * 1000,
+            'etapas': etapas,
+            'error': error,
+            'seleccionadas': [r['seleccionada'] for r in resultados]
+        })
+
+    return muestras
+
+def medir_logica(rutas, ruta_clave, carpeta_salida=None, calentamiento=1):
+    """
+    Mide logica.procesar_imagen_con_json hoja por hoja (mismo formato que medir_calificador)
+    """
+    clave = cargar_clave(ruta_clave)
+
+    for ruta in rutas[:calentamiento]:
+        try:
+            procesar_imagen_con_json(ruta, clave)
+        except ValueError:
+            pass
+
+    muestras = []
+    for ruta in rutas:
+        etapas = {}
+        error = None
+        resultados = []
+        inicio = time.perf_counter()
+        try:
+            _, imagen, resultados = procesar_imagen_con_json(ruta, clave, tiempos=etapas)
+            if carpeta_salida:
+                inicio_escritura = time.perf_counter()
+                cv2.imwrite(os.path.join(carpeta_salida, "calificada_" + os.path.basename(ruta)), imagen)
+                etapas['escritura'] = (time.perf_counter() - inicio_escritura) * 1000
+        except ValueError as e:
+            error = str(e)
+
+        muestras.append({
+            'ruta': ruta,
+            'total_ms': (time.perf_counter() - inicio) * 1000,
+            'etapas': etapas,
+            'error': error,
+            'seleccionadas': [r['seleccionada'] for r in resultados]
+        })
+
+    return muestras
+
+
+# ------------------------------------------------
+# 📊 Resumen
+# ------------------------------------------------
+def _estadisticas(valores):
+    valores = np.asarray(valores, dtype=np.float64)
+    if valores.size == 0:
+        return None
+    resumen = {'media': float(valores.mean())}
+    for p, valor in zip(PERCENTILES, np.percentile(valores, PERCENTILES)):
+        resumen[f'p{p}'] = float(valor)
+    return resumen
+
+def leer_verdad(carpeta_corpus):
+    """
+    Verdad de un corpus sintético (ver generador_corpus) indexada por nombre de
+    archivo, o {} si la carpeta no tiene verdad.jsonl
+    """
+    ruta_verdad = os.path.join(carpeta_corpus, "verdad.jsonl")
+    if not os.path.exists(ruta_verdad):
+        return {}
+
+    with open(ruta_verdad, 'r', encoding='utf-8') as f:
+        return {r['archivo']: r for r in (json.loads(linea) for linea in f if linea.strip())}
+
+def exactitud_contra_verdad(muestras, verdad):
+    """
+    Fracción de burbujas leídas igual que la verdad del corpus, o None si no hay verdad
+    """
+    aciertos = total = 0
+    for muestra in muestras:
+        registro = verdad.get(os.path.basename(muestra['ruta']))
+        if registro is None:
+            continue
+        esperadas = registro['respuestas']
+        leidas = muestra['seleccionadas']
+        for i, esperada in enumerate(esperadas):
+            total += 1
+            leida = leidas[i] if i < len(leidas) else None
+            aciertos += (leida if leida is not None else -1) == esperada
+    return aciertos / total if total else None
+
+def resumir(muestras, segundos):
+    """
+    Resume las muestras de una medición
+
+    Returns:
+        dict: Hojas por segundo, latencias, errores y estadísticas por etapa
+    """
+    etapas = {}
+    for nombre in ETAPAS + ('escritura',):
+        valores = [m['etapas'][nombre] for m in muestras if nombre in m['etapas']]
+        if valores:
+            etapas[nombre] = _estadisticas(valores)
+
+    return {
+        'hojas': len(muestras),
+        'errores': sum(1 for m in muestras if m['error']),
+        'segundos': segundos,
+        'hojas_por_segundo': len(muestras) / segundos if segundos > 0 else 0.0,
+        'latencia_ms': _estadisticas([m['total_ms'] for m in muestras]),
+        'etapas_ms': etapas
+    }
+
+def ejecutar_benchmark(carpeta, ruta_clave, ruta_layout=None, pipelines=('calificador', 'logica'),
+                       estrategia_lectura='color', escribir=False, limite=None):
+    """
+    Ejecuta el benchmark sobre las imágenes de una carpeta
+
+    Returns:
+        dict: Resultado completo, listo para guardar como JSON
+    """
+    rutas = listar_imagenes(carpeta)
+    if limite:
+        rutas = rutas[:limite]
+    if not rutas:
+        raise ValueError(f"No hay imágenes en {carpeta}")
+
+    resultado = {
+        'fecha': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'entorno': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'nucleos': os.cpu_count()
+        },
+        'corpus': {'carpeta': os.path.abspath(carpeta), 'imagenes': len(rutas)},
+        'pipelines': {}
+    }
+    verdad = leer_verdad(carpeta)
+    paginas = {archivo: r['pagina'] for archivo, r in verdad.items()}
+
+    for pipeline in pipelines:
+        carpeta_salida = tempfile.mkdtemp(prefix="benchmark_") if escribir else None
+        try:
+            inicio = time.perf_counter()
+            if pipeline == 'calificador':
+                muestras = medir_calificador(rutas, ruta_clave, ruta_layout, estrategia_lectura,
+                                             carpeta_salida, paginas=paginas)
+            elif pipeline == 'logica':
+                muestras = medir_logica(rutas, ruta_clave, carpeta_salida)
+            else:
+                raise ValueError(f"Pipeline desconocido: {pipeline}")
+            segundos = time.perf_counter() - inicio
+        finally:
+            if carpeta_salida:
+                shutil.rmtree(carpeta_salida, ignore_errors=True)
+
+        resumen = resumir(muestras, segundos)
+        resumen['exactitud'] = exactitud_contra_verdad(muestras, verdad)
+        resultado['pipelines'][pipeline] = resumen
+
+    resultado['memoria_pico_mb'] = memoria_pico_mb()
+    return resultado
+
+
+# ------------------------------------------------
+# 🆚 Comparación contra línea base
+# ------------------------------------------------
+def comparar_con_base(resultado, base, tolerancia=0.10, minimo_ms=0.5):
+    """
+    Compara un resultado contra una línea base guardada
+
+    Se consideran regresiones: menos hojas por segundo, más latencia (p50/p95/p99
+    total y p50 por etapa) o menos exactitud, más allá de la tolerancia relativa.
+    Los cambios de latencia menores a `minimo_ms` se ignoran (ruido de medición)
+
+    Returns:
+        list: Regresiones encontradas (textos)
+    """
+    regresiones = []
+
+    def revisar(nombre, actual, anterior, mayor_es_mejor, es_tiempo=False):
+        if actual is None or anterior is None or anterior == 0:
+            return
+        if es_tiempo and abs(actual - anterior) < minimo_ms:
+            return
+        cambio = (actual - anterior) / anterior
+        if (mayor_es_mejor and cambio < -tolerancia) or (not mayor_es_mejor and cambio > tolerancia):
+            regresiones.append(f"{nombre}: {anterior:.3f} → {actual:.3f} ({cambio:+.1%})")
+
+    for pipeline, actual in resultado['pipelines'].items():
+        anterior = base.get('pipelines', {}).get(pipeline)
+        if not anterior:
+            continue
+        revisar(f"{pipeline}.hojas_por_segundo", actual['hojas_por_segundo'], anterior['hojas_por_segundo'], True)
+        for p in PERCENTILES:
+            revisar(f"{pipeline}.latencia_ms.p{p}", actual['latencia_ms'][f'p{p}'],
+                    anterior['latencia_ms'][f'p{p}'], False, es_tiempo=True)
+        for etapa, estadisticas in actual['etapas_ms'].items():
+            if etapa in anterior['etapas_ms']:
+                revisar(f"{pipeline}.etapas_ms.{etapa}.p50", estadisticas['p50'],
+                        anterior['etapas_ms'][etapa]['p50'], False, es_tiempo=True)
+        revisar(f"{pipeline}.exactitud", actual.get('exactitud'), anterior.get('exactitud'), True)
+
+    return regresiones
+
+def imprimir_resultado(resultado):
+    """Imprime un resumen legible del benchmark"""
+    print(f"\n📊 Benchmark: {resultado['corpus']['imagenes']} imágenes de {resultado['corpus']['carpeta']}")
+    for pipeline, r in resultado['pipelines'].items():
+        latencia = r['latencia_ms']
+        print(f"\n▶️ {pipeline}: {r['hojas_por_segundo']:.2f} hojas/s, errores {r['errores']}/{r['hojas']}")
+        print(f"   Latencia p50 {latencia['p50']:.1f} ms | p95 {latencia['p95']:.1f} ms | p99 {latencia['p99']:.1f} ms")
+        if r.get('exactitud') is not None:
+            print(f"   Exactitud por burbuja: {r['exactitud']:.2%}")
+        for etapa, e in r['etapas_ms'].items():
+            print(f"   {etapa:<20} p50 {e['p50']:8.2f} ms | p95 {e['p95']:8.2f} ms | media {e['media']:8.2f} ms")
+    if resultado['memoria_pico_mb'] is not None:
+        print(f"\n💾 Memoria pico: {resultado['memoria_pico_mb']:.1f} MB")
+
+
+# ------------------------------------------------
+# 🚀 Ejecutar desde la línea de comandos
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de calificación por etapas")
+    parser.add_argument("carpeta", nargs="?", default="examenes_sin_calificar",
+                        help="Carpeta con las imágenes (por ejemplo, un corpus de generador_corpus)")
+    parser.add_argument("--clave", help="Clave de respuestas (por defecto, clave.json de la carpeta)")
+    parser.add_argument("--layout", help="Manifiesto de layout (por defecto, layout.json de la carpeta si existe)")
+    parser.add_argument("--sin-layout", action="store_true", help="Calificar por contornos aunque haya layout")
+    parser.add_argument("--pipelines", default="calificador,logica", help="Pipelines a medir, separados por comas")
+    parser.add_argument("--lectura", default="color", choices=("color", "gris", "reducida"),
+                        help="Estrategia de decodificación del calificador")
+    parser.add_argument("--escribir", action="store_true", help="Incluir la escritura de resultados")
+    parser.add_argument("--limite", type=int, help="Máximo de imágenes a medir")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--base", help="Resultado anterior contra el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Tolerancia relativa de regresión")
+    args = parser.parse_args()
+
+    ruta_clave = args.clave or os.path.join(args.carpeta, "clave.json")
+    ruta_layout = args.layout
+    if ruta_layout is None and not args.sin_layout and os.path.exists(os.path.join(args.carpeta, "layout.json")):
+        ruta_layout = os.path.join(args.carpeta, "layout.json")
+
+    resultado = ejecutar_benchmark(
+        args.carpeta, ruta_clave, None if args.sin_layout else ruta_layout,
+        pipelines=[p.strip() for p in args.pipelines.split(",") if p.strip()],
+        estrategia_lectura=args.lectura, escribir=args.escribir, limite=args.limite
+    )
+    imprimir_resultado(resultado)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados guardados en: {args.salida}")
+
+    if args.base:
+        with open(args.base, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar_con_base(resultado, base, args.tolerancia)
+        if regresiones:
+            print("\n❌ Regresiones respecto a la línea base:")
+            for regresion in regresiones:
+                print(f"   {regresion}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
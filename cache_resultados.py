@@ -0,0 +1,147 @@
+# [file name]: cache_resultados.py
+import os
+import json
+import hashlib
+
+
+class CacheResultados:
+    """
+    Caché en disco de resultados de calificación, direccionada por contenido
+
+    La llave combina el hash de la imagen, el hash de la clave de respuestas y los
+    parámetros del calificador, así que una nueva ejecución sobre las mismas
+    carpetas solo recalcula las hojas cuyas entradas cambiaron. Cuando el tamaño
+    total supera el máximo se eliminan las entradas usadas hace más tiempo.
+    """
+
+    VERSION = 4  # Cambiar si cambia el formato de los resultados guardados
+
+    def __init__(self, carpeta=".cache_calificaciones", tamaño_maximo=256 * 1024 * 1024):
+        """
+        Args:
+            carpeta (str): Carpeta donde se guardan las entradas
+            tamaño_maximo (int): Tamaño máximo de la caché en bytes
+        """
+        self.carpeta = carpeta
+        self.tamaño_maximo = tamaño_maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._tamaño_actual = None
+
+        if not os.path.exists(carpeta):
+            os.makedirs(carpeta)
+
+    @staticmethod
+    def calcular_llave(hash_imagen, hash_clave, parametros):
+        """Calcula la llave a partir de los hashes de imagen y clave y de los parámetros"""
+        contenido = json.dumps([CacheResultados.VERSION, hash_imagen, hash_clave, parametros],
+                               sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def _ruta_entrada(self, llave):
+        return os.path.join(self.carpeta, llave[:2], llave + ".json")
+
+    def obtener(self, llave):
+        """
+        Devuelve el resultado guardado para una llave, o None si no existe
+        """
+        ruta = self._ruta_entrada(llave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                valor = json.load(f)
+        except (OSError, ValueError):
+            self.fallos += 1
+            return None
+
+        # Marcar como usada recientemente (la fecha de modificación ordena el desalojo)
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, llave, valor):
+        """Guarda un resultado y desaloja entradas antiguas si se supera el tamaño máximo"""
+        ruta = self._ruta_entrada(llave)
+        carpeta = os.path.dirname(ruta)
+        if not os.path.exists(carpeta):
+            os.makedirs(carpeta)
+
+        tamaño_actual = self.tamaño_total()
+        tamaño_previo = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+        ruta_temporal = ruta + ".tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(valor, f, ensure_ascii=False, default=_convertir_json)
+        os.replace(ruta_temporal, ruta)
+
+        self._tamaño_actual = tamaño_actual + os.path.getsize(ruta) - tamaño_previo
+
+        if self._tamaño_actual > self.tamaño_maximo:
+            self.desalojar()
+
+    def _entradas(self):
+        """Lista (mtime, tamaño, ruta) de todas las entradas"""
+        entradas = []
+        for subcarpeta in os.scandir(self.carpeta):
+            if not subcarpeta.is_dir():
+                continue
+            for entrada in os.scandir(subcarpeta.path):
+                if entrada.name.endswith(".json"):
+                    info = entrada.stat()
+                    entradas.append((info.st_mtime, info.st_size, entrada.path))
+        return entradas
+
+    def tamaño_total(self):
+        """Tamaño total de la caché en bytes"""
+        if self._tamaño_actual is None:
+            self._tamaño_actual = sum(tamaño for _, tamaño, _ in self._entradas())
+        return self._tamaño_actual
+
+    def desalojar(self, fraccion_objetivo=0.9):
+        """Elimina las entradas usadas hace más tiempo hasta bajar del tamaño objetivo"""
+        entradas = sorted(self._entradas())
+        tamaño = sum(t for _, t, _ in entradas)
+        objetivo = self.tamaño_maximo * fraccion_objetivo
+
+        for _, tamaño_entrada, ruta in entradas:
+            if tamaño <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                tamaño -= tamaño_entrada
+                self.desalojos += 1
+            except OSError:
+                continue
+
+        self._tamaño_actual = tamaño
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        for _, _, ruta in self._entradas():
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+        self._tamaño_actual = 0
+
+    def estadisticas(self):
+        """Devuelve contadores de aciertos, fallos y tamaño de la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            'desalojos': self.desalojos,
+            'tamaño_bytes': self.tamaño_total()
+        }
+
+
+def _convertir_json(valor):
+    """Convierte escalares y arreglos de NumPy a tipos nativos al serializar"""
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
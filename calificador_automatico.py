@@ -1,7 +1,17 @@
 import os
+import time
+import heapq
+import hashlib
 import cv2
 import numpy as np
 import json
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from cache_resultados import CacheResultados
+from clave_respuestas import ClaveRespuestas, cargar_clave, generar_json_clave_desde_txt as _generar_json_clave_desde_txt
+from instrumentacion import EventoEtapa, VisorOpenCV, forma
+from lista_alumnos import leer_lista_alumnos, indice_alumnos, normalizar_matricula
+from variantes import AlmacenVariantes, letra_variante
 from imutils.perspective import four_point_transform
 from imutils import contours
 
@@ -9,40 +19,51 @@ class CalificadorAutomatico:
     """Clase para calificar exámenes automáticamente mediante procesamiento de imágenes"""
     
     def __init__(self, modo_depuracion=False):
-        self.clave_respuestas = {}
+        self.clave = ClaveRespuestas([])  # Clave compilada (ver clave_respuestas.py)
         self.num_preguntas = 0
         self.num_opciones = 5  # Por defecto, 5 opciones (A-E)
         self.modo_depuracion = modo_depuracion
         self.umbral_relleno_minimo = 500  # Mínimo de píxeles para considerar una burbuja marcada
         self.umbral_ratio_relleno = 0.3   # Mínimo ratio de relleno (área marcada / área total)
+        self.layout = None                # Manifiesto de layout (posiciones conocidas de burbujas)
+        self.tiempo_localizacion_ms = 0.0 # Tiempo de la última localización de hoja
+        self.estrategia_lectura = 'color' # 'color', 'gris' o 'reducida' (ver decodificar_imagen)
+        self.lado_maximo_lectura = 1600   # Lado mayor mínimo a conservar con la estrategia 'reducida'
+        self.generar_imagen_resultado = True  # Si es False solo se calcula el resultado (sin imágenes en color)
+        self.factor_reduccion = 1         # Reducción aplicada al decodificar la última imagen
+        self.esquinas_hoja = None         # Esquinas de la última hoja, en píxeles de la imagen original
+        self.alumnos = {}                 # Lista de alumnos {matrícula normalizada: alumno} (ver cargar_lista_alumnos)
+        self.matricula = None             # Matrícula leída de la última hoja ('?' en dígitos ilegibles)
+        self.variantes = None             # Versiones barajadas del examen (ver cargar_variantes)
+        self.variante = None              # Versión de la última hoja calificada
+        self.pagina = None                # Página del layout de la última hoja calificada
+        self.tiempos_etapas = {}          # Milisegundos por etapa de la última hoja (ver ETAPAS)
+        self._inicio_etapa = 0.0
+        self._origen = None
+        # Ganchos de instrumentación: reciben un EventoEtapa por etapa (ver instrumentacion.py)
+        self.ganchos = [VisorOpenCV()] if modo_depuracion else []
+    
+    @property
+    def clave_respuestas(self):
+        """Clave en formato de diccionario {pregunta_idx: opcion_idx} (vista de la clave compilada)"""
+        return self.clave.como_diccionario()
+    
+    @clave_respuestas.setter
+    def clave_respuestas(self, datos_clave):
+        self.usar_clave(ClaveRespuestas.desde_datos(datos_clave))
+    
+    def usar_clave(self, clave):
+        """Usa una clave ya compilada (ClaveRespuestas)"""
+        self.clave = clave
+        self.num_preguntas = clave.num_preguntas
     
     def cargar_clave_desde_json(self, ruta_json):
         """
-        Carga la clave de respuestas desde un archivo JSON
+        Carga la clave de respuestas desde un archivo JSON (o TXT). La clave se
+        compila una sola vez por archivo y se reutiliza mientras no cambie
         """
         try:
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                datos_clave = json.load(f)
-            
-            if isinstance(datos_clave, dict) and 'respuestas' in datos_clave:
-                self.clave_respuestas = datos_clave['respuestas']
-            elif isinstance(datos_clave, list):
-                self.clave_respuestas = {i: resp for i, resp in enumerate(datos_clave)}
-            else:
-                self.clave_respuestas = {}
-                for key, value in datos_clave.items():
-                    if 'pregunta' in key.lower() or key.isdigit():
-                        if isinstance(value, dict) and 'correcta' in value:
-                            idx = int(key.replace('pregunta', '')) if 'pregunta' in key.lower() else int(key)
-                            self.clave_respuestas[idx] = value['correcta']
-                        elif isinstance(value, (int, str)):
-                            idx = int(key.replace('pregunta', '')) if 'pregunta' in key.lower() else int(key)
-                            if isinstance(value, str) and value.isalpha():
-                                self.clave_respuestas[idx] = ord(value.upper()) - 65
-                            else:
-                                self.clave_respuestas[idx] = int(value)
-            
-            self.num_preguntas = len(self.clave_respuestas)
+            self.usar_clave(cargar_clave(ruta_json))
             print(f"✅ Clave cargada: {self.num_preguntas} preguntas")
             return True
             
@@ -50,15 +71,84 @@ class CalificadorAutomatico:
             print(f"❌ Error al cargar clave JSON: {str(e)}")
             return False
     
-    def mostrar_imagen(self, titulo, imagen, escala=0.7):
-        """Muestra una imagen en una ventana OpenCV (solo en modo depuración)"""
-        if self.modo_depuracion:
-            h, w = imagen.shape[:2]
-            nueva_w = int(w * escala)
-            nueva_h = int(h * escala)
-            imagen_redimensionada = cv2.resize(imagen, (nueva_w, nueva_h))
-            cv2.imshow(titulo, imagen_redimensionada)
-            cv2.waitKey(1)
+    def obtener_configuracion(self):
+        """
+        Devuelve la configuración del calificador (clave compilada y umbrales) en
+        un dict serializable con pickle, para poder reconstruirlo en otro proceso
+        """
+        return {
+            'clave': self.clave,
+            'num_opciones': self.num_opciones,
+            'umbral_relleno_minimo': self.umbral_relleno_minimo,
+            'umbral_ratio_relleno': self.umbral_ratio_relleno,
+            'layout': self.layout,
+            'alumnos': self.alumnos,
+            'variantes': self.variantes,
+            'estrategia_lectura': self.estrategia_lectura,
+            'lado_maximo_lectura': self.lado_maximo_lectura,
+            'generar_imagen_resultado': self.generar_imagen_resultado
+        }
+    
+    @classmethod
+    def desde_configuracion(cls, configuracion):
+        """Crea un calificador a partir de un dict generado por obtener_configuracion"""
+        calificador = cls(modo_depuracion=False)
+        calificador.usar_clave(configuracion['clave'])
+        calificador.num_opciones = configuracion['num_opciones']
+        calificador.umbral_relleno_minimo = configuracion['umbral_relleno_minimo']
+        calificador.umbral_ratio_relleno = configuracion['umbral_ratio_relleno']
+        calificador.layout = configuracion.get('layout')
+        calificador.alumnos = configuracion.get('alumnos', {})
+        calificador.variantes = configuracion.get('variantes')
+        calificador.estrategia_lectura = configuracion['estrategia_lectura']
+        calificador.lado_maximo_lectura = configuracion['lado_maximo_lectura']
+        calificador.generar_imagen_resultado = configuracion['generar_imagen_resultado']
+        return calificador
+    
+    def agregar_gancho(self, gancho):
+        """
+        Conecta un gancho de instrumentación: un callable que recibe un
+        EventoEtapa al terminar cada etapa (ver instrumentacion.py)
+        """
+        self.ganchos.append(gancho)
+        return gancho
+    
+    def quitar_gancho(self, gancho):
+        """Desconecta un gancho de instrumentación"""
+        if gancho in self.ganchos:
+            self.ganchos.remove(gancho)
+    
+    def _iniciar_etapas(self, origen):
+        """Reinicia la medición de tiempos por etapa (y la matrícula y versión leídas) para una nueva hoja"""
+        self.matricula = None
+        self.variante = None
+        self.tiempos_etapas = {}
+        self._origen = origen
+        self._inicio_etapa = time.perf_counter()
+    
+    def _emitir(self, numero, titulo, grupo, imagen=None, entrada=None, salida=None, **conteos):
+        """
+        Cierra una etapa: acumula su tiempo en self.tiempos_etapas[grupo] y, si hay
+        ganchos conectados, les envía un EventoEtapa. La imagen puede ser un
+        callable que solo se evalúa si algún gancho la pide; sin imagen explícita
+        se usa la salida. El tiempo de los ganchos no se cuenta en la etapa siguiente
+        """
+        ahora = time.perf_counter()
+        duracion = (ahora - self._inicio_etapa) * 1000
+        self.tiempos_etapas[grupo] = self.tiempos_etapas.get(grupo, 0.0) + duracion
+        
+        if self.ganchos:
+            evento = EventoEtapa(numero, titulo, grupo, duracion, ahora, forma(entrada), forma(salida),
+                                 conteos, self._origen, imagen if imagen is not None else salida)
+            for gancho in self.ganchos:
+                gancho(evento)
+            ahora = time.perf_counter()
+        
+        self._inicio_etapa = ahora
+    
+    def _emitir_localizacion(self, numero, titulo, imagen, **conteos):
+        """Adaptador para los pasos intermedios de localizar_documento"""
+        self._emitir(numero, titulo, 'localizacion', salida=imagen, **conteos)
     
     def detectar_circulos_hough(self, imagen_gris):
         """
@@ -92,48 +182,15 @@ class CalificadorAutomatico:
         
         return umbral_mejorado
     
-    def analizar_relleno_burbuja(self, contorno, umbral):
-        """
-        Analiza el nivel de relleno de una burbuja
-        """
-        # Crear máscara para el contorno
-        mascara = np.zeros(umbral.shape, dtype="uint8")
-        cv2.drawContours(mascara, [contorno], -1, 255, -1)
-        
-        # Aplicar máscara
-        mascara_aplicada = cv2.bitwise_and(umbral, umbral, mask=mascara)
-        
-        # Calcular métricas
-        total_pixels = cv2.countNonZero(mascara_aplicada)
-        area_contorno = cv2.contourArea(contorno)
-        
-        # Calcular ratio de relleno
-        ratio_relleno = total_pixels / area_contorno if area_contorno > 0 else 0
-        
-        # Calcular densidad de píxeles (píxeles por área)
-        densidad = total_pixels / area_contorno if area_contorno > 0 else 0
-        
-        # Obtener bounding rect para análisis adicional
-        (x, y, w, h) = cv2.boundingRect(contorno)
-        
-        return {
-            'total_pixels': total_pixels,
-            'area_contorno': area_contorno,
-            'ratio_relleno': ratio_relleno,
-            'densidad': densidad,
-            'mascara': mascara_aplicada,
-            'bbox': (x, y, w, h)
-        }
-    
     def filtrar_burbujas_validas(self, contornos, umbral, ancho_hoja, alto_hoja):
         """
         Filtra contornos para identificar solo burbujas válidas
         """
         burbujas_validas = []
-        metricas_burbujas = []
         
         area_minima = (ancho_hoja * alto_hoja) * 0.0001  # 0.01% del área total
         area_maxima = (ancho_hoja * alto_hoja) * 0.01   # 1% del área total
+        lado_minimo = 12 / self.factor_reduccion       # 12 px a resolución completa
         
         for c in contornos:
             (x, y, w, h) = cv2.boundingRect(c)
@@ -143,15 +200,24 @@ class CalificadorAutomatico:
             # Filtrar por tamaño y forma
             if (area_minima <= area <= area_maxima and 
                 0.6 <= proporcion <= 1.4 and
-                w >= 12 and h >= 12):
-                
-                # Analizar relleno
-                analisis = self.analizar_relleno_burbuja(c, umbral)
+                w >= lado_minimo and h >= lado_minimo):
                 
                 # Verificar si tiene características de burbuja
-                if self.es_burbuja_valida(analisis, c):
+                if self.es_burbuja_valida({'area_contorno': area}, c):
                     burbujas_validas.append(c)
-                    metricas_burbujas.append(analisis)
+        
+        # Medir el relleno de todas las burbujas aceptadas en una sola pasada
+        pixeles, areas = medir_relleno_burbujas(burbujas_validas, umbral)
+        metricas_burbujas = []
+        for c, total_pixels, area_pixeles in zip(burbujas_validas, pixeles, areas):
+            ratio_relleno = total_pixels / area_pixeles if area_pixeles > 0 else 0
+            metricas_burbujas.append({
+                'total_pixels': int(total_pixels),
+                'area_contorno': cv2.contourArea(c),
+                'ratio_relleno': ratio_relleno,
+                'densidad': ratio_relleno,
+                'bbox': cv2.boundingRect(c)
+            })
         
         return burbujas_validas, metricas_burbujas
     
@@ -167,7 +233,7 @@ class CalificadorAutomatico:
         es_circular = circularidad > 0.6
         
         # Tamaño razonable
-        tamaño_ok = analisis['area_contorno'] > 100
+        tamaño_ok = analisis['area_contorno'] > 100 / self.factor_reduccion ** 2
         
         return es_circular and tamaño_ok
     
@@ -175,28 +241,50 @@ class CalificadorAutomatico:
         """
         Detecta qué burbujas están marcadas basándose en múltiples criterios
         """
-        burbujas_marcadas = []
-        confianzas = []
+        pixeles, areas = medir_relleno_burbujas(burbujas, umbral)
+        ratios = pixeles / np.maximum(areas, 1)
         
-        for burbuja in burbujas:
-            analisis = self.analizar_relleno_burbuja(burbuja, umbral)
-            
-            # Múltiples criterios para determinar si está marcada
-            criterio_pixels = analisis['total_pixels'] > self.umbral_relleno_minimo
-            criterio_ratio = analisis['ratio_relleno'] > self.umbral_ratio_relleno
-            criterio_densidad = analisis['densidad'] > 0.4
-            
-            # Combinar criterios (al menos 2 de 3)
-            criterios_cumplidos = sum([criterio_pixels, criterio_ratio, criterio_densidad])
-            esta_marcada = criterios_cumplidos >= 2
-            
-            # Calcular confianza
-            confianza = min(100, (analisis['ratio_relleno'] * 100))
-            
-            burbujas_marcadas.append(esta_marcada)
-            confianzas.append(confianza)
+        marcadas = self.evaluar_criterios_relleno(ratios, pixeles)
+        confianzas = np.minimum(100, ratios * 100)
         
-        return burbujas_marcadas, confianzas
+        return marcadas.tolist(), confianzas.tolist()
+    
+    def evaluar_criterios_relleno(self, ratios, pixeles):
+        """
+        Aplica los criterios de relleno sobre arreglos de ratios y píxeles marcados
+        (de cualquier forma) y devuelve un arreglo booleano de burbujas marcadas
+        """
+        # Múltiples criterios para determinar si está marcada (el mínimo de
+        # píxeles está expresado a resolución completa)
+        criterio_pixels = pixeles > self.umbral_relleno_minimo / self.factor_reduccion ** 2
+        criterio_ratio = ratios > self.umbral_ratio_relleno
+        criterio_densidad = ratios > 0.4
+        
+        # Combinar criterios (al menos 2 de 3)
+        criterios_cumplidos = (criterio_pixels.astype(np.int8) + criterio_ratio + criterio_densidad)
+        return criterios_cumplidos >= 2
+    
+    def seleccionar_respuestas(self, ratios, pixeles):
+        """
+        Elige la opción marcada de cada pregunta a partir de la matriz de relleno
+        
+        Args:
+            ratios (ndarray): Matriz (num_preguntas, num_opciones) de ratios de relleno
+            pixeles (ndarray): Matriz con los píxeles marcados de cada burbuja
+        
+        Returns:
+            tuple: (seleccionadas, confianzas) con -1 donde no hay burbuja marcada
+        """
+        ratios = np.nan_to_num(ratios)
+        confianzas = np.minimum(100, ratios * 100)
+        
+        # Entre las burbujas marcadas, la de mayor confianza
+        puntuacion = np.where(self.evaluar_criterios_relleno(ratios, pixeles), confianzas, 0)
+        seleccionadas = np.argmax(puntuacion, axis=1)
+        max_confianza = puntuacion.max(axis=1)
+        
+        seleccionadas = np.where(max_confianza > 0, seleccionadas, -1)
+        return seleccionadas, max_confianza
     
     def organizar_burbujas_por_preguntas(self, burbujas, num_preguntas, num_opciones):
         """
@@ -225,68 +313,175 @@ class CalificadorAutomatico:
         
         return preguntas
     
-    def procesar_hoja_respuestas(self, ruta_imagen):
+    def localizar_hoja(self, imagen):
+        """
+        Convierte la imagen a grises (si no lo está) y busca el contorno de 4
+        vértices de la hoja (ver localizar_documento). El tiempo de localización
+        queda en self.tiempo_localizacion_ms y las esquinas, en píxeles de la
+        imagen original, en self.esquinas_hoja
+        
+        Returns:
+            tuple: (gris, contorno_documento); el contorno es None si no se detecta
+        """
+        gris = imagen if imagen.ndim == 2 else cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+        self._emitir(2, "2. Escala de Grises", 'preprocesamiento', entrada=imagen, salida=gris)
+        
+        contorno_documento, self.tiempo_localizacion_ms = localizar_documento(
+            gris, umbral_canny=(50, 150), area_minima=0.5, ecualizar=True,
+            depuracion=self._emitir_localizacion if self.ganchos else None
+        )
+        self._emitir(None, "Contorno de la hoja", 'localizacion', entrada=gris,
+                     encontrada=int(contorno_documento is not None))
+        
+        self.esquinas_hoja = None
+        if contorno_documento is not None:
+            self.esquinas_hoja = (contorno_documento.reshape(4, 2) * self.factor_reduccion).tolist()
+        
+        if self.modo_depuracion:
+            print(f"⏱️ Localización de la hoja: {self.tiempo_localizacion_ms:.1f} ms")
+        
+        return gris, contorno_documento
+    
+    def cargar_imagen(self, ruta_imagen):
+        """
+        Carga la imagen a calificar. Acepta una ruta o una imagen ya decodificada
+        (por ejemplo, una página de un TIFF multipágina)
+        
+        Returns:
+            ndarray: Imagen BGR, o None si no se pudo cargar
+        """
+        if isinstance(ruta_imagen, np.ndarray):
+            if ruta_imagen.ndim == 2:
+                return cv2.cvtColor(ruta_imagen, cv2.COLOR_GRAY2BGR)
+            return ruta_imagen
+        return cv2.imread(ruta_imagen)
+    
+    def decodificar_imagen(self, ruta_imagen):
+        """
+        Decodifica la imagen según self.estrategia_lectura:
+        
+        - 'color': imagen completa en color (comportamiento original)
+        - 'gris': solo la versión en grises; el color se relee únicamente si se
+          pide la imagen anotada (ver vista_frontal_color)
+        - 'reducida': grises decodificados ya reducidos (IMREAD_REDUCED_*) según las
+          dimensiones de la cabecera, sin bajar de self.lado_maximo_lectura
+        
+        Los umbrales en píxeles se ajustan con self.factor_reduccion. En modo de
+        solo resultados (generar_imagen_resultado = False) nunca se decodifica el
+        color: con 'color' se leen directamente los grises.
+        
+        Returns:
+            tuple: (gris, imagen_color); imagen_color es None si no se decodificó
+        """
+        self.factor_reduccion = 1
+        solo_grises = not self.generar_imagen_resultado
+        
+        if isinstance(ruta_imagen, np.ndarray) and ruta_imagen.ndim == 2 and solo_grises:
+            return ruta_imagen, None
+        
+        if isinstance(ruta_imagen, np.ndarray) or (self.estrategia_lectura == 'color' and not solo_grises):
+            imagen = self.cargar_imagen(ruta_imagen)
+            if imagen is None:
+                return None, None
+            return cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY), imagen
+        
+        if self.estrategia_lectura == 'reducida':
+            self.factor_reduccion = elegir_factor_reduccion(ruta_imagen, self.lado_maximo_lectura)
+        
+        return cv2.imread(ruta_imagen, FLAGS_LECTURA[self.factor_reduccion][0]), None
+    
+    def vista_frontal_color(self, ruta_imagen, imagen, contorno_documento):
+        """
+        Vista frontal en color para la imagen anotada, o None si no se pidió
+        (self.generar_imagen_resultado). Si solo se decodificaron los grises, el
+        color se relee con la misma reducción para que las coordenadas coincidan
+        """
+        if not self.generar_imagen_resultado:
+            return None
+        
+        if imagen is None:
+            imagen = cv2.imread(ruta_imagen, FLAGS_LECTURA[self.factor_reduccion][1])
+            if imagen is None:
+                return None
+        
+        return four_point_transform(imagen, contorno_documento.reshape(4, 2))
+    
+    def renderizar_resultado(self, ruta_imagen, resultados_detallados, esquinas=None):
         """
-        Procesa una imagen de hoja de respuestas y la califica automáticamente
+        Genera bajo demanda la imagen anotada de una hoja ya calificada en modo de
+        solo resultados, a partir de la geometría de burbujas de los resultados
+        
+        Args:
+            ruta_imagen (str | ndarray): Imagen original de la hoja
+            resultados_detallados (list): Resultados devueltos al calificarla
+            esquinas (list): Esquinas de la hoja (self.esquinas_hoja al calificarla);
+                             si no se indican, la hoja se vuelve a localizar
+        
+        Returns:
+            ndarray: Vista frontal en color anotada, o None si no se pudo generar
         """
+        imagen = self.cargar_imagen(ruta_imagen)
+        if imagen is None:
+            return None
+        
+        if esquinas is None:
+            self.factor_reduccion = 1
+            _, contorno_documento = self.localizar_hoja(imagen)
+            if contorno_documento is None:
+                return None
+            esquinas = contorno_documento.reshape(4, 2)
+        
+        hoja_color = four_point_transform(imagen, np.asarray(esquinas, dtype=np.float32))
+        return renderizar_anotaciones(hoja_color, resultados_detallados)
+    
+    def procesar_hoja_respuestas(self, ruta_imagen, pagina=None, variante=None):
+        """
+        Procesa una imagen de hoja de respuestas y la califica automáticamente.
+        Si hay un layout cargado (cargar_layout), se califica en coordenadas conocidas
+        
+        Args:
+            ruta_imagen (str | ndarray): Ruta de la imagen o imagen ya decodificada
+            pagina (int): Página de la hoja a la que corresponde la imagen. Si no se indica
+                          se lee de la fila "PÁGINA" del layout (ver procesar_hoja_con_layout)
+            variante (int): Versión de la hoja (exámenes barajados). Si no se indica se lee de
+                            la fila "VERSIÓN", que solo está en la primera página
+        """
+        if self.layout is not None:
+            return self.procesar_hoja_con_layout(ruta_imagen, pagina, variante)
+        self.pagina = None
+        
         try:
+            self._iniciar_etapas(ruta_imagen)
+            
             # Cargar imagen
-            imagen = cv2.imread(ruta_imagen)
-            if imagen is None:
+            gris, imagen = self.decodificar_imagen(ruta_imagen)
+            if gris is None:
                 return 0, None, [], "No se pudo cargar la imagen"
             
-            # Mostrar imagen original
-            self.mostrar_imagen("1. Imagen Original", imagen)
-            
-            # Preprocesamiento mejorado
-            gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
-            self.mostrar_imagen("2. Escala de Grises", gris)
-            
-            # Mejorar contraste
-            gris_ecualizado = cv2.equalizeHist(gris)
-            self.mostrar_imagen("3. Ecualizado", gris_ecualizado)
+            self._emitir(1, "1. Imagen Original", 'decodificacion', salida=gris if imagen is None else imagen,
+                         factor_reduccion=self.factor_reduccion)
             
-            desenfocada = cv2.GaussianBlur(gris_ecualizado, (5, 5), 0)
-            self.mostrar_imagen("4. Desenfoque Gaussiano", desenfocada)
-            
-            bordes = cv2.Canny(desenfocada, 50, 150)
-            self.mostrar_imagen("5. Detección de Bordes (Canny)", bordes)
-
-            # Detectar contornos
-            contornos, _ = cv2.findContours(bordes.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Buscar contorno del documento
-            contorno_documento = None
-            for c in contornos:
-                perimetro = cv2.arcLength(c, True)
-                aprox = cv2.approxPolyDP(c, 0.02 * perimetro, True)
-                if len(aprox) == 4:
-                    area = cv2.contourArea(c)
-                    # Verificar que sea lo suficientemente grande
-                    if area > (imagen.shape[0] * imagen.shape[1] * 0.5):
-                        contorno_documento = aprox
-                        break
+            gris, contorno_documento = self.localizar_hoja(gris)
 
             if contorno_documento is None:
                 return 0, None, [], "No se detectó correctamente la hoja del examen"
 
             # Transformar perspectiva
-            hoja_color = four_point_transform(imagen, contorno_documento.reshape(4, 2))
+            hoja_color = self.vista_frontal_color(ruta_imagen, imagen, contorno_documento)
+            self._emitir(6, "6. Vista Frontal (Color)", 'transformacion', entrada=imagen, salida=hoja_color)
             hoja_gris = four_point_transform(gris, contorno_documento.reshape(4, 2))
-            
-            self.mostrar_imagen("6. Vista Frontal (Color)", hoja_color)
-            self.mostrar_imagen("7. Vista Frontal (Grises)", hoja_gris)
+            self._emitir(7, "7. Vista Frontal (Grises)", 'transformacion', entrada=gris, salida=hoja_gris)
             
             # Umbralización adaptativa para mejor detección
             umbral_adaptativo = cv2.adaptiveThreshold(
                 hoja_gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                 cv2.THRESH_BINARY_INV, 11, 2
             )
-            self.mostrar_imagen("8. Umbralización Adaptativa", umbral_adaptativo)
+            self._emitir(8, "8. Umbralización Adaptativa", 'umbralizacion', entrada=hoja_gris, salida=umbral_adaptativo)
             
             # Mejorar detección de burbujas
             umbral_mejorado = self.mejorar_deteccion_burbujas(umbral_adaptativo)
-            self.mostrar_imagen("9. Umbral Mejorado", umbral_mejorado)
+            self._emitir(9, "9. Umbral Mejorado", 'umbralizacion', entrada=umbral_adaptativo, salida=umbral_mejorado)
             
             # Detectar contornos en la imagen mejorada
             contornos_burbujas, _ = cv2.findContours(
@@ -295,95 +490,71 @@ class CalificadorAutomatico:
             
             # Filtrar burbujas válidas
             h, w = umbral_mejorado.shape
-            burbujas_validas, metricas = self.filtrar_burbujas_validas(
+            burbujas_validas, _ = self.filtrar_burbujas_validas(
                 contornos_burbujas, umbral_mejorado, w, h
             )
             
-            # Mostrar burbujas detectadas
-            imagen_burbujas = hoja_color.copy()
-            for i, burbuja in enumerate(burbujas_validas):
-                (x, y, w, h) = cv2.boundingRect(burbuja)
-                cv2.rectangle(imagen_burbujas, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                cv2.putText(imagen_burbujas, str(i+1), (x, y-5), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
-            
-            self.mostrar_imagen("10. Burbujas Detectadas", imagen_burbujas)
-            
             # Organizar burbujas por preguntas
             preguntas_burbujas = self.organizar_burbujas_por_preguntas(
                 burbujas_validas, self.num_preguntas, self.num_opciones
             )
             
-            # Procesar cada pregunta
-            correctas = 0
+            # Las burbujas detectadas solo se dibujan si algún gancho pide la imagen
+            self._emitir(10, "10. Burbujas Detectadas", 'deteccion_burbujas',
+                         imagen=lambda: dibujar_burbujas(hoja_gris if hoja_color is None else hoja_color,
+                                                         burbujas_validas),
+                         entrada=umbral_mejorado, contornos=len(contornos_burbujas),
+                         burbujas=len(burbujas_validas), preguntas=len(preguntas_burbujas))
+            
+            # Medir el relleno de todas las burbujas en una sola pasada
+            ratios, pixeles = calcular_matriz_relleno(
+                preguntas_burbujas, umbral_mejorado, self.num_opciones, devolver_pixeles=True
+            )
+            seleccionadas, confianzas = self.seleccionar_respuestas(ratios, pixeles)
+            self._emitir(None, "Medición de relleno", 'medicion_relleno', entrada=umbral_mejorado,
+                         marcadas=int((seleccionadas >= 0).sum()))
+            
+            # Comparar la hoja completa con la clave en una sola operación
+            claves = self.clave.respuestas_de(np.arange(len(preguntas_burbujas)))
+            aciertos = self.clave.comparar(seleccionadas)
             resultados_detallados = []
-            imagen_resultado = hoja_color.copy()
             
             for pregunta_idx, burbujas_pregunta in enumerate(preguntas_burbujas):
-                if None in burbujas_pregunta:
+                geometria = geometria_burbujas(burbujas_pregunta, w, h)
+                correcta = int(claves[pregunta_idx])
+                
+                if any(b is None for b in burbujas_pregunta):
                     # Pregunta incompleta
+                    aciertos[pregunta_idx] = False
                     resultados_detallados.append({
                         'pregunta': pregunta_idx + 1,
                         'seleccionada': None,
-                        'correcta': self.clave_respuestas.get(pregunta_idx, -1),
+                        'correcta': correcta,
                         'es_correcta': False,
                         'confianza': 0,
                         'letra_seleccionada': 'N/A',
-                        'letra_correcta': chr(65 + self.clave_respuestas.get(pregunta_idx, -1)) 
-                                       if self.clave_respuestas.get(pregunta_idx, -1) >= 0 else 'N/A',
-                        'error': 'Burbujas incompletas'
+                        'letra_correcta': chr(65 + correcta) if correcta >= 0 else 'N/A',
+                        'error': 'Burbujas incompletas',
+                        'burbujas': geometria
                     })
                     continue
                 
-                # Detectar burbuja marcada en esta pregunta
-                burbujas_marcadas, confianzas = self.detectar_burbujas_marcadas(
-                    burbujas_pregunta, umbral_mejorado
-                )
-                
-                # Encontrar la burbuja con mayor confianza de estar marcada
-                seleccionada = None
-                max_confianza = 0
-                
-                for opcion_idx, (marcada, confianza) in enumerate(zip(burbujas_marcadas, confianzas)):
-                    if marcada and confianza > max_confianza:
-                        max_confianza = confianza
-                        seleccionada = opcion_idx
-                
-                # Obtener respuesta correcta
-                respuesta_correcta = self.clave_respuestas.get(pregunta_idx, -1)
-                if isinstance(respuesta_correcta, str) and respuesta_correcta.isalpha():
-                    respuesta_correcta = ord(respuesta_correcta.upper()) - 65
-                
-                # Determinar si es correcta
-                es_correcta = (respuesta_correcta == seleccionada) if seleccionada is not None else False
-                
-                if es_correcta:
-                    correctas += 1
-                    color = (0, 255, 0)  # Verde
-                else:
-                    color = (0, 0, 255)  # Rojo
-                
-                # Guardar resultado detallado
-                resultados_detallados.append({
-                    'pregunta': pregunta_idx + 1,
-                    'seleccionada': seleccionada,
-                    'correcta': respuesta_correcta,
-                    'es_correcta': es_correcta,
-                    'confianza': max_confianza,
-                    'letra_seleccionada': chr(65 + seleccionada) if seleccionada is not None else 'N/A',
-                    'letra_correcta': chr(65 + respuesta_correcta) if respuesta_correcta >= 0 else 'N/A'
-                })
-                
-                # Dibujar en imagen de resultado
-                if seleccionada is not None:
-                    cv2.drawContours(imagen_resultado, [burbujas_pregunta[seleccionada]], -1, color, 3)
-                    
-                    # Marcar respuesta correcta si es incorrecta
-                    if not es_correcta and 0 <= respuesta_correcta < len(burbujas_pregunta):
-                        cv2.drawContours(imagen_resultado, [burbujas_pregunta[respuesta_correcta]], -1, (255, 255, 0), 2)
+                # Burbuja con mayor confianza de estar marcada en esta pregunta
+                seleccionada = int(seleccionadas[pregunta_idx]) if seleccionadas[pregunta_idx] >= 0 else None
+                resultado = self._resultado_pregunta(pregunta_idx, seleccionada, correcta,
+                                                     bool(aciertos[pregunta_idx]),
+                                                     float(confianzas[pregunta_idx]))
+                resultado['burbujas'] = geometria
+                resultados_detallados.append(resultado)
             
-            # Mostrar imagen final
-            self.mostrar_imagen("11. Resultado Final", imagen_resultado)
+            correctas = int(aciertos.sum())
+            
+            # Dibujar en imagen de resultado (solo si se pidió la vista en color)
+            imagen_resultado = None
+            if hoja_color is not None:
+                imagen_resultado = renderizar_anotaciones(hoja_color, resultados_detallados)
+            
+            self._emitir(11, "11. Resultado Final", 'anotacion', salida=imagen_resultado, correctas=correctas)
             
             # Calcular puntaje
             puntaje = (correctas / self.num_preguntas) * 100 if self.num_preguntas > 0 else 0
@@ -401,12 +572,553 @@ class CalificadorAutomatico:
                 cv2.destroyAllWindows()
             return 0, None, [], f"Error en el procesamiento: {str(e)}"
     
+    def _resultado_pregunta(self, pregunta_idx, seleccionada, respuesta_correcta, es_correcta, confianza):
+        """Arma el resultado detallado de una pregunta ya comparada con la clave"""
+        return {
+            'pregunta': pregunta_idx + 1,
+            'seleccionada': seleccionada,
+            'correcta': respuesta_correcta,
+            'es_correcta': es_correcta,
+            'confianza': confianza,
+            'letra_seleccionada': chr(65 + seleccionada) if seleccionada is not None else 'N/A',
+            'letra_correcta': chr(65 + respuesta_correcta) if respuesta_correcta >= 0 else 'N/A'
+        }
+    
+    def cargar_layout(self, ruta_layout):
+        """
+        Carga el manifiesto de layout generado junto a la hoja PDF
+        (GeneradorPDF.generar_hoja_respuestas_pdf). Con un layout cargado, las
+        burbujas se muestrean en sus posiciones conocidas en lugar de buscarlas
+        """
+        try:
+            with open(ruta_layout, 'r', encoding='utf-8') as f:
+                layout = json.load(f)
+            
+            if 'burbujas' not in layout or 'radio' not in layout:
+                raise ValueError("El archivo no es un manifiesto de layout válido")
+            
+            self.layout = layout
+            self.num_opciones = layout['num_opciones']
+            print(f"✅ Layout cargado: {layout['num_preguntas']} preguntas, {layout['num_opciones']} opciones")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error al cargar layout: {str(e)}")
+            return False
+    
+    def cargar_lista_alumnos(self, ruta_csv):
+        """
+        Carga la lista de alumnos (CSV, ver lista_alumnos.leer_lista_alumnos) para
+        asociar cada hoja calificada al alumno de la matrícula leída
+        """
+        try:
+            self.alumnos = indice_alumnos(leer_lista_alumnos(ruta_csv))
+            print(f"✅ Lista cargada: {len(self.alumnos)} alumnos")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error al cargar lista de alumnos: {str(e)}")
+            return False
+    
+    def cargar_variantes(self, ruta_npz):
+        """
+        Carga las versiones barajadas del examen (variantes_{tema}.npz). La clave
+        cargada debe ser la del orden original; cada hoja se devuelve a ese orden
+        según la versión marcada en ella, así que todos los resultados se comparan
+        pregunta por pregunta sin importar la versión
+        """
+        try:
+            self.variantes = AlmacenVariantes.cargar(ruta_npz)
+            self.usar_clave(ClaveRespuestas(self.variantes.clave))
+            print(f"✅ Versiones cargadas: {self.variantes.num_variantes} versiones, "
+                  f"{self.variantes.num_preguntas} preguntas")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error al cargar versiones: {str(e)}")
+            return False
+    
+    def leer_pagina(self, umbral):
+        """Página impresa en la fila "PÁGINA" del layout, o None si no hay exactamente una rellena"""
+        centros = np.array([self.layout['marca_pagina']['centros']], dtype=np.float64)
+        ratios, pixeles = muestrear_relleno_layout(umbral, centros, self.layout['radio'])
+        marcadas = self.evaluar_criterios_relleno(ratios, pixeles)[0]
+        if np.count_nonzero(marcadas) != 1:
+            return None
+        return int(np.argmax(marcadas))
+    
+    def leer_variante(self, umbral):
+        """Versión marcada en la fila "VERSIÓN" del layout, o None si no hay exactamente una"""
+        centros = np.array([self.layout['variante']['centros']], dtype=np.float64)
+        ratios, pixeles = muestrear_relleno_layout(umbral, centros, self.layout['radio'])
+        marcadas = self.evaluar_criterios_relleno(ratios, pixeles)[0]
+        if np.count_nonzero(marcadas) != 1:
+            return None
+        return int(np.argmax(marcadas))
+    
+    def buscar_alumno(self, matricula):
+        """Alumno de la lista con esa matrícula, o None si no se leyó completa o no está en la lista"""
+        if not matricula or '?' in matricula:
+            return None
+        return self.alumnos.get(normalizar_matricula(matricula))
+    
+    def leer_matricula(self, umbral):
+        """
+        Lee la cuadrícula de matrícula del layout sobre la hoja ya umbralizada, con
+        los mismos criterios de relleno que las respuestas. Cada dígito es la única
+        burbuja marcada de su columna; si no hay ninguna o hay varias queda '?'
+        
+        Returns:
+            str: Matrícula con tantos caracteres como dígitos tiene la cuadrícula
+        """
+        centros = np.array(self.layout['matricula']['centros'], dtype=np.float64)
+        ratios, pixeles = muestrear_relleno_layout(umbral, centros, self.layout['radio'])
+        marcadas = self.evaluar_criterios_relleno(ratios, pixeles)
+        
+        digitos = np.argmax(marcadas, axis=1)
+        legibles = np.count_nonzero(marcadas, axis=1) == 1
+        return ''.join(str(d) if ok else '?' for d, ok in zip(digitos, legibles))
+    
+    def procesar_hoja_con_layout(self, ruta_imagen, pagina=None, variante=None):
+        """
+        Califica una hoja usando las posiciones conocidas del layout: tras corregir
+        la perspectiva solo se muestrea el relleno en cada burbuja, sin detectar,
+        filtrar ni ordenar contornos
+        
+        Con versiones cargadas (cargar_variantes) las respuestas leídas se llevan
+        al orden original antes de compararlas con la clave: los resultados salen
+        en el orden original y con 'pregunta_hoja', el número impreso en la hoja
+        
+        Args:
+            ruta_imagen (str | ndarray): Ruta de la imagen escaneada o imagen ya decodificada
+            pagina (int): Página de la hoja a la que corresponde la imagen; si no se indica
+                          se lee de la fila "PÁGINA" (layouts de varias páginas que la
+                          tienen) y queda en self.pagina. Los layouts de una página no
+                          la necesitan; los de varias sin esa fila la exigen
+            variante (int): Versión de la hoja, si se conoce; si no, se lee de la fila
+                            "VERSIÓN" de la página que la contiene
+        """
+        try:
+            if self.layout is None:
+                return 0, None, [], "No hay un layout cargado"
+            
+            self.pagina = None
+            paginas_hoja = self.layout.get('num_paginas', 1)
+            if pagina is None and paginas_hoja == 1:
+                pagina = 0
+            elif pagina is None and not self.layout.get('marca_pagina'):
+                return 0, None, [], (f"El layout tiene {paginas_hoja} páginas y no tiene fila de página: "
+                                     f"indique la página de la imagen o califique el archivo completo "
+                                     f"con procesar_multipagina")
+            
+            if pagina is not None:
+                preguntas_pagina = [p for p in self.layout['burbujas'] if p['pagina'] == pagina]
+                if not preguntas_pagina:
+                    return 0, None, [], f"El layout no tiene preguntas en la página {pagina + 1}"
+            
+            self._iniciar_etapas(ruta_imagen)
+            
+            # Cargar imagen
+            gris, imagen = self.decodificar_imagen(ruta_imagen)
+            if gris is None:
+                return 0, None, [], "No se pudo cargar la imagen"
+            
+            self._emitir(1, "1. Imagen Original", 'decodificacion', salida=gris if imagen is None else imagen,
+                         factor_reduccion=self.factor_reduccion)
+            
+            gris, contorno_documento = self.localizar_hoja(gris)
+            
+            if contorno_documento is None:
+                return 0, None, [], "No se detectó correctamente la hoja del examen"
+            
+            # Transformar perspectiva
+            hoja_color = self.vista_frontal_color(ruta_imagen, imagen, contorno_documento)
+            self._emitir(6, "6. Vista Frontal (Color)", 'transformacion', entrada=imagen, salida=hoja_color)
+            hoja_gris = four_point_transform(gris, contorno_documento.reshape(4, 2))
+            self._emitir(7, "7. Vista Frontal (Grises)", 'transformacion', entrada=gris, salida=hoja_gris)
+            
+            # Umbral global: el interior de una burbuja rellena es uniforme y el
+            # umbral adaptativo solo marcaría su borde
+            umbral = cv2.threshold(hoja_gris, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+            self._emitir(8, "8. Umbralización (Otsu)", 'umbralizacion', entrada=hoja_gris, salida=umbral)
+            
+            if pagina is None:
+                pagina = self.leer_pagina(umbral)
+                if pagina is None:
+                    return 0, None, [], "No se pudo leer la página de la hoja"
+                preguntas_pagina = [p for p in self.layout['burbujas'] if p['pagina'] == pagina]
+                if not preguntas_pagina:
+                    return 0, None, [], f"El layout no tiene preguntas en la página {pagina + 1}"
+            self.pagina = pagina
+            
+            centros = np.array([p['centros'] for p in preguntas_pagina], dtype=np.float64)
+            ratios, pixeles = muestrear_relleno_layout(umbral, centros, self.layout['radio'])
+            seleccionadas, confianzas = self.seleccionar_respuestas(ratios, pixeles)
+            
+            # La matrícula se lee sobre el mismo umbral, en la misma pasada
+            matricula = self.layout.get('matricula')
+            if matricula and matricula['pagina'] == pagina:
+                self.matricula = self.leer_matricula(umbral)
+            
+            # Posición impresa de cada fila y opción elegida en el orden de la hoja
+            posiciones = [p['pregunta'] for p in preguntas_pagina]
+            preguntas_leidas = posiciones
+            if self.variantes is not None:
+                if variante is None:
+                    fila_variante = self.layout.get('variante')
+                    if not fila_variante or fila_variante['pagina'] != pagina:
+                        return 0, None, [], (f"La página {pagina + 1} no tiene la fila de versión: "
+                                             f"indique la versión de la hoja")
+                    variante = self.leer_variante(umbral)
+                    if variante is None:
+                        return 0, None, [], "No se pudo leer la versión de la hoja"
+                elif not 0 <= variante < self.variantes.num_variantes:
+                    return 0, None, [], f"Versión fuera de rango: {variante}"
+                self.variante = variante
+                # Búsqueda directa en las permutaciones de la versión
+                preguntas_leidas, seleccionadas = self.variantes.a_canonico(variante, posiciones, seleccionadas)
+            
+            self._emitir(None, "Medición de relleno", 'medicion_relleno', entrada=umbral,
+                         burbujas=int(centros.shape[0] * centros.shape[1]),
+                         marcadas=int((seleccionadas >= 0).sum()))
+            
+            # Comparar la página completa con la clave en una sola operación
+            claves = self.clave.respuestas_de(preguntas_leidas)
+            aciertos = self.clave.comparar(seleccionadas, preguntas_leidas)
+            correctas = int(aciertos.sum())
+            resultados_detallados = []
+            radio = self.layout['radio']
+            
+            for fila, pregunta in enumerate(preguntas_pagina):
+                seleccionada = int(seleccionadas[fila]) if seleccionadas[fila] >= 0 else None
+                resultado = self._resultado_pregunta(int(preguntas_leidas[fila]), seleccionada, int(claves[fila]),
+                                                     bool(aciertos[fila]), float(confianzas[fila]))
+                # Las posiciones del layout ya están normalizadas
+                burbujas = [[x, y, radio] for x, y in pregunta['centros']]
+                if self.variantes is not None:
+                    # Burbuja impresa de cada opción original, para anotar la hoja
+                    burbujas = [burbujas[j] for j in self.variantes.posicion_opciones[variante, pregunta['pregunta']]]
+                    resultado['pregunta_hoja'] = pregunta['pregunta'] + 1
+                resultado['burbujas'] = burbujas
+                resultados_detallados.append(resultado)
+            
+            if self.variantes is not None:
+                resultados_detallados.sort(key=lambda r: r['pregunta'])
+            
+            # Dibujar en imagen de resultado (solo si se pidió la vista en color)
+            imagen_resultado = None
+            if hoja_color is not None:
+                imagen_resultado = renderizar_anotaciones(hoja_color, resultados_detallados)
+            
+            self._emitir(11, "11. Resultado Final", 'anotacion', salida=imagen_resultado, correctas=correctas)
+            
+            # Calcular puntaje sobre las preguntas de esta página
+            puntaje = (correctas / len(preguntas_pagina)) * 100
+            
+            if self.modo_depuracion:
+                print("Presiona cualquier tecla en una ventana de OpenCV para continuar...")
+                cv2.waitKey(0)
+                cv2.destroyAllWindows()
+            
+            return puntaje, imagen_resultado, resultados_detallados, None
+            
+        except Exception as e:
+            if self.modo_depuracion:
+                cv2.waitKey(0)
+                cv2.destroyAllWindows()
+            return 0, None, [], f"Error en el procesamiento: {str(e)}"
+    
+    def procesar_multipagina(self, ruta_imagen, carpeta_salida=None):
+        """
+        Califica cada página de una imagen multipágina (TIFF del alimentador del
+        escáner) como una hoja independiente. Las páginas se decodifican de una
+        en una, así que la memoria no crece con el número de páginas
+        
+        Con un layout de varias páginas, las páginas del archivo se asignan en
+        ciclo a las páginas de la hoja (alumno 1: 0, 1; alumno 2: 0, 1; ...) y
+        la matrícula y la versión leídas en la página que las contiene se aplican
+        a toda la hoja
+        
+        Args:
+            ruta_imagen (str): Ruta del archivo (también acepta imágenes de una sola página)
+            carpeta_salida (str): Si se indica, guarda imagen y reporte de cada página
+        
+        Yields:
+            dict: {'ruta', 'pagina', 'puntaje', 'resultados', 'error', 'matricula', 'alumno',
+                  'variante'} por cada página
+        """
+        nombre_base, extension = os.path.splitext(os.path.basename(ruta_imagen))
+        paginas_hoja = self.layout.get('num_paginas', 1) if self.layout is not None else 1
+        pagina_matricula = (self.layout.get('matricula') or {}).get('pagina') if self.layout is not None else None
+        pagina_variante = (self.layout.get('variante') or {}).get('pagina') if self.layout is not None else None
+        matricula_hoja = None
+        variante_hoja = None
+        
+        # Las páginas no se pueden releer sueltas: el color solo se decodifica si se anota con
+        # la estrategia 'color'; con 'gris' o 'reducida' la imagen anotada se dibuja sobre los grises
+        if self.generar_imagen_resultado and self.estrategia_lectura == 'color':
+            flags = cv2.IMREAD_COLOR
+        else:
+            flags = cv2.IMREAD_GRAYSCALE
+        
+        for pagina, imagen in iterar_paginas(ruta_imagen, flags):
+            if pagina % paginas_hoja == 0:
+                matricula_hoja = None
+                variante_hoja = None
+            if imagen is None:
+                puntaje, imagen_procesada, resultados, error = 0, None, [], "No se pudo cargar la página"
+            elif self.layout is not None:
+                puntaje, imagen_procesada, resultados, error = self.procesar_hoja_con_layout(
+                    imagen, pagina % paginas_hoja, variante_hoja
+                )
+            else:
+                puntaje, imagen_procesada, resultados, error = self.procesar_hoja_respuestas(imagen)
+            del imagen
+            
+            if pagina_matricula == pagina % paginas_hoja:
+                matricula_hoja = self.matricula
+            if pagina_variante == pagina % paginas_hoja:
+                variante_hoja = self.variante
+            
+            if not error and carpeta_salida and imagen_procesada is not None:
+                try:
+                    nombre_pagina = f"{nombre_base}_p{pagina + 1:03d}{extension}"
+                    self.guardar_resultados(nombre_pagina, imagen_procesada, resultados, puntaje, carpeta_salida)
+                except Exception as e:
+                    error = f"Error al guardar resultados: {str(e)}"
+            
+            yield {
+                'ruta': ruta_imagen,
+                'pagina': pagina,
+                'puntaje': puntaje,
+                'resultados': resultados,
+                'error': error,
+                'matricula': matricula_hoja,
+                'alumno': self.buscar_alumno(matricula_hoja),
+                'variante': variante_hoja
+            }
+    
+    def hash_clave(self):
+        """Hash de la clave de respuestas cargada (independiente del formato de origen)"""
+        return hashlib.sha256(self.clave.respuestas.tobytes()).hexdigest()
+    
+    def parametros_cache(self):
+        """Parámetros que influyen en el resultado y forman parte de la llave de caché"""
+        layout = None
+        if self.layout is not None:
+            contenido = json.dumps(self.layout, sort_keys=True)
+            layout = hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+        
+        return {
+            'umbral_relleno_minimo': self.umbral_relleno_minimo,
+            'umbral_ratio_relleno': self.umbral_ratio_relleno,
+            'num_opciones': self.num_opciones,
+            'num_preguntas': self.num_preguntas,
+            'layout': layout,
+            'variantes': self.variantes.hash() if self.variantes is not None else None,
+            'estrategia_lectura': self.estrategia_lectura,
+            'lado_maximo_lectura': self.lado_maximo_lectura
+        }
+    
+    def llave_cache(self, ruta_imagen, pagina=None, variante=None):
+        """Llave de caché de una imagen con la clave y parámetros actuales (y página y versión, si se indican)"""
+        parametros = self.parametros_cache()
+        if pagina is not None:
+            parametros['pagina'] = pagina
+        if variante is not None:
+            parametros['variante_indicada'] = variante
+        return CacheResultados.calcular_llave(
+            calcular_hash_archivo(ruta_imagen), self.hash_clave(), parametros
+        )
+    
+    def calificar_con_cache(self, ruta_imagen, cache, pagina=None, variante=None):
+        """
+        Califica una hoja consultando primero la caché de resultados
+        
+        Args:
+            ruta_imagen (str): Ruta de la imagen
+            cache (CacheResultados): Caché en disco
+            pagina (int): Página de la hoja (ver procesar_hoja_respuestas)
+            variante (int): Versión de la hoja (ver procesar_hoja_respuestas)
+        
+        Returns:
+            tuple: (puntaje, resultados_detallados, error); la imagen anotada no se guarda en caché.
+                   La matrícula, la versión, la página y las esquinas de la hoja quedan en
+                   self.matricula, self.variante, self.pagina y self.esquinas_hoja, como sin caché
+        """
+        try:
+            llave = self.llave_cache(ruta_imagen, pagina, variante)
+        except OSError as e:
+            return 0, [], f"No se pudo leer la imagen: {str(e)}"
+        
+        guardado = cache.obtener(llave)
+        if guardado is not None:
+            self.matricula = guardado.get('matricula')
+            self.variante = guardado.get('variante')
+            self.pagina = guardado.get('pagina')
+            self.esquinas_hoja = guardado.get('esquinas')
+            return guardado['puntaje'], guardado['resultados'], None
+        
+        # La imagen anotada se descarta, así que no hace falta generarla
+        generar_imagen = self.generar_imagen_resultado
+        self.generar_imagen_resultado = False
+        try:
+            puntaje, _, resultados, error = self.procesar_hoja_respuestas(ruta_imagen, pagina, variante)
+        finally:
+            self.generar_imagen_resultado = generar_imagen
+        
+        if not error:
+            cache.guardar(llave, {'puntaje': puntaje, 'resultados': resultados, 'esquinas': self.esquinas_hoja,
+                                  'matricula': self.matricula, 'variante': self.variante, 'pagina': self.pagina})
+        
+        return puntaje, resultados, error
+    
+    def calificar_lote(self, rutas, num_procesos=None, hilos_opencv=1, carpeta_salida=None, cache=None,
+                       almacen=None, examen=None, paginas=None, variantes=None):
+        """
+        Califica varias hojas de respuestas en paralelo usando un pool de procesos
+        
+        Cada proceso recibe la clave una sola vez al iniciar. Las imágenes más
+        grandes se envían primero para equilibrar la carga, pero los resultados
+        se entregan en el mismo orden que `rutas`, a medida que van terminando.
+        
+        Args:
+            rutas (list): Rutas de las imágenes a calificar
+            num_procesos (int): Procesos del pool (por defecto, número de núcleos)
+            hilos_opencv (int): Hilos internos de OpenCV por proceso
+            carpeta_salida (str): Si se indica, cada proceso guarda imagen y reporte
+            cache (CacheResultados): Si se indica, las hojas ya calificadas con la misma
+                                     imagen, clave y parámetros no se vuelven a procesar
+            almacen (AlmacenResultados): Si se indica, el lote y cada hoja se registran en
+                                         la base de resultados, en bloques de una transacción
+            examen (str): Nombre del examen en la base de resultados (por defecto, el
+                          hash de la clave)
+            paginas (dict): Página de la hoja de cada ruta ({ruta: página}); las rutas que no
+                            están se califican leyendo la fila "PÁGINA" (ver procesar_hoja_con_layout)
+            variantes (dict): Versión de cada ruta ({ruta: versión}), para páginas sin la fila
+                              "VERSIÓN" de exámenes barajados; las demás la leen de la hoja
+        
+        Yields:
+            dict: {'ruta', 'puntaje', 'resultados', 'esquinas', 'matricula', 'alumno', 'variante',
+                  'pagina', 'error', 'tiempo_ms', 'desde_cache'} por cada imagen; con 'esquinas' y 'resultados' se
+                  puede generar después la imagen anotada (renderizar_resultado). 'matricula' es
+                  None si el layout no tiene cuadrícula de matrícula, y 'alumno' si además no
+                  está en la lista cargada; 'variante' es None sin versiones cargadas. 'tiempo_ms'
+                  es None si viene de la caché
+        """
+        rutas = list(rutas)
+        lote = self._calificar_lote(rutas, num_procesos, hilos_opencv, carpeta_salida, cache, paginas or {},
+                                    variantes or {})
+        if almacen is None or not rutas:
+            yield from lote
+            return
+        
+        registro = almacen.iniciar_lote(examen or f"clave_{self.hash_clave()[:12]}", self.hash_clave(),
+                                        origen=os.path.dirname(os.path.abspath(rutas[0])))
+        try:
+            for resultado in lote:
+                registro.agregar(resultado)
+                yield resultado
+        finally:
+            # También si el consumidor deja de iterar: lo ya calificado queda guardado
+            lote.close()
+            registro.cerrar()
+    
+    def _calificar_lote(self, rutas, num_procesos, hilos_opencv, carpeta_salida, cache, paginas, variantes):
+        """Implementación de calificar_lote (sin el registro en la base de resultados)"""
+        rutas = list(rutas)
+        if not rutas:
+            return
+        
+        # Consultar la caché antes de repartir trabajo
+        llaves = [None] * len(rutas)
+        guardados = {}
+        if cache is not None:
+            for i, ruta in enumerate(rutas):
+                try:
+                    llaves[i] = self.llave_cache(ruta, paginas.get(ruta), variantes.get(ruta))
+                except OSError:
+                    continue
+                guardado = cache.obtener(llaves[i])
+                if guardado is not None:
+                    guardados[i] = {
+                        'ruta': ruta,
+                        'puntaje': guardado['puntaje'],
+                        'resultados': guardado['resultados'],
+                        'esquinas': guardado.get('esquinas'),
+                        'matricula': guardado.get('matricula'),
+                        'alumno': self.buscar_alumno(guardado.get('matricula')),
+                        'variante': guardado.get('variante'),
+                        'pagina': guardado.get('pagina'),
+                        'error': None,
+                        'tiempo_ms': None,
+                        'desde_cache': True
+                    }
+        pendientes = [i for i in range(len(rutas)) if i not in guardados]
+        
+        if num_procesos is None:
+            num_procesos = os.cpu_count() or 1
+        num_procesos = max(1, min(num_procesos, len(pendientes)))
+        
+        configuracion = self.obtener_configuracion()
+        # Sin carpeta de salida nadie usa la imagen anotada
+        if carpeta_salida is None:
+            configuracion['generar_imagen_resultado'] = False
+        
+        def completar(i, resultado):
+            resultado['desde_cache'] = False
+            if cache is not None and llaves[i] is not None and not resultado['error']:
+                cache.guardar(llaves[i], {'puntaje': resultado['puntaje'], 'resultados': resultado['resultados'],
+                                          'esquinas': resultado['esquinas'], 'matricula': resultado['matricula'],
+                                          'variante': resultado['variante'], 'pagina': resultado['pagina']})
+            return resultado
+        
+        # Con un solo proceso no vale la pena pagar el arranque del pool
+        if num_procesos == 1:
+            calificador = CalificadorAutomatico.desde_configuracion(configuracion)
+            for i, ruta in enumerate(rutas):
+                if i in guardados:
+                    yield guardados[i]
+                else:
+                    yield completar(i, _calificar_hoja(calificador, ruta, carpeta_salida, paginas.get(ruta),
+                                                       variantes.get(ruta)))
+            return
+        
+        # Programar primero las imágenes más pesadas
+        orden_envio = sorted(pendientes, key=lambda i: _tamaño_archivo(rutas[i]), reverse=True)
+        
+        futuros = [None] * len(rutas)
+        with ProcessPoolExecutor(max_workers=num_procesos,
+                                 initializer=_inicializar_trabajador,
+                                 initargs=(configuracion, hilos_opencv)) as ejecutor:
+            try:
+                for i in orden_envio:
+                    futuros[i] = ejecutor.submit(_calificar_en_trabajador, rutas[i], carpeta_salida,
+                                                 paginas.get(rutas[i]), variantes.get(rutas[i]))
+                
+                for i, futuro in enumerate(futuros):
+                    if i in guardados:
+                        yield guardados[i]
+                    else:
+                        yield completar(i, futuro.result())
+            finally:
+                # Si el consumidor deja de iterar, no procesar lo pendiente
+                for futuro in futuros:
+                    if futuro is not None:
+                        futuro.cancel()
+    
     # Los métodos restantes (generar_reporte_calificacion, guardar_resultados) se mantienen igual
     def generar_reporte_calificacion(self, resultados_detallados, puntaje, nombre_archivo):
         """Genera un reporte de calificación en formato de texto"""
         reporte = f"REPORTE DE CALIFICACIÓN AUTOMÁTICA\n"
         reporte += f"================================\n"
         reporte += f"Archivo: {nombre_archivo}\n"
+        if self.matricula is not None:
+            alumno = self.buscar_alumno(self.matricula)
+            reporte += f"Matrícula: {self.matricula}\n"
+            reporte += f"Alumno: {alumno['nombre'] if alumno else 'No encontrado en la lista'}\n"
+        if self.variante is not None:
+            reporte += f"Versión: {letra_variante(self.variante)}\n"
         reporte += f"Total preguntas: {len(resultados_detallados)}\n"
         reporte += f"Puntaje: {puntaje:.2f}%\n\n"
         
@@ -443,6 +1155,386 @@ class CalificadorAutomatico:
         
         return ruta_imagen_guardada, ruta_reporte
 
+def geometria_burbujas(burbujas, ancho, alto):
+    """
+    Geometría de las burbujas de una pregunta como círculos [x, y, radio]
+    normalizados al ancho y alto de la hoja (como en el manifiesto de layout),
+    para poder anotar después cualquier vista frontal de la hoja. Las burbujas
+    faltantes quedan como None
+    """
+    geometria = []
+    for burbuja in burbujas:
+        if burbuja is None:
+            geometria.append(None)
+            continue
+        (x, y), radio = cv2.minEnclosingCircle(burbuja)
+        geometria.append([round(x / ancho, 5), round(y / alto, 5), round(radio / ancho, 5)])
+    return geometria
+
+def renderizar_anotaciones(hoja, resultados_detallados):
+    """
+    Anota una vista frontal de la hoja con los resultados: la opción
+    seleccionada en verde (correcta) o rojo (incorrecta) y, si no acertó, la
+    correcta en cian. Usa la geometría normalizada de cada resultado, así que
+    sirve para cualquier resolución de la hoja. Dibuja sobre `hoja` y la devuelve
+    """
+    alto, ancho = hoja.shape[:2]
+    
+    for resultado in resultados_detallados:
+        burbujas = resultado.get('burbujas')
+        if not burbujas:
+            continue
+        
+        seleccionada = resultado['seleccionada']
+        if seleccionada is not None and seleccionada < len(burbujas) and burbujas[seleccionada] is not None:
+            x, y, r = burbujas[seleccionada]
+            color = (0, 255, 0) if resultado['es_correcta'] else (0, 0, 255)
+            cv2.circle(hoja, (int(round(x * ancho)), int(round(y * alto))), max(1, int(round(r * ancho))), color, 3)
+        
+        # Marcar respuesta correcta si es incorrecta
+        respuesta_correcta = resultado['correcta']
+        if (not resultado['es_correcta'] and 0 <= respuesta_correcta < len(burbujas)
+                and burbujas[respuesta_correcta] is not None):
+            x, y, r = burbujas[respuesta_correcta]
+            cv2.circle(hoja, (int(round(x * ancho)), int(round(y * alto))), max(1, int(round(r * ancho))),
+                       (255, 255, 0), 2)
+    
+    return hoja
+
+def dibujar_burbujas(imagen_base, burbujas):
+    """Dibuja el rectángulo y el número de cada burbuja detectada (imagen de depuración)"""
+    imagen_burbujas = imagen_base.copy() if imagen_base.ndim == 3 else cv2.cvtColor(imagen_base, cv2.COLOR_GRAY2BGR)
+    for i, burbuja in enumerate(burbujas):
+        (x, y, w, h) = cv2.boundingRect(burbuja)
+        cv2.rectangle(imagen_burbujas, (x, y), (x+w, y+h), (0, 255, 0), 2)
+        cv2.putText(imagen_burbujas, str(i+1), (x, y-5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+    return imagen_burbujas
+
+# Etapas del pipeline, en orden, con tiempos en CalificadorAutomatico.tiempos_etapas
+ETAPAS = (
+    'decodificacion', 'preprocesamiento', 'localizacion', 'transformacion', 'umbralizacion',
+    'deteccion_burbujas', 'medicion_relleno', 'anotacion'
+)
+
+# Vistas numeradas que emite el pipeline (EventoEtapa.numero va de 1 a NUM_VISTAS)
+NUM_VISTAS = 11
+
+# ==============================
+# Decodificación de imágenes
+# ==============================
+
+# Factor de reducción -> (bandera en grises, bandera en color) para cv2.imread
+FLAGS_LECTURA = {
+    1: (cv2.IMREAD_GRAYSCALE, cv2.IMREAD_COLOR),
+    2: (cv2.IMREAD_REDUCED_GRAYSCALE_2, cv2.IMREAD_REDUCED_COLOR_2),
+    4: (cv2.IMREAD_REDUCED_GRAYSCALE_4, cv2.IMREAD_REDUCED_COLOR_4),
+    8: (cv2.IMREAD_REDUCED_GRAYSCALE_8, cv2.IMREAD_REDUCED_COLOR_8)
+}
+
+def elegir_factor_reduccion(ruta_imagen, lado_maximo):
+    """
+    Elige el mayor factor de reducción (1, 2, 4 u 8) que deja el lado mayor de la
+    imagen en al menos `lado_maximo` píxeles. Las dimensiones se leen de la
+    cabecera del archivo, sin decodificar los píxeles
+    """
+    try:
+        with Image.open(ruta_imagen) as imagen:
+            lado = max(imagen.size)
+    except Exception:
+        return 1
+    
+    factor = 1
+    while factor < 8 and lado / (factor * 2) >= lado_maximo:
+        factor *= 2
+    return factor
+
+# ==============================
+# Lectura de imágenes multipágina
+# ==============================
+
+def contar_paginas(ruta_imagen):
+    """Número de páginas de una imagen (1 para formatos de una sola página, 0 si no se puede leer)"""
+    try:
+        return cv2.imcount(ruta_imagen)
+    except cv2.error:
+        return 0
+
+def iterar_paginas(ruta_imagen, flags=cv2.IMREAD_COLOR):
+    """
+    Recorre las páginas de una imagen multipágina (TIFF) decodificando una sola
+    página a la vez
+    
+    Yields:
+        tuple: (indice_pagina, imagen); la imagen es None si la página no se pudo decodificar
+    """
+    num_paginas = contar_paginas(ruta_imagen)
+    
+    if num_paginas <= 1:
+        yield 0, cv2.imread(ruta_imagen, flags)
+        return
+    
+    for pagina in range(num_paginas):
+        ok, imagenes = cv2.imreadmulti(ruta_imagen, pagina, 1, flags=flags)
+        yield pagina, imagenes[0] if ok and imagenes else None
+
+# ==============================
+# Localización de la hoja
+# ==============================
+
+def localizar_documento(gris, umbral_canny=(50, 150), area_minima=0.0, ecualizar=False,
+                        lado_maximo=500, max_candidatos=5, depuracion=None):
+    """
+    Busca las cuatro esquinas de la hoja de forma gruesa a fina
+    
+    La búsqueda de contornos se hace en un nivel reducido de la pirámide
+    (pyrDown hasta que el lado mayor no supere `lado_maximo`) y solo se prueban
+    los `max_candidatos` contornos de mayor área. Las esquinas encontradas se
+    refinan después con cornerSubPix sobre la imagen a resolución completa.
+    
+    Args:
+        gris (ndarray): Imagen en escala de grises a resolución completa
+        umbral_canny (tuple): Umbrales bajo y alto para Canny
+        area_minima (float): Fracción mínima del área de la imagen que debe cubrir la hoja
+        ecualizar (bool): Ecualizar el histograma antes de buscar bordes
+        lado_maximo (int): Lado mayor del nivel de la pirámide donde se busca
+        max_candidatos (int): Contornos de mayor área que se evalúan
+        depuracion (callable): Función (numero, titulo, imagen, **conteos) que recibe
+            los pasos intermedios (etapas 3 a 5); solo se llama si se indica
+    
+    Returns:
+        tuple: (contorno_documento, tiempo_ms); el contorno (4, 1, 2) es None si no se detecta
+    """
+    inicio = time.perf_counter()
+    
+    # Bajar por la pirámide hasta el tamaño de trabajo
+    reducida = gris
+    escala = 1
+    while max(reducida.shape[:2]) > lado_maximo:
+        reducida = cv2.pyrDown(reducida)
+        escala *= 2
+    
+    if ecualizar:
+        reducida = cv2.equalizeHist(reducida)
+        if depuracion:
+            depuracion(3, "3. Ecualizado", reducida)
+    
+    desenfocada = cv2.GaussianBlur(reducida, (5, 5), 0)
+    if depuracion:
+        depuracion(4, "4. Desenfoque Gaussiano", desenfocada)
+    
+    bordes = cv2.Canny(desenfocada, umbral_canny[0], umbral_canny[1])
+    contornos, _ = cv2.findContours(bordes, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if depuracion:
+        depuracion(5, "5. Detección de Bordes (Canny)", bordes, contornos=len(contornos), escala=escala)
+    
+    candidatos = heapq.nlargest(max_candidatos, contornos, key=cv2.contourArea)
+    area_requerida = reducida.shape[0] * reducida.shape[1] * area_minima
+    
+    contorno_documento = None
+    for c in candidatos:
+        if cv2.contourArea(c) < area_requerida:
+            break
+        
+        perimetro = cv2.arcLength(c, True)
+        aprox = cv2.approxPolyDP(c, 0.02 * perimetro, True)
+        if len(aprox) == 4:
+            contorno_documento = _refinar_esquinas(gris, aprox.reshape(4, 2), escala)
+            break
+    
+    tiempo_ms = (time.perf_counter() - inicio) * 1000
+    return contorno_documento, tiempo_ms
+
+def _refinar_esquinas(gris, esquinas, escala):
+    """Lleva las esquinas de un nivel reducido a resolución completa y las refina"""
+    # Centro del píxel reducido en coordenadas de la imagen completa
+    esquinas = (esquinas.astype(np.float32) + 0.5) * escala - 0.5
+    
+    if escala > 1:
+        alto, ancho = gris.shape[:2]
+        ventana = max(3, 2 * escala)
+        margen = ventana + 1
+        dentro = ((esquinas[:, 0] >= margen) & (esquinas[:, 0] < ancho - margen) &
+                  (esquinas[:, 1] >= margen) & (esquinas[:, 1] < alto - margen))
+        
+        if dentro.any():
+            refinadas = esquinas[dentro].reshape(-1, 1, 2).copy()
+            criterio = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+            cv2.cornerSubPix(gris, refinadas, (ventana, ventana), (-1, -1), criterio)
+            refinadas = refinadas.reshape(-1, 2)
+            
+            # Descartar refinamientos que se alejan más que la incertidumbre del nivel reducido
+            desplazamiento = np.linalg.norm(refinadas - esquinas[dentro], axis=1)
+            aceptadas = desplazamiento <= escala
+            esquinas_dentro = esquinas[dentro]
+            esquinas_dentro[aceptadas] = refinadas[aceptadas]
+            esquinas[dentro] = esquinas_dentro
+    
+    return esquinas.reshape(4, 1, 2)
+
+# ==============================
+# Medición de relleno en una sola pasada
+# ==============================
+
+def medir_relleno_burbujas(burbujas, umbral):
+    """
+    Mide los píxeles marcados y el área en píxeles de varias burbujas a la vez
+    
+    En lugar de crear una máscara del tamaño de la hoja por burbuja, pinta todos
+    los contornos en una sola imagen de etiquetas (recortada al rectángulo que
+    los contiene) y cuenta con np.bincount.
+    
+    Args:
+        burbujas (list): Contornos de las burbujas
+        umbral (ndarray): Imagen binaria (marcado > 0)
+    
+    Returns:
+        tuple: (pixeles_marcados, areas) como arreglos de longitud len(burbujas)
+    """
+    n = len(burbujas)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    
+    rectangulos = np.array([cv2.boundingRect(c) for c in burbujas])
+    alto, ancho = umbral.shape[:2]
+    x0 = max(int(rectangulos[:, 0].min()), 0)
+    y0 = max(int(rectangulos[:, 1].min()), 0)
+    x1 = min(int((rectangulos[:, 0] + rectangulos[:, 2]).max()), ancho)
+    y1 = min(int((rectangulos[:, 1] + rectangulos[:, 3]).max()), alto)
+    
+    # Etiqueta i+1 para la burbuja i, 0 para el fondo
+    etiquetas = np.zeros((y1 - y0, x1 - x0), dtype=np.int32)
+    for i, c in enumerate(burbujas):
+        cv2.drawContours(etiquetas, [c], -1, i + 1, -1, offset=(-x0, -y0))
+    
+    etiquetas = etiquetas.ravel()
+    marcados = umbral[y0:y1, x0:x1].ravel() > 0
+    
+    areas = np.bincount(etiquetas, minlength=n + 1)[1:]
+    pixeles = np.bincount(etiquetas[marcados], minlength=n + 1)[1:]
+    return pixeles, areas
+
+def calcular_matriz_relleno(preguntas_burbujas, umbral, num_opciones, devolver_pixeles=False):
+    """
+    Calcula la matriz de ratios de relleno (num_preguntas, num_opciones)
+    
+    Args:
+        preguntas_burbujas (list): Por cada pregunta, sus contornos ordenados por opción
+                                   (None donde falta una burbuja)
+        umbral (ndarray): Imagen binaria de la hoja
+        num_opciones (int): Número de opciones por pregunta
+        devolver_pixeles (bool): Devolver también la matriz de píxeles marcados
+    
+    Returns:
+        ndarray: Ratios de relleno (NaN donde falta la burbuja), o la tupla
+                 (ratios, pixeles) si devolver_pixeles es True
+    """
+    num_preguntas = len(preguntas_burbujas)
+    contornos = []
+    posiciones = []
+    for pregunta_idx, burbujas_pregunta in enumerate(preguntas_burbujas):
+        for opcion_idx, c in enumerate(list(burbujas_pregunta)[:num_opciones]):
+            if c is not None:
+                contornos.append(c)
+                posiciones.append(pregunta_idx * num_opciones + opcion_idx)
+    
+    pixeles_burbujas, areas = medir_relleno_burbujas(contornos, umbral)
+    
+    ratios = np.full(num_preguntas * num_opciones, np.nan)
+    pixeles = np.zeros(num_preguntas * num_opciones, dtype=np.int64)
+    if posiciones:
+        ratios[posiciones] = pixeles_burbujas / np.maximum(areas, 1)
+        pixeles[posiciones] = pixeles_burbujas
+    
+    ratios = ratios.reshape(num_preguntas, num_opciones)
+    if devolver_pixeles:
+        return ratios, pixeles.reshape(num_preguntas, num_opciones)
+    return ratios
+
+def muestrear_relleno_layout(umbral, centros, radio, factor_radio=0.7):
+    """
+    Mide el relleno en posiciones conocidas de burbujas, todas a la vez
+    
+    Args:
+        umbral (ndarray): Imagen binaria de la hoja ya rectificada
+        centros (ndarray): Centros normalizados (x, y) con forma (..., 2)
+        radio (float): Radio de la burbuja normalizado al ancho de la hoja
+        factor_radio (float): Fracción del radio a muestrear (excluye el contorno impreso)
+    
+    Returns:
+        tuple: (ratios, pixeles) con la forma de centros[..., 0]
+    """
+    alto, ancho = umbral.shape[:2]
+    r = max(1.0, radio * ancho * factor_radio)
+    
+    # Desplazamientos del disco de muestreo, comunes a todas las burbujas
+    r_int = int(np.ceil(r))
+    dy, dx = np.mgrid[-r_int:r_int + 1, -r_int:r_int + 1]
+    dentro = dx * dx + dy * dy <= r * r
+    dx, dy = dx[dentro], dy[dentro]
+    
+    cx = np.rint(centros[..., 0] * ancho).astype(np.intp)
+    cy = np.rint(centros[..., 1] * alto).astype(np.intp)
+    xs = np.clip(cx[..., None] + dx, 0, ancho - 1)
+    ys = np.clip(cy[..., None] + dy, 0, alto - 1)
+    
+    pixeles = np.count_nonzero(umbral[ys, xs], axis=-1)
+    return pixeles / float(len(dx)), pixeles
+
+# ==============================
+# Trabajadores para calificación por lotes
+# ==============================
+
+# Calificador propio de cada proceso del pool (se crea una vez por proceso)
+_calificador_trabajador = None
+
+def _inicializar_trabajador(configuracion, hilos_opencv):
+    """Prepara un proceso del pool: limita los hilos de OpenCV y carga la clave una vez"""
+    global _calificador_trabajador
+    cv2.setNumThreads(hilos_opencv)
+    _calificador_trabajador = CalificadorAutomatico.desde_configuracion(configuracion)
+
+def _calificar_en_trabajador(ruta_imagen, carpeta_salida, pagina=None, variante=None):
+    return _calificar_hoja(_calificador_trabajador, ruta_imagen, carpeta_salida, pagina, variante)
+
+def _calificar_hoja(calificador, ruta_imagen, carpeta_salida, pagina=None, variante=None):
+    """Califica una hoja y devuelve un resultado ligero (sin la imagen) para el lote"""
+    inicio = time.perf_counter()
+    puntaje, imagen_procesada, resultados, error = calificador.procesar_hoja_respuestas(ruta_imagen, pagina, variante)
+    
+    if not error and carpeta_salida and imagen_procesada is not None:
+        try:
+            calificador.guardar_resultados(ruta_imagen, imagen_procesada, resultados, puntaje, carpeta_salida)
+        except Exception as e:
+            error = f"Error al guardar resultados: {str(e)}"
+    
+    return {
+        'ruta': ruta_imagen,
+        'puntaje': puntaje,
+        'resultados': resultados,
+        'esquinas': calificador.esquinas_hoja if not error else None,
+        'matricula': calificador.matricula,
+        'alumno': calificador.buscar_alumno(calificador.matricula),
+        'variante': calificador.variante,
+        'pagina': calificador.pagina,
+        'error': error,
+        'tiempo_ms': (time.perf_counter() - inicio) * 1000
+    }
+
+def calcular_hash_archivo(ruta, tamaño_bloque=1 << 20):
+    """Calcula el hash SHA-256 del contenido de un archivo, leyendo por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamaño_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _tamaño_archivo(ruta):
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return 0
+
 # Función de conveniencia para uso rápido (se mantiene igual)
 def calificar_examen_rapido(ruta_imagen, ruta_json_clave, carpeta_salida=None, modo_depuracion=False):
     calificador = CalificadorAutomatico(modo_depuracion=modo_depuracion)
@@ -462,43 +1554,5 @@ def calificar_examen_rapido(ruta_imagen, ruta_json_clave, carpeta_salida=None, m
 
 # Función para convertir TXT a JSON (se mantiene igual)
 def generar_json_clave_desde_txt(ruta_txt, ruta_salida_json=None):
-    clave_respuestas = {}
-    
-    try:
-        with open(ruta_txt, 'r', encoding='utf-8') as f:
-            lineas = f.readlines()
-        
-        for linea in lineas:
-            linea = linea.strip()
-            if not linea or 'Pregunta' not in linea:
-                continue
-                
-            partes = linea.split(':')
-            if len(partes) >= 2:
-                pregunta_part = partes[0].strip()
-                respuesta_part = partes[1].strip()
-                
-                num_pregunta = ''.join(filter(str.isdigit, pregunta_part))
-                if num_pregunta:
-                    num_pregunta = int(num_pregunta) - 1
-                    
-                    if respuesta_part and respuesta_part[0].isalpha():
-                        clave_respuestas[num_pregunta] = respuesta_part[0].upper()
-                    elif respuesta_part.isdigit():
-                        clave_respuestas[num_pregunta] = int(respuesta_part)
-    
-    except Exception as e:
-        raise ValueError(f"Error al procesar archivo TXT: {str(e)}")
-    
-    datos_json = {
-        "respuestas": clave_respuestas,
-        "total_preguntas": len(clave_respuestas),
-        "fecha_generacion": str(np.datetime64('now')),
-        "formato": "pregunta_idx: respuesta"
-    }
-    
-    if ruta_salida_json:
-        with open(ruta_salida_json, 'w', encoding='utf-8') as f:
-            json.dump(datos_json, f, ensure_ascii=False, indent=2)
-    
-    return datos_json
\ No newline at end of file
+    """Convierte un archivo TXT de claves a JSON (ver clave_respuestas.generar_json_clave_desde_txt)"""
+    return _generar_json_clave_desde_txt(ruta_txt, ruta_salida_json)
@@ -0,0 +1,220 @@
+# [file name]: clave_respuestas.py
+import os
+import json
+import numpy as np
+
+
+class ClaveRespuestas:
+    """
+    Clave de respuestas compilada: un arreglo int8 con el índice de la opción
+    correcta de cada pregunta (-1 si la pregunta no tiene respuesta) y metadatos
+
+    Es la representación común de ambos flujos de calificación, así que la
+    comparación de una hoja completa se hace con una sola operación vectorizada.
+    """
+
+    def __init__(self, respuestas, metadatos=None):
+        self.respuestas = np.asarray(respuestas, dtype=np.int8).reshape(-1)
+        self.metadatos = metadatos or {}
+
+    def __len__(self):
+        return len(self.respuestas)
+
+    def __repr__(self):
+        return f"ClaveRespuestas({len(self)} preguntas)"
+
+    @property
+    def num_preguntas(self):
+        return len(self.respuestas)
+
+    def correcta(self, pregunta_idx):
+        """Índice de la opción correcta de una pregunta (-1 si no existe)"""
+        if 0 <= pregunta_idx < len(self.respuestas):
+            return int(self.respuestas[pregunta_idx])
+        return -1
+
+    def respuestas_de(self, preguntas):
+        """Índice de la opción correcta de cada pregunta indicada (-1 si no existe)"""
+        preguntas = np.asarray(preguntas, dtype=np.int64).reshape(-1)
+        correctas = np.full(len(preguntas), -1, dtype=np.int16)
+        validas = (preguntas >= 0) & (preguntas < len(self.respuestas))
+        correctas[validas] = self.respuestas[preguntas[validas]]
+        return correctas
+
+    def comparar(self, seleccionadas, preguntas=None):
+        """
+        Compara las opciones seleccionadas con la clave
+
+        Args:
+            seleccionadas (array): Índice seleccionado por pregunta (-1 o None si no hay)
+            preguntas (array): Pregunta de la clave de cada selección (por defecto,
+                               la selección i corresponde a la pregunta i)
+
+        Returns:
+            ndarray: Arreglo booleano con las preguntas correctas
+        """
+        seleccionadas = np.array([-1 if s is None else s for s in seleccionadas], dtype=np.int16)
+        if preguntas is None:
+            preguntas = np.arange(len(seleccionadas))
+        correctas = self.respuestas_de(preguntas)
+        return (seleccionadas == correctas) & (correctas >= 0)
+
+    def como_diccionario(self):
+        """Clave en el formato de diccionario {pregunta_idx: opcion_idx} usado antes"""
+        return {i: int(r) for i, r in enumerate(self.respuestas) if r >= 0}
+
+    @classmethod
+    def desde_datos(cls, datos_clave, metadatos=None):
+        """
+        Compila una clave desde cualquiera de los formatos de JSON aceptados:
+        {"respuestas": {...}} o {"respuestas": [...]}, una lista directa, o un
+        diccionario {"pregunta1": ..., "2": ...}. Las respuestas pueden ser
+        letras ("B"), índices (1) o diccionarios con la llave "correcta"
+        """
+        if isinstance(datos_clave, dict) and 'respuestas' in datos_clave:
+            respuestas = datos_clave['respuestas']
+            if metadatos is None:
+                metadatos = {k: v for k, v in datos_clave.items() if k != 'respuestas'}
+        else:
+            respuestas = datos_clave
+
+        if isinstance(respuestas, list):
+            pares = list(enumerate(respuestas))
+        else:
+            # Buscar respuestas en diferentes formatos
+            pares = []
+            for key, value in respuestas.items():
+                key = str(key)
+                if 'pregunta' in key.lower():
+                    pares.append((int(key.lower().replace('pregunta', '')), value))
+                elif key.isdigit():
+                    pares.append((int(key), value))
+
+        indices = [idx for idx, _ in pares]
+        arreglo = np.full(max(indices) + 1 if indices else 0, -1, dtype=np.int8)
+        for idx, value in pares:
+            arreglo[idx] = _indice_opcion(value)
+
+        return cls(arreglo, metadatos)
+
+    @classmethod
+    def desde_txt(cls, ruta_txt):
+        """Compila una clave desde un archivo TXT con líneas "Pregunta X: Y" """
+        return cls.desde_datos({"respuestas": {str(k): v for k, v in leer_clave_txt(ruta_txt).items()}},
+                               metadatos={"origen": os.path.basename(ruta_txt)})
+
+
+def _indice_opcion(valor):
+    """Convierte una respuesta (letra, número o {"correcta": ...}) a índice de opción"""
+    if isinstance(valor, dict):
+        return _indice_opcion(valor.get('correcta', -1))
+    if isinstance(valor, str):
+        valor = valor.strip()
+        # Convertir letras a índices (A=0, B=1, etc.)
+        if valor.isalpha():
+            return ord(valor[0].upper()) - 65
+        if valor.lstrip('-').isdigit():
+            return int(valor)
+        return -1
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    return -1
+
+
+# Claves ya compiladas: ruta absoluta -> (mtime_ns, tamaño, clave)
+_claves_cargadas = {}
+
+def cargar_clave(ruta):
+    """
+    Carga y compila una clave desde JSON (o TXT), reutilizando la versión ya
+    compilada mientras el archivo no cambie (misma fecha de modificación y tamaño)
+    """
+    ruta_absoluta = os.path.abspath(ruta)
+    info = os.stat(ruta_absoluta)
+    firma = (info.st_mtime_ns, info.st_size)
+
+    guardada = _claves_cargadas.get(ruta_absoluta)
+    if guardada is not None and guardada[0] == firma:
+        return guardada[1]
+
+    if ruta_absoluta.lower().endswith('.txt'):
+        clave = ClaveRespuestas.desde_txt(ruta_absoluta)
+    else:
+        with open(ruta_absoluta, 'r', encoding='utf-8') as f:
+            clave = ClaveRespuestas.desde_datos(json.load(f))
+
+    # La misma instancia se entrega a todos los que carguen este archivo: de solo lectura,
+    # para que nadie altere la clave de las calificaciones siguientes
+    clave.respuestas.flags.writeable = False
+    _claves_cargadas[ruta_absoluta] = (firma, clave)
+    return clave
+
+
+def leer_clave_txt(ruta_txt):
+    """
+    Lee un archivo TXT de claves con líneas "Pregunta X: Y"
+
+    Returns:
+        dict: {pregunta_idx: respuesta} con la respuesta como letra o número, tal como aparece
+    """
+    clave_respuestas = {}
+
+    try:
+        with open(ruta_txt, 'r', encoding='utf-8') as f:
+            lineas = f.readlines()
+
+        for linea in lineas:
+            linea = linea.strip()
+            if not linea or 'Pregunta' not in linea:
+                continue
+
+            # Buscar patrones como "Pregunta X: Y"
+            partes = linea.split(':')
+            if len(partes) >= 2:
+                pregunta_part = partes[0].strip()
+                respuesta_part = partes[1].strip()
+
+                # Extraer número de pregunta
+                num_pregunta = ''.join(filter(str.isdigit, pregunta_part))
+                if num_pregunta:
+                    num_pregunta = int(num_pregunta) - 1  # Convertir a índice 0-based
+
+                    # Extraer respuesta (puede ser letra o número)
+                    if respuesta_part and respuesta_part[0].isalpha():
+                        clave_respuestas[num_pregunta] = respuesta_part[0].upper()
+                    elif respuesta_part.isdigit():
+                        clave_respuestas[num_pregunta] = int(respuesta_part)
+
+    except Exception as e:
+        raise ValueError(f"Error al procesar archivo TXT: {str(e)}")
+
+    return clave_respuestas
+
+
+def generar_json_clave_desde_txt(ruta_txt, ruta_salida_json=None):
+    """
+    Convierte un archivo TXT de claves a formato JSON
+
+    Args:
+        ruta_txt (str): Ruta del archivo TXT con claves
+        ruta_salida_json (str): Ruta de salida para el JSON (opcional)
+
+    Returns:
+        dict: Datos en formato JSON
+    """
+    clave_respuestas = leer_clave_txt(ruta_txt)
+
+    # Crear estructura JSON
+    datos_json = {
+        "respuestas": clave_respuestas,
+        "total_preguntas": len(clave_respuestas),
+        "fecha_generacion": str(np.datetime64('now')),
+        "formato": "pregunta_idx: respuesta"
+    }
+
+    # Guardar si se especifica ruta de salida
+    if ruta_salida_json:
+        with open(ruta_salida_json, 'w', encoding='utf-8') as f:
+            json.dump(datos_json, f, ensure_ascii=False, indent=2)
+
+    return datos_json
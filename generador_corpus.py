@@ -0,0 +1,413 @@
+# [file name]: generador_corpus.py
+# ================================================
+# 🏭 GENERADOR DE CORPUS SINTÉTICO
+# Dibuja hojas de respuestas con la misma geometría que
+# GeneradorPDF.generar_hoja_respuestas_pdf, las rellena a
+# partir de respuestas conocidas y les aplica degradaciones
+# de escaneo/fotografía (rotación, perspectiva, desenfoque,
+# ruido, iluminación irregular y compresión JPEG).
+# Junto a las imágenes escribe la clave, el layout y la
+# verdad de cada hoja para probar la calificación a escala.
+# ================================================
+
+import os
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from logica import GeneradorPDF
+
+LETRAS_OPCIONES = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
+# Degradaciones por defecto: cada valor es el máximo que se sortea por hoja
+DEGRADACIONES_POR_DEFECTO = {
+    'rotacion': 4.0,          # grados
+    'perspectiva': 0.04,      # desplazamiento máximo de cada esquina (fracción del lado)
+    'desenfoque': 1.5,        # sigma del desenfoque gaussiano (píxeles)
+    'ruido': 8.0,             # desviación estándar del ruido gaussiano
+    'iluminacion': 0.35,      # caída máxima de brillo del gradiente de luz
+    'calidad_jpeg': (55, 95)  # rango de calidad JPEG
+}
+
+
+# ------------------------------------------------
+# 🖊️ Dibujo de la hoja
+# ------------------------------------------------
+def renderizar_hoja(layout, pagina, respuestas, dpi=150, tema="Corpus", rng=None):
+    """
+    Dibuja una página de la hoja de respuestas en escala de grises, con las
+    burbujas rellenas a lápiz según `respuestas`
+
+    Args:
+        layout (dict): Geometría de GeneradorPDF.calcular_layout_hoja
+        pagina (int): Página a dibujar
+        respuestas (list): Opción marcada por pregunta (-1 = en blanco, lista = varias)
+        dpi (int): Resolución de la imagen
+        tema (str): Tema que aparece en el título
+        rng (Generator): Generador aleatorio para la variación del relleno
+
+    Returns:
+        ndarray: Imagen de la página (uint8, un canal)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    escala = dpi / 72.0
+    ancho = int(round(layout['ancho'] * escala))
+    alto = int(round(layout['alto'] * escala))
+    imagen = np.full((alto, ancho), 255, dtype=np.uint8)
+
+    def punto(x, y):
+        return int(round(x * escala)), int(round((layout['alto'] - y) * escala))
+
+    def texto(cadena, x, y, puntos=10, grosor=1):
+        # La altura de mayúscula de HERSHEY_SIMPLEX es ~22 px con escala 1
+        cv2.putText(imagen, cadena, punto(x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    puntos * escala * 0.7 / 22, 0, max(1, int(round(grosor * escala / 2))), cv2.LINE_AA)
+
+    margen = layout['margen']
+    linea = max(1, int(round(escala)))
+    pulgada = 72.0
+
+    if pagina == 0:
+        texto(f"HOJA DE RESPUESTAS - {tema.upper()}", margen, layout['alto'] - margen, 16, 2)
+
+        info_y = layout['info_y']
+        cv2.rectangle(imagen, punto(margen, info_y), punto(margen + layout['ancho_util'], info_y - 0.6 * pulgada),
+                      0, linea)
+        texto("Nombre: ______________________________", margen + 0.1 * pulgada, info_y - 0.2 * pulgada)
+        texto("Grupo: ___________   Fecha: ______________", margen + 0.1 * pulgada, info_y - 0.4 * pulgada)
+
+        y_encabezado = layout['y_encabezado']
+        texto("Pregunta", margen, y_encabezado, 10, 2)
+        for j in range(layout['num_opciones']):
+            texto(LETRAS_OPCIONES[j], margen + 1.5 * pulgada + j * layout['espacio_burbujas'], y_encabezado, 10, 2)
+        cv2.line(imagen, punto(margen, y_encabezado - 0.1 * pulgada),
+                 punto(margen + layout['ancho_util'], y_encabezado - 0.1 * pulgada), 0, linea)
+
+    radio = layout['radio'] * escala
+    if layout.get('marca_pagina'):
+        # Fila "PÁGINA" impresa: la burbuja de esta página sale rellena en negro
+        centros = layout['marca_pagina']['centros']
+        texto("PAGINA", centros[0][0] - 0.65 * pulgada, centros[0][1] - 3, 8, 2)
+        for j, (x, y) in enumerate(centros):
+            cv2.circle(imagen, punto(x, y), int(round(radio)), 0, -1 if j == pagina else linea, cv2.LINE_AA)
+
+    for pregunta in layout['preguntas']:
+        if pregunta['pagina'] != pagina:
+            continue
+
+        texto(f"{pregunta['pregunta'] + 1}.", margen, pregunta['y'])
+
+        marcadas = respuestas[pregunta['pregunta']]
+        if not isinstance(marcadas, (list, tuple)):
+            marcadas = [marcadas]
+
+        for j, (x, y) in enumerate(pregunta['centros']):
+            centro = punto(x, y)
+            cv2.circle(imagen, centro, int(round(radio)), 0, linea, cv2.LINE_AA)
+
+            if j in marcadas:
+                # Relleno a lápiz: tono, tamaño y centro varían ligeramente
+                tono = int(rng.integers(20, 90))
+                r = radio * rng.uniform(0.85, 1.1)
+                desplazamiento = rng.normal(0, radio * 0.06, 2)
+                cv2.ellipse(imagen,
+                            (int(round(centro[0] + desplazamiento[0])), int(round(centro[1] + desplazamiento[1]))),
+                            (int(round(r)), int(round(r * rng.uniform(0.85, 1.05)))),
+                            float(rng.uniform(0, 180)), 0, 360, tono, -1, cv2.LINE_AA)
+
+    if pagina == layout['num_paginas'] - 1:
+        instrucciones = [
+            "INSTRUCCIONES:",
+            "1. Use solo LAPIZ para marcar sus respuestas",
+            "2. Rellene COMPLETAMENTE la burbuja de su eleccion",
+            "3. Borre completamente cualquier marca incorrecta",
+            "4. No doble, arrugue o maltrate esta hoja",
+            "5. Escriba claramente su nombre y grupo"
+        ]
+        y_inst = margen + 0.8 * pulgada
+        for instruccion in instrucciones:
+            texto(instruccion, margen, y_inst, 9)
+            y_inst -= 0.2 * pulgada
+
+        texto(f"Generado automaticamente - {tema} - {layout['num_preguntas']} preguntas",
+              margen, margen - 0.3 * pulgada, 8)
+
+    return imagen
+
+
+# ------------------------------------------------
+# 📷 Degradaciones de escaneo
+# ------------------------------------------------
+def degradar_imagen(pagina, rng, degradaciones=None):
+    """
+    Coloca la página sobre un fondo oscuro y le aplica rotación, perspectiva,
+    iluminación irregular, desenfoque y ruido. La geometría se aplica en una
+    sola transformación de perspectiva
+
+    Args:
+        pagina (ndarray): Página en escala de grises
+        rng (Generator): Generador aleatorio
+        degradaciones (dict): Máximos de cada degradación (ver DEGRADACIONES_POR_DEFECTO)
+
+    Returns:
+        tuple: (imagen BGR degradada, parámetros sorteados)
+    """
+    degradaciones = dict(DEGRADACIONES_POR_DEFECTO, **(degradaciones or {}))
+    alto, ancho = pagina.shape
+    borde = int(0.08 * max(alto, ancho))
+    alto_lienzo, ancho_lienzo = alto + 2 * borde, ancho + 2 * borde
+
+    # Rotación alrededor del centro más desplazamiento aleatorio de cada esquina
+    angulo = rng.uniform(-1, 1) * degradaciones['rotacion']
+    esquinas = np.array([[0, 0], [ancho, 0], [ancho, alto], [0, alto]], dtype=np.float32)
+    centro = np.array([ancho / 2, alto / 2], dtype=np.float32)
+    rad = np.deg2rad(angulo)
+    rotacion = np.array([[np.cos(rad), -np.sin(rad)], [np.sin(rad), np.cos(rad)]], dtype=np.float32)
+    destino = (esquinas - centro) @ rotacion.T + np.array([ancho_lienzo / 2, alto_lienzo / 2], dtype=np.float32)
+    destino += rng.uniform(-1, 1, (4, 2)).astype(np.float32) * degradaciones['perspectiva'] * np.array([ancho, alto],
+                                                                                                     dtype=np.float32)
+
+    fondo = int(rng.integers(30, 90))
+    matriz = cv2.getPerspectiveTransform(esquinas, destino)
+    imagen = cv2.warpPerspective(pagina, matriz, (ancho_lienzo, alto_lienzo),
+                                 flags=cv2.INTER_LINEAR, borderValue=fondo)
+
+    # Iluminación irregular: gradiente lineal en una dirección aleatoria
+    caida = rng.uniform(0, degradaciones['iluminacion'])
+    direccion = rng.uniform(0, 2 * np.pi)
+    xs = np.linspace(0, 1, ancho_lienzo, dtype=np.float32) * np.float32(np.cos(direccion))
+    ys = np.linspace(0, 1, alto_lienzo, dtype=np.float32) * np.float32(np.sin(direccion))
+    rampa = ys[:, None] + xs[None, :]
+    rampa -= rampa.min()
+    rampa *= np.float32(caida / max(float(rampa.max()), 1e-6))
+    imagen = imagen.astype(np.float32) * (1.0 - rampa)
+
+    sigma = rng.uniform(0, degradaciones['desenfoque'])
+    if sigma > 0.3:
+        imagen = cv2.GaussianBlur(imagen, (0, 0), sigma)
+
+    ruido = rng.uniform(0, degradaciones['ruido'])
+    if ruido > 0:
+        imagen += rng.standard_normal(imagen.shape, dtype=np.float32) * np.float32(ruido)
+
+    imagen = np.clip(imagen, 0, 255).astype(np.uint8)
+
+    parametros = {
+        'rotacion': round(float(angulo), 3),
+        'esquinas': np.round(destino, 1).tolist(),
+        'iluminacion': round(float(caida), 3),
+        'desenfoque': round(float(sigma), 3),
+        'ruido': round(float(ruido), 3)
+    }
+    return cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR), parametros
+
+
+# ------------------------------------------------
+# 🏭 Generación del corpus
+# ------------------------------------------------
+
+# Configuración compartida por los procesos del pool
+_configuracion_trabajador = None
+
+def _inicializar_trabajador(configuracion):
+    global _configuracion_trabajador
+    cv2.setNumThreads(1)
+    _configuracion_trabajador = configuracion
+
+def _generar_hoja(indice):
+    """Genera todas las páginas de una hoja y devuelve sus registros de verdad"""
+    conf = _configuracion_trabajador
+    layout = conf['layout']
+    # Semilla por hoja: el corpus es reproducible sin importar el número de procesos
+    rng = np.random.default_rng([conf['semilla'], indice])
+
+    respuestas = []
+    for correcta in conf['clave']:
+        sorteo = rng.random()
+        if sorteo < conf['prob_blanco']:
+            respuestas.append(-1)
+        elif sorteo < conf['prob_blanco'] + conf['prob_doble']:
+            respuestas.append(sorted(rng.choice(layout['num_opciones'], 2, replace=False).tolist()))
+        elif sorteo < conf['prob_blanco'] + conf['prob_doble'] + conf['prob_acierto']:
+            respuestas.append(correcta)
+        else:
+            respuestas.append(int(rng.integers(0, layout['num_opciones'])))
+
+    registros = []
+    for pagina in range(layout['num_paginas']):
+        imagen = renderizar_hoja(layout, pagina, respuestas, conf['dpi'], conf['tema'], rng)
+        imagen, parametros = degradar_imagen(imagen, rng, conf['degradaciones'])
+
+        calidad = int(rng.integers(conf['degradaciones']['calidad_jpeg'][0],
+                                   conf['degradaciones']['calidad_jpeg'][1] + 1))
+        parametros['calidad_jpeg'] = calidad
+
+        sufijo = f"_p{pagina + 1}" if layout['num_paginas'] > 1 else ""
+        archivo = f"hoja_{indice + 1:05d}{sufijo}.jpg"
+        ok, datos = cv2.imencode(".jpg", imagen, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+        if not ok:
+            raise RuntimeError(f"No se pudo codificar {archivo}")
+        with open(os.path.join(conf['carpeta'], archivo), 'wb') as f:
+            f.write(datos.tobytes())
+
+        preguntas = [p['pregunta'] for p in layout['preguntas'] if p['pagina'] == pagina]
+        registros.append({
+            'archivo': archivo,
+            'hoja': indice,
+            'pagina': pagina,
+            'preguntas': preguntas,
+            'respuestas': [respuestas[i] for i in preguntas],
+            'degradaciones': parametros
+        })
+
+    return registros
+
+def generar_corpus(carpeta_salida, num_hojas, num_preguntas=20, num_opciones=5, dpi=150,
+                   semilla=0, num_procesos=None, prob_acierto=0.7, prob_blanco=0.02, prob_doble=0.0,
+                   degradaciones=None, tema="Corpus"):
+    """
+    Genera un corpus de hojas escaneadas sintéticas con su verdad conocida
+
+    En `carpeta_salida` se escriben:
+        - hoja_NNNNN.jpg (o hoja_NNNNN_pK.jpg si la hoja tiene varias páginas)
+        - clave.json: clave de respuestas (formato aceptado por cargar_clave)
+        - layout.json: manifiesto de layout (ver CalificadorAutomatico.cargar_layout)
+        - verdad.jsonl: una línea por imagen con las respuestas marcadas (-1 en
+          blanco, lista si hay doble marca) y las degradaciones aplicadas
+        - corpus.json: parámetros de generación
+
+    Args:
+        carpeta_salida (str): Carpeta de salida
+        num_hojas (int): Número de hojas (alumnos) a generar
+        num_preguntas (int): Preguntas por hoja
+        num_opciones (int): Opciones por pregunta
+        dpi (int): Resolución de las imágenes
+        semilla (int): Semilla del corpus
+        num_procesos (int): Procesos para generar en paralelo (por defecto, número de núcleos)
+        prob_acierto (float): Probabilidad de marcar la opción correcta
+        prob_blanco (float): Probabilidad de dejar una pregunta en blanco
+        prob_doble (float): Probabilidad de marcar dos opciones
+        degradaciones (dict): Máximos de las degradaciones (ver DEGRADACIONES_POR_DEFECTO)
+        tema (str): Tema que aparece en el título de la hoja
+
+    Returns:
+        dict: Resumen con rutas, número de imágenes y tiempo
+    """
+    if not os.path.exists(carpeta_salida):
+        os.makedirs(carpeta_salida)
+
+    layout = GeneradorPDF.calcular_layout_hoja(num_preguntas, num_opciones)
+    rng = np.random.default_rng(semilla)
+    clave = rng.integers(0, num_opciones, num_preguntas).tolist()
+    degradaciones = dict(DEGRADACIONES_POR_DEFECTO, **(degradaciones or {}))
+
+    ruta_clave = os.path.join(carpeta_salida, "clave.json")
+    with open(ruta_clave, 'w', encoding='utf-8') as f:
+        json.dump({"respuestas": clave, "total_preguntas": num_preguntas}, f, ensure_ascii=False, indent=2)
+
+    ruta_layout = GeneradorPDF.guardar_layout_hoja(layout, os.path.join(carpeta_salida, "layout.json"))
+
+    parametros = {
+        'num_hojas': num_hojas, 'num_preguntas': num_preguntas, 'num_opciones': num_opciones,
+        'num_paginas': layout['num_paginas'], 'dpi': dpi, 'semilla': semilla,
+        'prob_acierto': prob_acierto, 'prob_blanco': prob_blanco, 'prob_doble': prob_doble,
+        'degradaciones': degradaciones, 'tema': tema
+    }
+    with open(os.path.join(carpeta_salida, "corpus.json"), 'w', encoding='utf-8') as f:
+        json.dump(parametros, f, ensure_ascii=False, indent=2)
+
+    configuracion = {
+        'carpeta': carpeta_salida, 'layout': layout, 'clave': clave, 'dpi': dpi, 'semilla': semilla,
+        'prob_acierto': prob_acierto, 'prob_blanco': prob_blanco, 'prob_doble': prob_doble,
+        'degradaciones': degradaciones, 'tema': tema
+    }
+
+    if num_procesos is None:
+        num_procesos = os.cpu_count() or 1
+    num_procesos = max(1, min(num_procesos, num_hojas))
+
+    inicio = time.perf_counter()
+    ruta_verdad = os.path.join(carpeta_salida, "verdad.jsonl")
+    num_imagenes = 0
+
+    with open(ruta_verdad, 'w', encoding='utf-8') as verdad:
+        def escribir(registros):
+            for registro in registros:
+                verdad.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            return len(registros)
+
+        if num_procesos == 1:
+            _inicializar_trabajador(configuracion)
+            for indice in range(num_hojas):
+                num_imagenes += escribir(_generar_hoja(indice))
+                if (indice + 1) % 500 == 0:
+                    print(f"🖨️ {indice + 1}/{num_hojas} hojas")
+        else:
+            with ProcessPoolExecutor(max_workers=num_procesos, initializer=_inicializar_trabajador,
+                                     initargs=(configuracion,)) as ejecutor:
+                tamaño_bloque = max(1, min(64, num_hojas // (num_procesos * 4)))
+                for indice, registros in enumerate(ejecutor.map(_generar_hoja, range(num_hojas),
+                                                                chunksize=tamaño_bloque)):
+                    num_imagenes += escribir(registros)
+                    if (indice + 1) % 500 == 0:
+                        print(f"🖨️ {indice + 1}/{num_hojas} hojas")
+
+    segundos = time.perf_counter() - inicio
+    print(f"✅ Corpus generado: {num_imagenes} imágenes en {segundos:.1f} s ({carpeta_salida})")
+
+    return {
+        'carpeta': carpeta_salida,
+        'clave': ruta_clave,
+        'layout': ruta_layout,
+        'verdad': ruta_verdad,
+        'num_imagenes': num_imagenes,
+        'segundos': segundos
+    }
+
+def cargar_verdad(carpeta_corpus):
+    """
+    Lee la verdad de un corpus generado
+
+    Returns:
+        list: Registros de verdad.jsonl, en orden de generación
+    """
+    with open(os.path.join(carpeta_corpus, "verdad.jsonl"), 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+# ------------------------------------------------
+# 🚀 Ejecutar desde la línea de comandos
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un corpus de hojas de respuestas escaneadas sintéticas")
+    parser.add_argument("carpeta_salida", nargs="?", default="corpus_sintetico")
+    parser.add_argument("--hojas", type=int, default=1000, help="Número de hojas a generar")
+    parser.add_argument("--preguntas", type=int, default=20, help="Preguntas por hoja")
+    parser.add_argument("--opciones", type=int, default=5, help="Opciones por pregunta")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolución de las imágenes")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del corpus")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo")
+    parser.add_argument("--blanco", type=float, default=0.02, help="Probabilidad de pregunta en blanco")
+    parser.add_argument("--doble", type=float, default=0.0, help="Probabilidad de doble marca")
+    parser.add_argument("--rotacion", type=float, default=DEGRADACIONES_POR_DEFECTO['rotacion'])
+    parser.add_argument("--perspectiva", type=float, default=DEGRADACIONES_POR_DEFECTO['perspectiva'])
+    parser.add_argument("--desenfoque", type=float, default=DEGRADACIONES_POR_DEFECTO['desenfoque'])
+    parser.add_argument("--ruido", type=float, default=DEGRADACIONES_POR_DEFECTO['ruido'])
+    parser.add_argument("--iluminacion", type=float, default=DEGRADACIONES_POR_DEFECTO['iluminacion'])
+    args = parser.parse_args()
+
+    generar_corpus(
+        args.carpeta_salida, args.hojas, num_preguntas=args.preguntas, num_opciones=args.opciones,
+        dpi=args.dpi, semilla=args.semilla, num_procesos=args.procesos,
+        prob_blanco=args.blanco, prob_doble=args.doble,
+        degradaciones={
+            'rotacion': args.rotacion, 'perspectiva': args.perspectiva, 'desenfoque': args.desenfoque,
+            'ruido': args.ruido, 'iluminacion': args.iluminacion
+        }
+    )
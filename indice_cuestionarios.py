@@ -0,0 +1,158 @@
+# [file name]: indice_cuestionarios.py
+# ================================================
+# 🗂️ ÍNDICE DE CUESTIONARIOS GUARDADOS
+# Guarda en la carpeta un índice (.indice_cuestionarios.json)
+# con título, tema, preguntas, fecha, mtime y tamaño de
+# cada JSON. Al actualizar solo se vuelven a leer los
+# archivos nuevos o modificados; listar, buscar y ordenar
+# se resuelven con el índice, sin abrir los cuestionarios.
+# ================================================
+
+import os
+import json
+
+ARCHIVO_INDICE = ".indice_cuestionarios.json"
+
+# Campos de cada entrada por los que se puede ordenar
+CAMPOS_ORDEN = ("titulo", "tema", "total_preguntas", "fecha_creacion", "archivo", "mtime", "tamaño")
+
+
+class IndiceCuestionarios:
+    """
+    Índice persistente de los cuestionarios JSON de una carpeta
+
+    Las entradas se validan con (mtime, tamaño): un archivo cuya firma no cambió
+    no se vuelve a abrir. Los JSON que no son cuestionarios (claves, layouts) también
+    quedan registrados, para no volver a leerlos en cada actualización
+    """
+
+    VERSION = 1  # Cambiar si cambia el formato de las entradas
+
+    def __init__(self, carpeta="."):
+        self.carpeta = carpeta
+        self.ruta_indice = os.path.join(carpeta, ARCHIVO_INDICE)
+        # archivo -> {'mtime', 'tamaño', 'cuestionario', 'titulo', 'tema', 'total_preguntas', 'fecha_creacion'}
+        self.entradas = self.cargar()
+        self.leidos = 0  # Archivos abiertos en la última actualización
+
+    def cargar(self):
+        """Carga el índice guardado (vacío si no existe, es de otra versión o está dañado)"""
+        try:
+            with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('version') == self.VERSION:
+                return datos.get('archivos', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def guardar(self):
+        """Guarda el índice de forma atómica; en una carpeta de solo lectura se queda en memoria"""
+        ruta_temporal = f"{self.ruta_indice}.{os.getpid()}.tmp"
+        try:
+            with open(ruta_temporal, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'archivos': self.entradas}, f, ensure_ascii=False)
+            os.replace(ruta_temporal, self.ruta_indice)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el índice de cuestionarios ({str(e)})")
+
+    @staticmethod
+    def leer_entrada(ruta):
+        """Lee un JSON y extrae los datos que se muestran en la lista de guardados"""
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return {'cuestionario': False}
+
+        if not isinstance(datos, dict) or not all(key in datos for key in ['titulo', 'tema', 'preguntas']):
+            return {'cuestionario': False}
+
+        total_preguntas = datos.get('total_preguntas')
+        if not isinstance(total_preguntas, int):
+            total_preguntas = len(datos['preguntas']) if isinstance(datos['preguntas'], list) else 0
+
+        # Tipos fijos por campo para poder ordenar sin comparar textos con números
+        return {
+            'cuestionario': True,
+            'titulo': str(datos['titulo']),
+            'tema': str(datos['tema']),
+            'total_preguntas': total_preguntas,
+            'fecha_creacion': str(datos.get('fecha_creacion', 'Desconocida'))
+        }
+
+    def actualizar(self):
+        """
+        Sincroniza el índice con la carpeta: lee solo los archivos nuevos o cuya
+        fecha de modificación o tamaño cambió y quita los que ya no existen
+
+        Returns:
+            bool: True si el índice cambió
+        """
+        vistos = set()
+        cambios = False
+        self.leidos = 0
+
+        with os.scandir(self.carpeta) as entradas_carpeta:
+            for entrada in entradas_carpeta:
+                if not entrada.name.endswith('.json') or entrada.name == ARCHIVO_INDICE:
+                    continue
+                try:
+                    info = entrada.stat()
+                except OSError:
+                    continue
+
+                vistos.add(entrada.name)
+                actual = self.entradas.get(entrada.name)
+                if actual is not None and actual['mtime'] == info.st_mtime_ns and actual['tamaño'] == info.st_size:
+                    continue
+
+                nueva = self.leer_entrada(entrada.path)
+                nueva['mtime'] = info.st_mtime_ns
+                nueva['tamaño'] = info.st_size
+                self.entradas[entrada.name] = nueva
+                self.leidos += 1
+                cambios = True
+
+        for archivo in set(self.entradas) - vistos:
+            del self.entradas[archivo]
+            cambios = True
+
+        if cambios:
+            self.guardar()
+        return cambios
+
+    def listar(self, ordenar_por="titulo", descendente=False, texto=None):
+        """
+        Cuestionarios del índice (sin abrir los archivos)
+
+        Args:
+            ordenar_por (str): Campo de CAMPOS_ORDEN
+            descendente (bool): Invertir el orden
+            texto (str): Si se indica, solo los que lo contienen en título, tema o archivo
+
+        Returns:
+            list: Diccionarios {'archivo', 'titulo', 'tema', 'total_preguntas',
+                  'fecha_creacion', 'mtime', 'tamaño'}
+        """
+        if ordenar_por not in CAMPOS_ORDEN:
+            raise ValueError(f"No se puede ordenar por '{ordenar_por}'")
+
+        texto = texto.strip().lower() if texto else None
+        cuestionarios = []
+        for archivo, entrada in self.entradas.items():
+            if not entrada['cuestionario']:
+                continue
+            if texto and not any(texto in valor.lower() for valor in (entrada['titulo'], entrada['tema'], archivo)):
+                continue
+            cuestionario = {'archivo': archivo}
+            cuestionario.update((campo, entrada[campo]) for campo in
+                                ('titulo', 'tema', 'total_preguntas', 'fecha_creacion', 'mtime', 'tamaño'))
+            cuestionarios.append(cuestionario)
+
+        def llave(cuestionario):
+            valor = cuestionario[ordenar_por]
+            return valor.lower() if isinstance(valor, str) else valor
+
+        cuestionarios.sort(key=llave, reverse=descendente)
+        return cuestionarios
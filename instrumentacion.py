@@ -0,0 +1,162 @@
+# [file name]: instrumentacion.py
+# ================================================
+# 🔬 INSTRUMENTACIÓN DEL PIPELINE DE CALIFICACIÓN
+# Cada etapa numerada de CalificadorAutomatico emite un
+# EventoEtapa a los ganchos conectados con agregar_gancho.
+# Sin ganchos conectados no se crea ningún evento ni imagen.
+# ================================================
+
+import os
+import re
+
+import cv2
+import numpy as np
+
+
+class EventoEtapa:
+    """
+    Evento emitido al terminar una etapa del pipeline
+
+    Atributos:
+        numero (int): Número de la etapa (1 a calificador_automatico.NUM_VISTAS), o None para etapas auxiliares
+        titulo (str): Título de la etapa ("8. Umbralización Adaptativa")
+        grupo (str): Etapa agregada a la que pertenece (ver calificador_automatico.ETAPAS)
+        duracion_ms (float): Tiempo desde el evento anterior (reloj monotónico)
+        instante (float): Valor de time.perf_counter() al terminar la etapa
+        forma_entrada (tuple): Forma del arreglo de entrada (o None)
+        forma_salida (tuple): Forma del arreglo de salida (o None)
+        conteos (dict): Conteos de la etapa (contornos encontrados, burbujas aceptadas...)
+        origen: Imagen o ruta que se está calificando
+    """
+
+    __slots__ = ('numero', 'titulo', 'grupo', 'duracion_ms', 'instante', 'forma_entrada',
+                 'forma_salida', 'conteos', 'origen', '_imagen')
+
+    def __init__(self, numero, titulo, grupo, duracion_ms, instante, forma_entrada=None,
+                 forma_salida=None, conteos=None, origen=None, imagen=None):
+        self.numero = numero
+        self.titulo = titulo
+        self.grupo = grupo
+        self.duracion_ms = duracion_ms
+        self.instante = instante
+        self.forma_entrada = forma_entrada
+        self.forma_salida = forma_salida
+        self.conteos = conteos or {}
+        self.origen = origen
+        self._imagen = imagen
+
+    def imagen(self):
+        """
+        Imagen de la etapa, producida solo cuando algún gancho la pide (y una
+        sola vez aunque la pidan varios). None si la etapa no tiene imagen
+        """
+        if callable(self._imagen):
+            self._imagen = self._imagen()
+        return self._imagen
+
+    def __repr__(self):
+        return f"EventoEtapa({self.titulo!r}, {self.duracion_ms:.2f} ms)"
+
+
+def forma(arreglo):
+    """Forma de un arreglo de NumPy, o None si no lo es"""
+    return arreglo.shape if isinstance(arreglo, np.ndarray) else None
+
+
+# ------------------------------------------------
+# ⏱️ Recolector de tiempos (producción)
+# ------------------------------------------------
+class RecolectorTiempos:
+    """Acumula la duración y los conteos de cada etapa; no toca las imágenes"""
+
+    def __init__(self):
+        self.limpiar()
+
+    def __call__(self, evento):
+        clave = evento.titulo
+        self.duraciones.setdefault(clave, []).append(evento.duracion_ms)
+        for nombre, valor in evento.conteos.items():
+            self.conteos.setdefault(clave, {}).setdefault(nombre, []).append(valor)
+
+    def limpiar(self):
+        self.duraciones = {}
+        self.conteos = {}
+
+    def resumen(self):
+        """
+        Returns:
+            dict: {titulo: {'n', 'media_ms', 'p50_ms', 'p95_ms', 'total_ms'}} en orden de etapa
+        """
+        resumen = {}
+        for titulo, valores in self.duraciones.items():
+            valores = np.asarray(valores)
+            resumen[titulo] = {
+                'n': int(valores.size),
+                'media_ms': float(valores.mean()),
+                'p50_ms': float(np.percentile(valores, 50)),
+                'p95_ms': float(np.percentile(valores, 95)),
+                'total_ms': float(valores.sum())
+            }
+        return resumen
+
+
+# ------------------------------------------------
+# 💾 Volcado de imágenes (depuración)
+# ------------------------------------------------
+class VolcadorImagenes:
+    """Guarda en disco la imagen de cada etapa, una subcarpeta por hoja"""
+
+    def __init__(self, carpeta, etapas=None):
+        """
+        Args:
+            carpeta (str): Carpeta de salida
+            etapas (iterable): Números de etapa a guardar (por defecto, todas)
+        """
+        self.carpeta = carpeta
+        self.etapas = set(etapas) if etapas is not None else None
+        self._contador = 0
+        self._origen = None
+
+    def __call__(self, evento):
+        if evento.numero is None or (self.etapas is not None and evento.numero not in self.etapas):
+            return
+
+        if evento.origen is not self._origen:
+            self._origen = evento.origen
+            self._contador += 1
+
+        imagen = evento.imagen()
+        if imagen is None:
+            return
+
+        if isinstance(evento.origen, str):
+            nombre_hoja = os.path.splitext(os.path.basename(evento.origen))[0]
+        else:
+            nombre_hoja = f"hoja_{self._contador:05d}"
+
+        carpeta = os.path.join(self.carpeta, nombre_hoja)
+        if not os.path.exists(carpeta):
+            os.makedirs(carpeta)
+
+        nombre = re.sub(r'[^\w]+', '_', evento.titulo.split('. ', 1)[-1]).strip('_').lower()
+        cv2.imwrite(os.path.join(carpeta, f"{evento.numero:02d}_{nombre}.png"), imagen)
+
+
+# ------------------------------------------------
+# 🖥️ Visor OpenCV (depuración interactiva)
+# ------------------------------------------------
+class VisorOpenCV:
+    """Muestra la imagen de cada etapa en una ventana OpenCV (modo depuración)"""
+
+    def __init__(self, escala=0.7):
+        self.escala = escala
+
+    def __call__(self, evento):
+        imagen = evento.imagen()
+        if imagen is None:
+            return
+
+        h, w = imagen.shape[:2]
+        imagen_redimensionada = cv2.resize(imagen, (int(w * self.escala), int(h * self.escala)))
+        cv2.imshow(evento.titulo, imagen_redimensionada)
+        cv2.waitKey(1)
@@ -0,0 +1,89 @@
+# [file name]: lista_alumnos.py
+# ================================================
+# 👥 LISTA DE ALUMNOS (CSV)
+# Lee la lista del grupo para imprimir una hoja por
+# alumno con su matrícula codificada en burbujas, y
+# para asociar después cada hoja calificada a su alumno.
+# ================================================
+
+import csv
+
+# Nombres de columna aceptados (sin distinguir mayúsculas)
+COLUMNAS_MATRICULA = ("matricula", "matrícula", "id", "identificador", "numero", "número")
+COLUMNAS_NOMBRE = ("nombre", "alumno", "estudiante")
+COLUMNAS_GRUPO = ("grupo", "clase", "seccion", "sección")
+
+MAX_DIGITOS_MATRICULA = 10
+
+
+def _buscar_columna(encabezados, candidatos):
+    for encabezado in encabezados:
+        if encabezado is not None and encabezado.strip().lower() in candidatos:
+            return encabezado
+    return None
+
+
+def leer_lista_alumnos(ruta_csv):
+    """
+    Lee la lista de alumnos de un CSV con encabezados (separado por comas o por
+    punto y coma, como lo exportan las hojas de cálculo en español)
+
+    Columnas: matrícula (solo dígitos, obligatoria), nombre (obligatoria) y grupo (opcional)
+
+    Returns:
+        list: Diccionarios {'matricula', 'nombre', 'grupo'} en el orden del archivo
+
+    Raises:
+        ValueError: Si faltan columnas o hay matrículas inválidas o repetidas
+    """
+    with open(ruta_csv, 'r', encoding='utf-8-sig', newline='') as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+
+        lector = csv.DictReader(f, dialect=dialecto)
+        encabezados = lector.fieldnames or []
+        columna_matricula = _buscar_columna(encabezados, COLUMNAS_MATRICULA)
+        columna_nombre = _buscar_columna(encabezados, COLUMNAS_NOMBRE)
+        columna_grupo = _buscar_columna(encabezados, COLUMNAS_GRUPO)
+
+        if columna_matricula is None or columna_nombre is None:
+            raise ValueError("La lista debe tener columnas 'matricula' y 'nombre'")
+
+        alumnos = []
+        vistas = set()
+        for numero_linea, fila in enumerate(lector, start=2):
+            matricula = (fila.get(columna_matricula) or "").strip()
+            nombre = (fila.get(columna_nombre) or "").strip()
+            if not matricula and not nombre:
+                continue
+
+            # Solo dígitos ASCII: str.isdigit() acepta también '²' o '٣', que no caben en la cuadrícula
+            if not matricula or any(c not in "0123456789" for c in matricula):
+                raise ValueError(f"Línea {numero_linea}: la matrícula '{matricula}' debe tener solo dígitos")
+            if len(matricula) > MAX_DIGITOS_MATRICULA:
+                raise ValueError(f"Línea {numero_linea}: la matrícula tiene más de {MAX_DIGITOS_MATRICULA} dígitos")
+            if normalizar_matricula(matricula) in vistas:
+                raise ValueError(f"Línea {numero_linea}: la matrícula {matricula} está repetida")
+            vistas.add(normalizar_matricula(matricula))
+
+            alumnos.append({
+                'matricula': matricula,
+                'nombre': nombre,
+                'grupo': (fila.get(columna_grupo) or "").strip() if columna_grupo else ""
+            })
+
+    return alumnos
+
+
+def normalizar_matricula(matricula):
+    """Matrícula sin ceros a la izquierda: la cuadrícula de la hoja se rellena con ceros"""
+    return matricula.lstrip('0') or '0'
+
+
+def indice_alumnos(alumnos):
+    """Índice {matrícula normalizada: alumno} para buscar la matrícula leída de una hoja"""
+    return {normalizar_matricula(alumno['matricula']): alumno for alumno in alumnos}
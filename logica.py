@@ -1,12 +1,21 @@
 # [file name]: logica.py
 import os
+import time
 import random
 import json
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
 from imutils.perspective import four_point_transform
 from imutils import contours
+from calificador_automatico import calcular_matriz_relleno, localizar_documento, iterar_paginas
+from clave_respuestas import ClaveRespuestas, cargar_clave
+from clave_respuestas import generar_json_clave_desde_txt as _generar_json_clave_desde_txt
+from lista_alumnos import leer_lista_alumnos
+from variantes import AlmacenVariantes, letra_variante
+from indice_cuestionarios import IndiceCuestionarios
+from banco_preguntas import BancoPreguntas, RUTA_BANCO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
@@ -16,73 +25,58 @@ from reportlab.lib.units import inch
 # ==============================
 
 
-def procesar_imagen_con_json(ruta_imagen, archivo_json_clave):
+def procesar_imagen_con_json(ruta_imagen, archivo_json_clave, tiempos=None):
     """
     Procesa una imagen de examen usando un archivo JSON como clave de respuestas
     
     Args:
-        ruta_imagen (str): Ruta de la imagen del examen
-        archivo_json_clave (str): Ruta del archivo JSON con las respuestas correctas
+        ruta_imagen (str | ndarray): Ruta de la imagen del examen o imagen BGR ya decodificada
+        archivo_json_clave (str | ClaveRespuestas): Ruta del archivo JSON con las
+            respuestas correctas, o una clave ya compilada
+        tiempos (dict): Si se indica, se llena con los milisegundos de cada etapa
+            (mismos nombres que calificador_automatico.ETAPAS)
     
     Returns:
         tuple: (puntaje, imagen_procesada, resultados_detallados)
     """
-    # Cargar clave desde JSON
+    # Cargar clave (compilada una sola vez por archivo)
     try:
-        with open(archivo_json_clave, 'r', encoding='utf-8') as f:
-            datos_clave = json.load(f)
-        
-        # Extraer respuestas correctas del JSON
-        if isinstance(datos_clave, dict) and 'respuestas' in datos_clave:
-            clave_respuestas = datos_clave['respuestas']
-        elif isinstance(datos_clave, list):
-            # Si es una lista directa de respuestas
-            clave_respuestas = {i: resp for i, resp in enumerate(datos_clave)}
+        if isinstance(archivo_json_clave, ClaveRespuestas):
+            clave = archivo_json_clave
         else:
-            # Buscar respuestas en diferentes formatos
-            clave_respuestas = {}
-            for key, value in datos_clave.items():
-                if 'pregunta' in key.lower() or key.isdigit():
-                    if isinstance(value, dict) and 'correcta' in value:
-                        idx = int(key.replace('pregunta', '')) if 'pregunta' in key.lower() else int(key)
-                        clave_respuestas[idx] = value['correcta']
-                    elif isinstance(value, (int, str)):
-                        idx = int(key.replace('pregunta', '')) if 'pregunta' in key.lower() else int(key)
-                        # Convertir letras a índices (A=0, B=1, etc.)
-                        if isinstance(value, str) and value.isalpha():
-                            clave_respuestas[idx] = ord(value.upper()) - 65
-                        else:
-                            clave_respuestas[idx] = int(value)
+            clave = cargar_clave(archivo_json_clave)
     
     except Exception as e:
         raise ValueError(f"Error al cargar el archivo JSON de claves: {str(e)}")
     
-    # Procesar imagen
-    imagen = cv2.imread(ruta_imagen)
+    inicio_etapa = time.perf_counter()
+    
+    def etapa(nombre):
+        nonlocal inicio_etapa
+        if tiempos is not None:
+            ahora = time.perf_counter()
+            tiempos[nombre] = tiempos.get(nombre, 0.0) + (ahora - inicio_etapa) * 1000
+            inicio_etapa = ahora
+    
+    # Procesar imagen (ruta o imagen ya decodificada)
+    imagen = cv2.imread(ruta_imagen) if isinstance(ruta_imagen, str) else ruta_imagen
     if imagen is None:
         raise ValueError("No se pudo cargar la imagen")
+    etapa('decodificacion')
     
     gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
-    desenfocada = cv2.GaussianBlur(gris, (5, 5), 0)
-    bordes = cv2.Canny(desenfocada, 75, 200)
-
-    contornos, _ = cv2.findContours(bordes.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    contornos = sorted(contornos, key=cv2.contourArea, reverse=True)
-    contorno_documento = None
-
-    for c in contornos:
-        perimetro = cv2.arcLength(c, True)
-        aprox = cv2.approxPolyDP(c, 0.02 * perimetro, True)
-        if len(aprox) == 4:
-            contorno_documento = aprox
-            break
+    etapa('preprocesamiento')
+    contorno_documento, _ = localizar_documento(gris, umbral_canny=(75, 200))
+    etapa('localizacion')
 
     if contorno_documento is None:
         raise ValueError("No se detectó correctamente la hoja del examen.")
 
     hoja_color = four_point_transform(imagen, contorno_documento.reshape(4, 2))
     hoja_gris = four_point_transform(gris, contorno_documento.reshape(4, 2))
+    etapa('transformacion')
     umbral = cv2.threshold(hoja_gris, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    etapa('umbralizacion')
 
     contornos_preguntas, _ = cv2.findContours(umbral.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     burbujas = []
@@ -93,8 +87,8 @@ def procesar_imagen_con_json(ruta_imagen, archivo_json_clave):
         if w >= 15 and h >= 15 and 0.8 <= proporcion <= 1.2:
             burbujas.append(c)
 
-    if len(burbujas) < len(clave_respuestas):
-        raise ValueError(f"No se detectaron suficientes burbujas. Esperadas: {len(clave_respuestas)}, Encontradas: {len(burbujas)}")
+    if len(burbujas) < clave.num_preguntas:
+        raise ValueError(f"No se detectaron suficientes burbujas. Esperadas: {clave.num_preguntas}, Encontradas: {len(burbujas)}")
 
     burbujas = contours.sort_contours(burbujas, method="top-to-bottom")[0]
     correctas = 0
@@ -103,31 +97,29 @@ def procesar_imagen_con_json(ruta_imagen, archivo_json_clave):
     # Asumimos 5 opciones por pregunta
     num_opciones_por_pregunta = 5
     
-    for (pregunta_idx, i) in enumerate(np.arange(0, len(burbujas), num_opciones_por_pregunta)):
+    preguntas_burbujas = []
+    for i in np.arange(0, len(burbujas), num_opciones_por_pregunta):
         if i + num_opciones_por_pregunta > len(burbujas):
             break
-            
-        cnts = contours.sort_contours(burbujas[i:i + num_opciones_por_pregunta])[0]
-        seleccionada = None
-
-        for (opcion_idx, c) in enumerate(cnts):
-            mascara = np.zeros(umbral.shape, dtype="uint8")
-            cv2.drawContours(mascara, [c], -1, 255, -1)
-            mascara = cv2.bitwise_and(umbral, umbral, mask=mascara)
-            total = cv2.countNonZero(mascara)
-            
-            if seleccionada is None or total > seleccionada[0]:
-                seleccionada = (total, opcion_idx)
-
-        # Obtener respuesta correcta del JSON
-        respuesta_correcta = clave_respuestas.get(pregunta_idx, -1)
-        
-        # Si la respuesta correcta es una letra, convertir a índice
-        if isinstance(respuesta_correcta, str) and respuesta_correcta.isalpha():
-            respuesta_correcta = ord(respuesta_correcta.upper()) - 65
+        preguntas_burbujas.append(contours.sort_contours(burbujas[i:i + num_opciones_por_pregunta])[0])
+    etapa('deteccion_burbujas')
+    
+    # Medir el relleno de todas las burbujas en una sola pasada; se elige la
+    # burbuja con más píxeles marcados, como hasta ahora
+    _, pixeles = calcular_matriz_relleno(
+        preguntas_burbujas, umbral, num_opciones_por_pregunta, devolver_pixeles=True
+    )
+    opciones_elegidas = np.argmax(pixeles, axis=1)
+    aciertos = clave.comparar(opciones_elegidas)
+    etapa('medicion_relleno')
+    
+    for (pregunta_idx, cnts) in enumerate(preguntas_burbujas):
+        opcion_idx = int(opciones_elegidas[pregunta_idx])
+        seleccionada = (int(pixeles[pregunta_idx, opcion_idx]), opcion_idx)
 
-        # Determinar si es correcta
-        es_correcta = (respuesta_correcta == seleccionada[1]) if respuesta_correcta >= 0 else False
+        # Respuesta correcta de la clave compilada
+        respuesta_correcta = clave.correcta(pregunta_idx)
+        es_correcta = bool(aciertos[pregunta_idx])
         
         if es_correcta:
             correctas += 1
@@ -151,10 +143,37 @@ def procesar_imagen_con_json(ruta_imagen, archivo_json_clave):
         if not es_correcta and 0 <= respuesta_correcta < len(cnts):
             cv2.drawContours(hoja_color, [cnts[respuesta_correcta]], -1, (255, 255, 0), 1)  # Azul claro
 
-    puntaje = (correctas / len(clave_respuestas)) * 100 if clave_respuestas else 0
+    puntaje = (correctas / clave.num_preguntas) * 100 if clave.num_preguntas else 0
+    etapa('anotacion')
     
     return puntaje, hoja_color, resultados_detallados
 
+def procesar_multipagina_con_json(ruta_imagen, archivo_json_clave):
+    """
+    Califica cada página de un TIFF multipágina (alimentador del escáner) como un
+    examen independiente, decodificando una sola página a la vez
+    
+    Args:
+        ruta_imagen (str): Ruta del archivo multipágina
+        archivo_json_clave (str | ClaveRespuestas): Clave de respuestas
+    
+    Yields:
+        tuple: (pagina, puntaje, imagen_procesada, resultados_detallados, error)
+    """
+    clave = archivo_json_clave
+    if not isinstance(clave, ClaveRespuestas):
+        try:
+            clave = cargar_clave(archivo_json_clave)
+        except Exception as e:
+            raise ValueError(f"Error al cargar el archivo JSON de claves: {str(e)}")
+    
+    for pagina, imagen in iterar_paginas(ruta_imagen):
+        try:
+            puntaje, imagen_procesada, resultados = procesar_imagen_con_json(imagen, clave)
+            yield pagina, puntaje, imagen_procesada, resultados, None
+        except ValueError as e:
+            yield pagina, 0, None, [], str(e)
+
 def generar_json_clave_desde_txt(ruta_txt, ruta_salida_json=None):
     """
     Convierte un archivo TXT de claves a formato JSON
@@ -166,57 +185,13 @@ def generar_json_clave_desde_txt(ruta_txt, ruta_salida_json=None):
     Returns:
         dict: Datos en formato JSON
     """
-    clave_respuestas = {}
-    
-    try:
-        with open(ruta_txt, 'r', encoding='utf-8') as f:
-            lineas = f.readlines()
-        
-        for linea in lineas:
-            linea = linea.strip()
-            if not linea or 'Pregunta' not in linea:
-                continue
-                
-            # Buscar patrones como "Pregunta X: Y"
-            partes = linea.split(':')
-            if len(partes) >= 2:
-                pregunta_part = partes[0].strip()
-                respuesta_part = partes[1].strip()
-                
-                # Extraer número de pregunta
-                num_pregunta = ''.join(filter(str.isdigit, pregunta_part))
-                if num_pregunta:
-                    num_pregunta = int(num_pregunta) - 1  # Convertir a índice 0-based
-                    
-                    # Extraer respuesta (puede ser letra o número)
-                    if respuesta_part and respuesta_part[0].isalpha():
-                        clave_respuestas[num_pregunta] = respuesta_part[0].upper()
-                    elif respuesta_part.isdigit():
-                        clave_respuestas[num_pregunta] = int(respuesta_part)
-    
-    except Exception as e:
-        raise ValueError(f"Error al procesar archivo TXT: {str(e)}")
-    
-    # Crear estructura JSON
-    datos_json = {
-        "respuestas": clave_respuestas,
-        "total_preguntas": len(clave_respuestas),
-        "fecha_generacion": str(np.datetime64('now')),
-        "formato": "pregunta_idx: respuesta"
-    }
-    
-    # Guardar si se especifica ruta de salida
-    if ruta_salida_json:
-        with open(ruta_salida_json, 'w', encoding='utf-8') as f:
-            json.dump(datos_json, f, ensure_ascii=False, indent=2)
-    
-    return datos_json
+    return _generar_json_clave_desde_txt(ruta_txt, ruta_salida_json)
 
 # ==============================
 # 🆕 Funciones para generar hojas PDF
 # ==============================
 
-# Base de datos de preguntas por tema
+# Preguntas de ejemplo con las que se crea un banco de preguntas nuevo (ver banco_preguntas.py)
 BANCO_PREGUNTAS = {
     "Matemáticas Básicas": [
         {
@@ -250,6 +225,9 @@ BANCO_PREGUNTAS = {
     ]
 }
 
+# Índices de cuestionarios ya abiertos en este proceso: carpeta absoluta -> IndiceCuestionarios
+_indices_cuestionarios = {}
+
 class GestorCuestionarios:
     """Clase para gestionar el guardado y carga de cuestionarios personalizados"""
     
@@ -298,45 +276,58 @@ class GestorCuestionarios:
         return datos
     
     @staticmethod
-    def listar_cuestionarios_guardados(carpeta="."):
+    def indice_carpeta(carpeta="."):
+        """Índice de cuestionarios de una carpeta, uno por carpeta y por proceso"""
+        clave = os.path.abspath(carpeta)
+        if clave not in _indices_cuestionarios:
+            _indices_cuestionarios[clave] = IndiceCuestionarios(carpeta)
+        return _indices_cuestionarios[clave]
+    
+    @staticmethod
+    def listar_cuestionarios_guardados(carpeta=".", ordenar_por="titulo", descendente=False, texto=None):
         """
-        Lista todos los cuestionarios guardados en una carpeta
+        Lista todos los cuestionarios guardados en una carpeta. Se sirve del
+        índice de la carpeta (ver indice_cuestionarios.py): solo se abren los
+        JSON nuevos o modificados desde la última vez
+        
+        Args:
+            ordenar_por (str): 'titulo', 'tema', 'total_preguntas', 'fecha_creacion', 'archivo', 'mtime' o 'tamaño'
+            descendente (bool): Invertir el orden
+            texto (str): Filtrar por título, tema o nombre de archivo
         
         Returns:
-            list: Lista de archivos JSON de cuestionarios
+            list: Lista de diccionarios {'archivo', 'titulo', 'tema', 'total_preguntas',
+                  'fecha_creacion', 'mtime', 'tamaño'}
         """
-        archivos = [f for f in os.listdir(carpeta) if f.endswith('.json')]
-        cuestionarios = []
-        
-        for archivo in archivos:
-            try:
-                with open(os.path.join(carpeta, archivo), 'r', encoding='utf-8') as f:
-                    datos = json.load(f)
-                    if all(key in datos for key in ['titulo', 'tema', 'preguntas']):
-                        cuestionarios.append({
-                            'archivo': archivo,
-                            'titulo': datos['titulo'],
-                            'tema': datos['tema'],
-                            'total_preguntas': datos['total_preguntas'],
-                            'fecha_creacion': datos.get('fecha_creacion', 'Desconocida')
-                        })
-            except:
-                continue
-        
-        return cuestionarios
+        indice = GestorCuestionarios.indice_carpeta(carpeta)
+        indice.actualizar()
+        return indice.listar(ordenar_por, descendente, texto)
     
 class GeneradorPDF:
     """Clase para generar todos los tipos de PDFs necesarios"""
     
     @staticmethod
-    def generar_preguntas_aleatorias(tema, num_preguntas=5):
-        """Genera preguntas aleatorias para un tema específico"""
-        if tema in BANCO_PREGUNTAS:
-            preguntas_tema = BANCO_PREGUNTAS[tema]
-            if len(preguntas_tema) >= num_preguntas:
-                return random.sample(preguntas_tema, num_preguntas)
-            else:
-                return preguntas_tema
+    def generar_preguntas_aleatorias(tema, num_preguntas=5, dificultad=None, etiquetas=None, ruta_banco=RUTA_BANCO,
+                                     rng=None):
+        """
+        Genera preguntas aleatorias para un tema específico
+
+        Las preguntas se sortean dentro del banco SQLite (ver banco_preguntas.py), que
+        se crea con BANCO_PREGUNTAS la primera vez; solo se leen las elegidas
+
+        Args:
+            tema (str): Tema de las preguntas
+            num_preguntas (int): Preguntas a elegir (todas las del tema si hay menos)
+            dificultad (int o tuple): Dificultad exacta (1 a 5) o rango (mínima, máxima)
+            etiquetas (list): Etiquetas que deben tener todas las preguntas
+            ruta_banco (str): Archivo del banco de preguntas
+            rng (random.Random): Generador a usar (por defecto, el del módulo random)
+        """
+        with BancoPreguntas(ruta_banco, preguntas_iniciales=BANCO_PREGUNTAS) as banco:
+            preguntas_tema = banco.muestrear(tema, num_preguntas, dificultad, etiquetas, rng)
+
+        if preguntas_tema:
+            return preguntas_tema
         else:
             # Generar preguntas genéricas si el tema no está en la base
             preguntas_gen = []
@@ -348,108 +339,471 @@ class GeneradorPDF:
             return preguntas_gen
 
     @staticmethod
-    def generar_hoja_respuestas_pdf(tema, num_preguntas=5, num_opciones=5, incluir_clave=False):
-        """
-        Genera una hoja de respuestas en formato PDF optimizada para escaneo
+    def calcular_layout_hoja(num_preguntas=5, num_opciones=5, digitos_matricula=0, num_variantes=0):
         """
-        # Crear archivo temporal para el PDF
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        pdf_path = temp_file.name
-        temp_file.close()
+        Calcula la geometría de la hoja de respuestas (en puntos PDF, origen abajo
+        a la izquierda): posición de cada burbuja y página en la que aparece
         
-        # Crear canvas PDF
-        c = canvas.Canvas(pdf_path, pagesize=letter)
+        Con digitos_matricula > 0 se agrega en la primera página, a la derecha de
+        las respuestas, una cuadrícula de matrícula: una columna de burbujas 0-9
+        por dígito. Con num_variantes > 1, una fila "VERSIÓN" con una burbuja por
+        versión entre los datos del alumno y las respuestas
+        
+        Con más de una página, cada página lleva en el margen superior una fila
+        "PÁGINA" con una burbuja por página, impresa ya rellena en la suya: así
+        una imagen suelta se califica sin que el usuario indique su página
+        """
         width, height = letter
         
         # Configuración
         margen = 1 * inch
-        ancho_util = width - 2 * margen
         espacio_pregunta = 0.7 * inch
         tamaño_burbuja = 0.2 * inch
         espacio_burbujas = 0.3 * inch
         
-        # Título
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(margen, height - margen, f"HOJA DE RESPUESTAS - {tema.upper()}")
-        
-        # Información del estudiante
-        c.setFont("Helvetica", 10)
         info_y = height - margen - 0.5 * inch
-        c.rect(margen, info_y - 0.6 * inch, ancho_util, 0.6 * inch)
-        c.drawString(margen + 0.1 * inch, info_y - 0.2 * inch, "Nombre: ___________________________________________________")
-        c.drawString(margen + 0.1 * inch, info_y - 0.4 * inch, "Grupo: ___________   Fecha: ______________")
+        y_encabezado = info_y - 1.2 * inch
+        if num_variantes > 1:
+            # La fila de versión va entre los datos del alumno y el encabezado
+            y_encabezado -= 0.3 * inch
+        
+        # Preguntas y burbujas
+        preguntas = []
+        pagina = 0
+        y_pos = y_encabezado - 0.3 * inch
         
-        # Generar clave de respuestas
-        clave_respuestas = {}
         for i in range(num_preguntas):
-            clave_respuestas[i] = random.randint(0, num_opciones-1)
+            centros = [(margen + 1.5 * inch + j * espacio_burbujas, y_pos - 0.05 * inch)
+                       for j in range(num_opciones)]
+            preguntas.append({'pregunta': i, 'pagina': pagina, 'y': y_pos, 'centros': centros})
+            
+            y_pos -= espacio_pregunta
+            
+            # Verificar si necesita nueva página
+            if y_pos < margen + 0.5 * inch and i < num_preguntas - 1:
+                pagina += 1
+                y_pos = height - margen - 0.5 * inch
         
-        # Encabezado de las columnas de opciones
-        letras_opciones = ['A', 'B', 'C', 'D', 'E', 'F', 'G'][:num_opciones]
-        y_pos = info_y - 1.2 * inch
+        matricula = None
+        if digitos_matricula:
+            espacio_digitos = 0.25 * inch
+            x_ultima = width - margen - tamaño_burbuja / 2
+            x_primera = x_ultima - (digitos_matricula - 1) * espacio_digitos
+            x_max_respuestas = margen + 1.5 * inch + (num_opciones - 1) * espacio_burbujas + tamaño_burbuja / 2
+            if digitos_matricula > 10 or x_primera - 0.4 * inch < x_max_respuestas:
+                raise ValueError(f"No caben {digitos_matricula} dígitos de matrícula junto a {num_opciones} opciones")
+            
+            y_primer_digito = y_encabezado - 0.6 * inch
+            matricula = {
+                'digitos': digitos_matricula,
+                'pagina': 0,
+                'espacio': espacio_digitos,
+                'y_casillas': y_encabezado - 0.3 * inch,
+                'columnas': [
+                    [(x_primera + d * espacio_digitos, y_primer_digito - v * espacio_digitos) for v in range(10)]
+                    for d in range(digitos_matricula)
+                ]
+            }
         
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(margen, y_pos, "Pregunta")
+        marca_pagina = None
+        num_paginas = pagina + 1
+        espacio_marca = 0.25 * inch
+        x_ultima_marca = width - margen - tamaño_burbuja / 2
+        x_primera_marca = x_ultima_marca - (num_paginas - 1) * espacio_marca
+        # Sin lugar para la fila (demasiadas páginas) la página se indica al calificar
+        if num_paginas > 1 and x_primera_marca - 0.6 * inch >= margen:
+            y_marca = height - 0.45 * inch
+            marca_pagina = {
+                'y': y_marca,
+                'centros': [(x_primera_marca + j * espacio_marca, y_marca) for j in range(num_paginas)]
+            }
         
-        for j, letra in enumerate(letras_opciones):
-            x_pos = margen + 1.5 * inch + j * espacio_burbujas
-            c.drawString(x_pos, y_pos, letra)
+        variante = None
+        if num_variantes > 1:
+            y_variante = info_y - 0.95 * inch
+            variante = {
+                'pagina': 0,
+                'y': y_variante,
+                'centros': [(margen + 1.5 * inch + j * espacio_burbujas, y_variante) for j in range(num_variantes)]
+            }
         
-        # Línea separadora
-        c.line(margen, y_pos - 0.1 * inch, margen + ancho_util, y_pos - 0.1 * inch)
+        return {
+            'ancho': width,
+            'alto': height,
+            'margen': margen,
+            'ancho_util': width - 2 * margen,
+            'info_y': info_y,
+            'y_encabezado': y_encabezado,
+            'espacio_burbujas': espacio_burbujas,
+            'radio': tamaño_burbuja / 2,
+            'num_preguntas': num_preguntas,
+            'num_opciones': num_opciones,
+            'num_paginas': num_paginas,
+            'preguntas': preguntas,
+            'matricula': matricula,
+            'variante': variante,
+            'marca_pagina': marca_pagina
+        }
+    
+    @staticmethod
+    def ruta_layout_hoja(ruta_pdf):
+        """Ruta del manifiesto de layout que acompaña a una hoja de respuestas PDF"""
+        return os.path.splitext(ruta_pdf)[0] + "_layout.json"
+    
+    @staticmethod
+    def guardar_layout_hoja(layout, ruta_json):
+        """
+        Guarda el manifiesto de layout con coordenadas normalizadas a la página
+        (x de izquierda a derecha, y de arriba hacia abajo, radio relativo al ancho),
+        listo para muestrear las burbujas tras la corrección de perspectiva
+        """
+        ancho, alto = layout['ancho'], layout['alto']
         
-        # Preguntas y burbujas
-        y_pos -= 0.3 * inch
+        manifiesto = {
+            "version": 1,
+            "pagina": {"ancho_pt": ancho, "alto_pt": alto},
+            "num_preguntas": layout['num_preguntas'],
+            "num_opciones": layout['num_opciones'],
+            "num_paginas": layout['num_paginas'],
+            "radio": layout['radio'] / ancho,
+            "burbujas": [
+                {
+                    "pregunta": p['pregunta'],
+                    "pagina": p['pagina'],
+                    "centros": [[round(x / ancho, 6), round(1 - y / alto, 6)] for x, y in p['centros']]
+                }
+                for p in layout['preguntas']
+            ]
+        }
         
-        for i in range(num_preguntas):
-            # Número de pregunta
-            c.setFont("Helvetica", 10)
-            c.drawString(margen, y_pos, f"{i+1}.")
+        if layout.get('matricula'):
+            # Una fila de centros por dígito, con las burbujas 0-9 como opciones
+            manifiesto["matricula"] = {
+                "digitos": layout['matricula']['digitos'],
+                "pagina": layout['matricula']['pagina'],
+                "centros": [[[round(x / ancho, 6), round(1 - y / alto, 6)] for x, y in columna]
+                            for columna in layout['matricula']['columnas']]
+            }
+        
+        if layout.get('variante'):
+            manifiesto["variante"] = {
+                "pagina": layout['variante']['pagina'],
+                "centros": [[round(x / ancho, 6), round(1 - y / alto, 6)] for x, y in layout['variante']['centros']]
+            }
+        
+        if layout.get('marca_pagina'):
+            # Burbuja j impresa rellena en la página j
+            manifiesto["marca_pagina"] = {
+                "centros": [[round(x / ancho, 6), round(1 - y / alto, 6)] for x, y in layout['marca_pagina']['centros']]
+            }
+        
+        with open(ruta_json, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        
+        return ruta_json
+
+    @staticmethod
+    def generar_hoja_respuestas_pdf(tema, num_preguntas=5, num_opciones=5, incluir_clave=False,
+                                    clave_respuestas=None, copias=1, num_variantes=0, variante=None):
+        """
+        Genera una hoja de respuestas en formato PDF optimizada para escaneo.
+        Junto al PDF se escribe su manifiesto de layout (ver ruta_layout_hoja)
+        
+        La parte fija de cada página (encabezado, cuadrícula de burbujas e
+        instrucciones) se dibuja una sola vez como form XObject y se estampa en
+        cada página de cada copia; la versión con clave solo agrega encima las
+        burbujas rellenas
+        
+        Args:
+            clave_respuestas (dict): {pregunta_idx: opcion_idx}; si no se indica se
+                                     genera al azar. Pasar la misma clave a la hoja
+                                     del estudiante y a la del profesor
+            copias (int): Número de copias de la hoja dentro del mismo PDF
+            num_variantes (int): Versiones del examen; con más de una, la hoja lleva la fila "VERSIÓN"
+            variante (int): Versión de esta hoja, que se imprime ya rellena
+        """
+        # Crear archivo temporal para el PDF
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+        pdf_path = temp_file.name
+        temp_file.close()
+        
+        # Crear canvas PDF
+        c = canvas.Canvas(pdf_path, pagesize=letter)
+        layout = GeneradorPDF.calcular_layout_hoja(num_preguntas, num_opciones, num_variantes=num_variantes)
+        
+        # Generar clave de respuestas
+        if clave_respuestas is None:
+            clave_respuestas = {}
+            for i in range(num_preguntas):
+                clave_respuestas[i] = random.randint(0, num_opciones-1)
+        
+        formularios = GeneradorPDF.dibujar_formularios_hoja(c, layout, tema)
+        
+        for _ in range(copias):
+            for pagina, nombre_formulario in enumerate(formularios):
+                c.doForm(nombre_formulario)
+                if incluir_clave:
+                    GeneradorPDF.marcar_clave_pagina(c, layout, clave_respuestas, pagina)
+                if variante is not None and layout['variante'] and layout['variante']['pagina'] == pagina:
+                    GeneradorPDF.definir_burbuja_rellena(c, layout['radio'])
+                    GeneradorPDF.estampar_formulario(c, "burbuja_rellena", *layout['variante']['centros'][variante])
+                c.showPage()
+        
+        c.save()
+        
+        # Manifiesto de layout para calificar en coordenadas conocidas
+        GeneradorPDF.guardar_layout_hoja(layout, GeneradorPDF.ruta_layout_hoja(pdf_path))
+        
+        return pdf_path, clave_respuestas
+
+    @staticmethod
+    def dibujar_formularios_hoja(c, layout, tema):
+        """
+        Dibuja la parte fija de cada página de la hoja de respuestas como un form
+        XObject del canvas (uno por página del layout). La burbuja también es un
+        formulario propio que cada página estampa trasladado, así las curvas del
+        círculo se escriben una sola vez por documento
+        
+        Returns:
+            list: Nombres de los formularios, en orden de página
+        """
+        height = layout['alto']
+        margen = layout['margen']
+        ancho_util = layout['ancho_util']
+        tamaño_burbuja = layout['radio'] * 2
+        espacio_burbujas = layout['espacio_burbujas']
+        num_opciones = layout['num_opciones']
+        num_preguntas = layout['num_preguntas']
+        
+        GeneradorPDF.dibujar_formulario_burbuja(c, "burbuja", tamaño_burbuja / 2, relleno=False)
+        if layout.get('marca_pagina'):
+            GeneradorPDF.definir_burbuja_rellena(c, tamaño_burbuja / 2)
+        
+        formularios = []
+        for pagina in range(layout['num_paginas']):
+            nombre_formulario = f"hoja_respuestas_p{pagina}"
+            c.beginForm(nombre_formulario)
             
-            # Burbujas para cada opción
-            for j in range(num_opciones):
-                x_pos = margen + 1.5 * inch + j * espacio_burbujas
+            if pagina == 0:
+                # Título
+                c.setFont("Helvetica-Bold", 16)
+                c.drawString(margen, height - margen, f"HOJA DE RESPUESTAS - {tema.upper()}")
                 
-                # Dibujar burbuja (círculo)
-                c.circle(x_pos, y_pos - 0.05 * inch, tamaño_burbuja / 2, stroke=1, fill=0)
+                # Información del estudiante
+                c.setFont("Helvetica", 10)
+                info_y = layout['info_y']
+                c.rect(margen, info_y - 0.6 * inch, ancho_util, 0.6 * inch)
+                c.drawString(margen + 0.1 * inch, info_y - 0.2 * inch, "Nombre: ___________________________________________________")
+                c.drawString(margen + 0.1 * inch, info_y - 0.4 * inch, "Grupo: ___________   Fecha: ______________")
                 
-                # Si es para la clave y esta es la respuesta correcta, marcar con X
-                if incluir_clave and j == clave_respuestas[i]:
-                    c.setFont("Helvetica-Bold", 8)
-                    c.drawString(x_pos - 0.05 * inch, y_pos - 0.1 * inch, "X")
-                    c.setFillColorRGB(0, 0, 0)
-                    c.circle(x_pos, y_pos - 0.05 * inch, tamaño_burbuja / 2, stroke=1, fill=1)
+                # Encabezado de las columnas de opciones
+                letras_opciones = ['A', 'B', 'C', 'D', 'E', 'F', 'G'][:num_opciones]
+                y_pos = layout['y_encabezado']
+                
+                c.setFont("Helvetica-Bold", 10)
+                c.drawString(margen, y_pos, "Pregunta")
+                
+                for j, letra in enumerate(letras_opciones):
+                    x_pos = margen + 1.5 * inch + j * espacio_burbujas
+                    c.drawString(x_pos, y_pos, letra)
+                
+                # Línea separadora
+                c.line(margen, y_pos - 0.1 * inch, margen + ancho_util, y_pos - 0.1 * inch)
+                
+                # Fila de versión (exámenes con versiones barajadas)
+                variante = layout.get('variante')
+                if variante:
+                    c.setFont("Helvetica-Bold", 10)
+                    c.drawString(margen, variante['y'] - 0.05 * inch, "Versión")
+                    c.setFont("Helvetica", 8)
+                    for j, (x_pos, y_centro) in enumerate(variante['centros']):
+                        c.drawCentredString(x_pos, y_centro + 0.14 * inch, letra_variante(j))
+                        GeneradorPDF.estampar_formulario(c, "burbuja", x_pos, y_centro)
             
-            y_pos -= espacio_pregunta
+            # Preguntas y burbujas (círculos) de esta página
+            c.setFont("Helvetica", 10)
+            for pregunta in layout['preguntas']:
+                if pregunta['pagina'] != pagina:
+                    continue
+                c.drawString(margen, pregunta['y'], f"{pregunta['pregunta']+1}.")
+                for x_pos, y_centro in pregunta['centros']:
+                    GeneradorPDF.estampar_formulario(c, "burbuja", x_pos, y_centro)
             
-            # Verificar si necesita nueva página
-            if y_pos < margen + 0.5 * inch and i < num_preguntas - 1:
-                c.showPage()
-                y_pos = height - margen - 0.5 * inch
+            matricula = layout.get('matricula')
+            if matricula and matricula['pagina'] == pagina:
+                GeneradorPDF.dibujar_cuadricula_matricula(c, layout)
+            
+            # Fila de página: forma parte del formulario de cada página, con su burbuja ya rellena
+            marca_pagina = layout.get('marca_pagina')
+            if marca_pagina:
+                c.setFillColorRGB(0, 0, 0)
+                c.setFont("Helvetica-Bold", 8)
+                x_primera, y_marca = marca_pagina['centros'][0]
+                c.drawRightString(x_primera - layout['radio'] - 0.08 * inch, y_marca - 3, "PÁGINA")
+                c.setFont("Helvetica", 7)
+                for j, (x_pos, y_centro) in enumerate(marca_pagina['centros']):
+                    c.drawCentredString(x_pos, y_centro + 0.14 * inch, str(j + 1))
+                    GeneradorPDF.estampar_formulario(c, "burbuja_rellena" if j == pagina else "burbuja",
+                                                     x_pos, y_centro)
+            
+            if pagina == layout['num_paginas'] - 1:
+                # Instrucciones
+                c.setFont("Helvetica", 9)
+                instrucciones = [
+                    "INSTRUCCIONES:",
+                    "1. Use solo LÁPIZ para marcar sus respuestas",
+                    "2. Rellene COMPLETAMENTE la burbuja de su elección",
+                    "3. Borre completamente cualquier marca incorrecta",
+                    "4. No doble, arrugue o maltrate esta hoja",
+                    "5. Escriba claramente su nombre y grupo"
+                ]
+                
+                y_inst = margen + 0.8 * inch
+                for instruccion in instrucciones:
+                    c.drawString(margen, y_inst, instruccion)
+                    y_inst -= 0.2 * inch
+                
+                # Pie de página
+                c.setFont("Helvetica-Oblique", 8)
+                c.drawString(margen, margen - 0.3 * inch, 
+                            f"Generado automáticamente - {tema} - {num_preguntas} preguntas")
+            
+            c.endForm()
+            formularios.append(nombre_formulario)
+        
+        return formularios
+
+    @staticmethod
+    def dibujar_cuadricula_matricula(c, layout):
+        """Dibuja la parte fija de la cuadrícula de matrícula: título, casillas, números y burbujas"""
+        matricula = layout['matricula']
+        columnas = matricula['columnas']
+        lado = matricula['espacio'] - 0.03 * inch
+        x_primera = columnas[0][0][0]
+        
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(x_primera - lado / 2, layout['y_encabezado'], "MATRÍCULA")
+        
+        # Casillas para escribir la matrícula y números a la izquierda de las filas
+        for columna in columnas:
+            x_pos = columna[0][0]
+            c.rect(x_pos - lado / 2, matricula['y_casillas'] - lado / 2, lado, lado)
+        
+        c.setFont("Helvetica", 8)
+        for valor, (_, y_centro) in enumerate(columnas[0]):
+            c.drawRightString(x_primera - layout['radio'] - 0.08 * inch, y_centro - 3, str(valor))
+        
+        for columna in columnas:
+            for x_pos, y_centro in columna:
+                GeneradorPDF.estampar_formulario(c, "burbuja", x_pos, y_centro)
+
+    @staticmethod
+    def marcar_matricula(c, layout, alumno):
+        """Escribe sobre la primera página los datos del alumno y rellena las burbujas de su matrícula"""
+        margen = layout['margen']
+        info_y = layout['info_y']
+        matricula = layout['matricula']
+        digitos = alumno['matricula'].zfill(matricula['digitos'])
+        
+        GeneradorPDF.definir_burbuja_rellena(c, layout['radio'])
+        c.setFillColorRGB(0, 0, 0)
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(margen + 0.75 * inch, info_y - 0.18 * inch, alumno['nombre'])
+        if alumno.get('grupo'):
+            c.drawString(margen + 0.65 * inch, info_y - 0.38 * inch, alumno['grupo'])
+        
+        for digito, columna in zip(digitos, matricula['columnas']):
+            x_pos = columna[0][0]
+            c.drawCentredString(x_pos, matricula['y_casillas'] - 3.5, digito)
+            GeneradorPDF.estampar_formulario(c, "burbuja_rellena", *columna[int(digito)])
+
+    @staticmethod
+    def generar_hojas_lista_alumnos(ruta_csv, tema, num_preguntas=5, num_opciones=5,
+                                    carpeta_salida="examenes_pdf", digitos_matricula=None):
+        """
+        Genera un solo PDF con una hoja de respuestas personalizada por alumno de
+        la lista (nombre, grupo y matrícula codificada en burbujas), en el orden
+        del CSV. La hoja se dibuja una vez como formulario y cada página solo
+        agrega los datos del alumno, así que el PDF crece poco por alumno
+        
+        Args:
+            ruta_csv (str): Lista de alumnos (ver lista_alumnos.leer_lista_alumnos)
+            digitos_matricula (int): Dígitos de la cuadrícula; por defecto, los de la
+                                     matrícula más larga de la lista
+        
+        Returns:
+            tuple: (ruta del PDF, ruta del layout, número de alumnos)
+        """
+        alumnos = leer_lista_alumnos(ruta_csv)
+        if not alumnos:
+            raise ValueError("La lista de alumnos está vacía")
+        
+        if digitos_matricula is None:
+            digitos_matricula = max(len(alumno['matricula']) for alumno in alumnos)
+        elif any(len(alumno['matricula']) > digitos_matricula for alumno in alumnos):
+            raise ValueError(f"Hay matrículas con más de {digitos_matricula} dígitos")
         
-        # Instrucciones
-        c.setFont("Helvetica", 9)
-        instrucciones = [
-            "INSTRUCCIONES:",
-            "1. Use solo LÁPIZ para marcar sus respuestas",
-            "2. Rellene COMPLETAMENTE la burbuja de su elección",
-            "3. Borre completamente cualquier marca incorrecta",
-            "4. No doble, arrugue o maltrate esta hoja",
-            "5. Escriba claramente su nombre y grupo"
-        ]
-        
-        y_inst = margen + 0.8 * inch
-        for instruccion in instrucciones:
-            c.drawString(margen, y_inst, instruccion)
-            y_inst -= 0.2 * inch
-        
-        # Pie de página
-        c.setFont("Helvetica-Oblique", 8)
-        c.drawString(margen, margen - 0.3 * inch, 
-                    f"Generado automáticamente - {tema} - {num_preguntas} preguntas")
+        if not os.path.exists(carpeta_salida):
+            os.makedirs(carpeta_salida)
+        
+        nombre_base = tema.lower().replace(' ', '_')
+        ruta_pdf = os.path.join(carpeta_salida, f"hojas_alumnos_{nombre_base}.pdf")
+        
+        layout = GeneradorPDF.calcular_layout_hoja(num_preguntas, num_opciones, digitos_matricula)
+        c = canvas.Canvas(ruta_pdf, pagesize=letter)
+        formularios = GeneradorPDF.dibujar_formularios_hoja(c, layout, tema)
+        
+        for alumno in alumnos:
+            for pagina, nombre_formulario in enumerate(formularios):
+                c.doForm(nombre_formulario)
+                if pagina == layout['matricula']['pagina']:
+                    GeneradorPDF.marcar_matricula(c, layout, alumno)
+                c.showPage()
         
         c.save()
-        return pdf_path, clave_respuestas
+        
+        ruta_layout = GeneradorPDF.guardar_layout_hoja(layout, GeneradorPDF.ruta_layout_hoja(ruta_pdf))
+        print(f"✅ {len(alumnos)} hojas personalizadas en {ruta_pdf}")
+        return ruta_pdf, ruta_layout, len(alumnos)
+
+    @staticmethod
+    def definir_burbuja_rellena(c, radio):
+        """Define (una vez por documento) el formulario de la burbuja rellena"""
+        if not c.hasForm("burbuja_rellena"):
+            c.setFillColorRGB(0, 0, 0)
+            GeneradorPDF.dibujar_formulario_burbuja(c, "burbuja_rellena", radio, relleno=True)
+
+    @staticmethod
+    def dibujar_formulario_burbuja(c, nombre, radio, relleno):
+        """Define un formulario con una burbuja centrada en el origen"""
+        c.beginForm(nombre, lowerx=-radio - 1, lowery=-radio - 1, upperx=radio + 1, uppery=radio + 1)
+        c.circle(0, 0, radio, stroke=1, fill=1 if relleno else 0)
+        c.endForm()
+
+    @staticmethod
+    def estampar_formulario(c, nombre, x, y):
+        """Dibuja un formulario ya definido trasladado a (x, y)"""
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(nombre)
+        c.restoreState()
+
+    @staticmethod
+    def marcar_clave_pagina(c, layout, clave_respuestas, pagina):
+        """Rellena sobre la página actual las burbujas correctas de sus preguntas (hoja del profesor)"""
+        GeneradorPDF.definir_burbuja_rellena(c, layout['radio'])
+        
+        c.setFont("Helvetica-Bold", 8)
+        c.setFillColorRGB(0, 0, 0)
+        for pregunta in layout['preguntas']:
+            if pregunta['pagina'] != pagina:
+                continue
+            correcta = clave_respuestas.get(pregunta['pregunta'])
+            if correcta is None or not 0 <= correcta < len(pregunta['centros']):
+                continue
+            x_pos, y_centro = pregunta['centros'][correcta]
+            c.drawString(x_pos - 0.05 * inch, pregunta['y'] - 0.1 * inch, "X")
+            GeneradorPDF.estampar_formulario(c, "burbuja_rellena", x_pos, y_centro)
 
     @staticmethod
     def generar_cuestionario_pdf(tema, preguntas, num_opciones=5):
@@ -525,29 +879,42 @@ class GeneradorPDF:
         return pdf_path
 
     @staticmethod
-    def generar_examen_completo(tema, preguntas=None, num_preguntas=5, num_opciones=5, carpeta_salida="examenes_pdf"):
+    def generar_examen_completo(tema, preguntas=None, num_preguntas=5, num_opciones=5, carpeta_salida="examenes_pdf",
+                                rng=None):
         """
         Genera un examen completo en PDF (cuestionario + hoja de respuestas)
         Si no se proporcionan preguntas, genera preguntas aleatorias
+        
+        Args:
+            rng (random.Random): Generador para sortear preguntas y respuestas sin clave
+                                 (por defecto, el del módulo random)
         """
+        rng = rng or random
         if not os.path.exists(carpeta_salida):
             os.makedirs(carpeta_salida)
         
         # Generar preguntas si no se proporcionan
         if preguntas is None:
-            preguntas = GeneradorPDF.generar_preguntas_aleatorias(tema, num_preguntas)
+            preguntas = GeneradorPDF.generar_preguntas_aleatorias(tema, num_preguntas, rng=rng)
         
         # Generar cuestionario PDF
         cuestionario_pdf = GeneradorPDF.generar_cuestionario_pdf(tema, preguntas, num_opciones)
         
+        # La clave sale de las respuestas correctas de las preguntas
+        clave = {}
+        for i, pregunta in enumerate(preguntas):
+            # Solo se sortea si falta la respuesta: así no se consume el generador de más
+            r = pregunta.get('respuesta_correcta')
+            clave[i] = r if r is not None else rng.randint(0, num_opciones-1)
+        
         # Generar hoja de respuestas para estudiantes
-        hoja_estudiante_pdf, clave = GeneradorPDF.generar_hoja_respuestas_pdf(
-            tema, len(preguntas), num_opciones, incluir_clave=False
+        hoja_estudiante_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
+            tema, len(preguntas), num_opciones, incluir_clave=False, clave_respuestas=clave
         )
         
-        # Generar hoja de respuestas para profesor (con clave)
+        # Generar hoja de respuestas para profesor (con la misma clave)
         hoja_profesor_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
-            tema, len(preguntas), num_opciones, incluir_clave=True
+            tema, len(preguntas), num_opciones, incluir_clave=True, clave_respuestas=clave
         )
         
         # Mover archivos a la carpeta de salida
@@ -561,37 +928,70 @@ class GeneradorPDF:
         os.rename(hoja_estudiante_pdf, archivo_hoja_estudiante)
         os.rename(hoja_profesor_pdf, archivo_hoja_profesor)
         
+        # El layout es el mismo para ambas hojas: se conserva junto a la del estudiante
+        os.rename(GeneradorPDF.ruta_layout_hoja(hoja_estudiante_pdf), GeneradorPDF.ruta_layout_hoja(archivo_hoja_estudiante))
+        os.remove(GeneradorPDF.ruta_layout_hoja(hoja_profesor_pdf))
+        
         return archivo_cuestionario, archivo_hoja_estudiante, archivo_hoja_profesor, clave, preguntas
 
     @staticmethod
-    def generar_examenes_masivos(temas, num_preguntas=5, num_opciones=5, carpeta_salida="examenes_pdf"):
+    def generar_examenes_masivos(temas, num_preguntas=5, num_opciones=5, carpeta_salida="examenes_pdf",
+                                 num_procesos=None):
         """
         Genera exámenes completos en PDF para múltiples temas
+        
+        Los temas se reparten entre un pool de procesos (reportlab dibuja en un
+        solo hilo). Cada tema recibe una semilla tomada del generador aleatorio
+        del proceso principal, así que el resultado no depende del reparto. Los
+        archivos comunes se escriben al final, en el orden de `temas`
+        
+        Args:
+            num_procesos (int): Procesos del pool (por defecto, número de núcleos;
+                                con 1 se genera todo en este proceso)
         """
         if not os.path.exists(carpeta_salida):
             os.makedirs(carpeta_salida)
         
+        temas = list(temas)
+        semillas = [random.getrandbits(64) for _ in temas]
+        argumentos = [(tema, semilla, num_preguntas, num_opciones, carpeta_salida)
+                      for tema, semilla in zip(temas, semillas)]
+        
+        if num_procesos is None:
+            num_procesos = os.cpu_count() or 1
+        num_procesos = max(1, min(num_procesos, len(temas)))
+        
+        if num_procesos == 1:
+            generados = [_generar_examen_tema(*args) for args in argumentos]
+        else:
+            with ProcessPoolExecutor(max_workers=num_procesos) as ejecutor:
+                futuros = [ejecutor.submit(_generar_examen_tema, *args) for args in argumentos]
+                generados = []
+                for tema, futuro in zip(temas, futuros):
+                    try:
+                        generados.append(futuro.result())
+                    except Exception as e:
+                        # El proceso trabajador terminó de forma inesperada
+                        generados.append((None, f"{type(e).__name__}: {str(e)}"))
+        
         resultados = {}
         claves_totales = {}
         
-        for tema in temas:
-            try:
-                cuestionario, hoja_estudiante, hoja_profesor, clave, preguntas = GeneradorPDF.generar_examen_completo(
-                    tema, None, num_preguntas, num_opciones, carpeta_salida
-                )
-                
-                resultados[tema] = {
-                    'cuestionario': cuestionario,
-                    'hoja_estudiante': hoja_estudiante,
-                    'hoja_profesor': hoja_profesor,
-                    'preguntas': preguntas
-                }
-                claves_totales[tema] = clave
-                
-                print(f"✅ PDF generado: {tema}")
-                
-            except Exception as e:
-                print(f"❌ Error generando {tema}: {str(e)}")
+        for tema, (examen, error) in zip(temas, generados):
+            if error is not None:
+                print(f"❌ Error generando {tema}: {error}")
+                continue
+            
+            cuestionario, hoja_estudiante, hoja_profesor, clave, preguntas = examen
+            resultados[tema] = {
+                'cuestionario': cuestionario,
+                'hoja_estudiante': hoja_estudiante,
+                'hoja_profesor': hoja_profesor,
+                'preguntas': preguntas
+            }
+            claves_totales[tema] = clave
+            
+            print(f"✅ PDF generado: {tema}")
         
         # Guardar claves en archivo de texto
         with open(os.path.join(carpeta_salida, "claves_respuestas.txt"), "w", encoding='utf-8') as f:
@@ -619,19 +1019,22 @@ class GeneradorPDF:
         # Generar clave de respuestas desde las preguntas personalizadas
         clave_respuestas = {}
         for i, pregunta in enumerate(preguntas_personalizadas):
-            # Usar la respuesta correcta especificada en la pregunta
-            clave_respuestas[i] = pregunta.get('respuesta_correcta', random.randint(0, num_opciones-1))
+            # Usar la respuesta correcta especificada en la pregunta (se sortea solo si falta)
+            r = pregunta.get('respuesta_correcta')
+            clave_respuestas[i] = r if r is not None else random.randint(0, num_opciones-1)
         
         # Generar cuestionario PDF
         cuestionario_pdf = GeneradorPDF.generar_cuestionario_pdf(tema, preguntas_personalizadas, num_opciones)
         
-        # Generar hojas de respuestas
+        # Generar hojas de respuestas (la del profesor marca la clave de las preguntas)
         hoja_estudiante_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
-            tema, len(preguntas_personalizadas), num_opciones, incluir_clave=False
+            tema, len(preguntas_personalizadas), num_opciones, incluir_clave=False,
+            clave_respuestas=clave_respuestas
         )
         
         hoja_profesor_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
-            tema, len(preguntas_personalizadas), num_opciones, incluir_clave=True
+            tema, len(preguntas_personalizadas), num_opciones, incluir_clave=True,
+            clave_respuestas=clave_respuestas
         )
         
         # Mover archivos a carpeta de salida
@@ -645,6 +1048,10 @@ class GeneradorPDF:
         os.rename(hoja_estudiante_pdf, archivo_hoja_estudiante)
         os.rename(hoja_profesor_pdf, archivo_hoja_profesor)
         
+        # El layout es el mismo para ambas hojas: se conserva junto a la del estudiante
+        os.rename(GeneradorPDF.ruta_layout_hoja(hoja_estudiante_pdf), GeneradorPDF.ruta_layout_hoja(archivo_hoja_estudiante))
+        os.remove(GeneradorPDF.ruta_layout_hoja(hoja_profesor_pdf))
+        
         # Guardar clave en archivo de texto
         with open(os.path.join(carpeta_salida, f"clave_{nombre_base}.txt"), "w", encoding='utf-8') as f:
             f.write(f"CLAVE DE RESPUESTAS - {tema}\n")
@@ -659,6 +1066,96 @@ class GeneradorPDF:
         
         return archivo_cuestionario, archivo_hoja_estudiante, archivo_hoja_profesor, clave_respuestas
 
+    @staticmethod
+    def generar_examen_variantes(tema, preguntas=None, num_preguntas=5, num_opciones=5, num_variantes=4,
+                                 carpeta_salida="examenes_pdf", semilla=None, rng=None):
+        """
+        Genera varias versiones de un examen a partir de la misma lista de
+        preguntas, barajando el orden de las preguntas y de sus opciones
+        
+        Por cada versión se escriben cuestionario, hoja de respuestas (con su
+        versión ya rellena) y clave de corrección. Todas las hojas comparten un
+        layout, la clave en el orden original (clave_{tema}.json) y el almacén de
+        permutaciones (variantes_{tema}.npz) con el que el calificador identifica
+        la versión de cada hoja y devuelve sus respuestas al orden original
+        
+        Args:
+            semilla (int): Semilla de las permutaciones (por defecto, se sortea con rng)
+            rng (random.Random): Generador para sortear preguntas, respuestas sin clave
+                                 y la semilla (por defecto, el del módulo random)
+        
+        Returns:
+            tuple: (archivos por versión [(cuestionario, hoja, clave_correccion)],
+                    ruta del layout, ruta de las versiones, ruta de la clave, clave original)
+        """
+        rng = rng or random
+        if not os.path.exists(carpeta_salida):
+            os.makedirs(carpeta_salida)
+        
+        if preguntas is None:
+            preguntas = GeneradorPDF.generar_preguntas_aleatorias(tema, num_preguntas, rng=rng)
+        
+        # Clave en el orden original, como en generar_cuestionario_personalizado
+        clave_respuestas = {}
+        for i, pregunta in enumerate(preguntas):
+            r = pregunta.get('respuesta_correcta')
+            clave_respuestas[i] = r if r is not None else rng.randint(0, num_opciones-1)
+        
+        if semilla is None:
+            semilla = rng.getrandbits(64)
+        almacen = AlmacenVariantes.crear(
+            [clave_respuestas[i] for i in range(len(preguntas))], num_opciones, num_variantes, semilla,
+            opciones_por_pregunta=[min(len(p['opciones']), num_opciones) for p in preguntas]
+        )
+        
+        nombre_base = tema.lower().replace(' ', '_')
+        archivos = []
+        
+        for variante in range(num_variantes):
+            letra = letra_variante(variante)
+            tema_variante = f"{tema} - Versión {letra}"
+            clave_variante = almacen.clave_variante(variante)
+            
+            cuestionario_pdf = GeneradorPDF.generar_cuestionario_pdf(
+                tema_variante, almacen.preguntas_variante(variante, preguntas), num_opciones
+            )
+            hoja_estudiante_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
+                tema_variante, len(preguntas), num_opciones, clave_respuestas=clave_variante,
+                num_variantes=num_variantes, variante=variante
+            )
+            hoja_profesor_pdf, _ = GeneradorPDF.generar_hoja_respuestas_pdf(
+                tema_variante, len(preguntas), num_opciones, incluir_clave=True, clave_respuestas=clave_variante,
+                num_variantes=num_variantes, variante=variante
+            )
+            
+            archivo_cuestionario = os.path.join(carpeta_salida, f"cuestionario_{nombre_base}_{letra}.pdf")
+            archivo_hoja_estudiante = os.path.join(carpeta_salida, f"hoja_respuestas_{nombre_base}_{letra}.pdf")
+            archivo_hoja_profesor = os.path.join(carpeta_salida, f"clave_correccion_{nombre_base}_{letra}.pdf")
+            
+            os.rename(cuestionario_pdf, archivo_cuestionario)
+            os.rename(hoja_estudiante_pdf, archivo_hoja_estudiante)
+            os.rename(hoja_profesor_pdf, archivo_hoja_profesor)
+            
+            # Todas las versiones comparten la posición de las burbujas: basta un layout
+            ruta_layout = os.path.join(carpeta_salida, f"hoja_respuestas_{nombre_base}_layout.json")
+            os.replace(GeneradorPDF.ruta_layout_hoja(hoja_estudiante_pdf), ruta_layout)
+            os.remove(GeneradorPDF.ruta_layout_hoja(hoja_profesor_pdf))
+            
+            archivos.append((archivo_cuestionario, archivo_hoja_estudiante, archivo_hoja_profesor))
+        
+        ruta_variantes = almacen.guardar(os.path.join(carpeta_salida, f"variantes_{nombre_base}.npz"))
+        
+        ruta_clave = os.path.join(carpeta_salida, f"clave_{nombre_base}.json")
+        with open(ruta_clave, "w", encoding='utf-8') as f:
+            json.dump({"tema": tema, "num_variantes": num_variantes,
+                       "respuestas": [clave_respuestas[i] for i in range(len(preguntas))]},
+                      f, ensure_ascii=False, indent=2)
+        
+        with open(os.path.join(carpeta_salida, f"preguntas_{nombre_base}.json"), "w", encoding='utf-8') as f:
+            json.dump(preguntas, f, ensure_ascii=False, indent=2)
+        
+        return archivos, ruta_layout, ruta_variantes, ruta_clave, clave_respuestas
+
     @staticmethod
     def generar_desde_json(archivo_json, carpeta_salida="examenes_pdf"):
         """
@@ -680,4 +1177,19 @@ class GeneradorPDF:
         
         return GeneradorPDF.generar_cuestionario_personalizado(
             preguntas, titulo, num_opciones, carpeta_salida
-        )
\ No newline at end of file
+        )
+
+
+def _generar_examen_tema(tema, semilla, num_preguntas, num_opciones, carpeta_salida):
+    """
+    Genera el examen de un tema (en un proceso del pool de generar_examenes_masivos)
+
+    Returns:
+        tuple: (resultado de generar_examen_completo, None) o (None, mensaje de error)
+    """
+    # Generador propio: con un solo proceso esto corre en el del llamador y no debe tocar su estado
+    rng = random.Random(semilla)
+    try:
+        return GeneradorPDF.generar_examen_completo(tema, None, num_preguntas, num_opciones, carpeta_salida, rng), None
+    except Exception as e:
+        return None, str(e)
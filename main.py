@@ -1,17 +1,135 @@
 # [file name]: main.py
 
 import os
+import time
+import queue
 import tempfile
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk
-import cv2
+from PIL import ImageTk
 import json
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # Importar la lógica del programa
 from logica import GeneradorPDF, GestorCuestionarios, BANCO_PREGUNTAS
-from calificador_automatico import CalificadorAutomatico
+from calificador_automatico import CalificadorAutomatico, NUM_VISTAS
+from almacen_resultados import AlmacenResultados, RUTA_ALMACEN
+from miniaturas import CacheMiniaturas, crear_miniatura_resultado
+from tabla_virtual import TablaVirtual
+from variantes import MAX_VARIANTES, letra_variante
+from vigilante_carpeta import EXTENSIONES_IMAGEN
+
+# ==============================
+# ⚙️ Tareas en segundo plano
+# ==============================
+
+class TareaCancelada(Exception):
+    """Se lanza dentro de un trabajo para detenerlo cuando el usuario lo cancela"""
+
+
+class TareaSegundoPlano:
+    """Trabajo enviado al ejecutor: permite cancelarlo e informar su progreso"""
+
+    def __init__(self, descripcion, cola, al_terminar, al_fallar, al_progresar):
+        self.descripcion = descripcion
+        self._cola = cola
+        self._cancelada = threading.Event()
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+        self.al_progresar = al_progresar
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        """
+        Pide la cancelación. El trabajo la atiende en su siguiente punto de
+        revisión (revisar_cancelacion); si no tiene ninguno, su resultado se descarta
+        """
+        self._cancelada.set()
+
+    def revisar_cancelacion(self):
+        """Llamado desde el trabajo: lanza TareaCancelada si se pidió cancelar"""
+        if self._cancelada.is_set():
+            raise TareaCancelada()
+
+    def informar_progreso(self, fraccion=None, mensaje=None):
+        """Llamado desde el trabajo: fraccion en [0, 1], o None si no se conoce"""
+        self._cola.put(('progreso', self, (fraccion, mensaje)))
+
+
+class EjecutorSegundoPlano:
+    """
+    Ejecuta los trabajos pesados (calificación, generación de PDFs) fuera del
+    hilo de Tk. Los trabajos nunca tocan la interfaz: sus resultados, errores y
+    avances pasan por una cola que el hilo de Tk revisa con after()
+    """
+
+    def __init__(self, root, intervalo_ms=50):
+        self.root = root
+        self.intervalo_ms = intervalo_ms
+        self.cola = queue.Queue()
+        self.ejecutor = ThreadPoolExecutor(max_workers=1)
+        self.tareas = set()
+        self._id_revision = self.root.after(self.intervalo_ms, self._revisar_cola)
+
+    def enviar(self, descripcion, trabajo, al_terminar, al_fallar=None, al_progresar=None):
+        """
+        Envía un trabajo. `trabajo(tarea)` se ejecuta en segundo plano; los
+        callbacks se llaman en el hilo de Tk
+
+        Returns:
+            TareaSegundoPlano: Tarea enviada (para cancelarla)
+        """
+        tarea = TareaSegundoPlano(descripcion, self.cola, al_terminar, al_fallar, al_progresar)
+        self.tareas.add(tarea)
+        self.ejecutor.submit(self._ejecutar, tarea, trabajo)
+        return tarea
+
+    def _ejecutar(self, tarea, trabajo):
+        try:
+            tarea.revisar_cancelacion()
+            resultado = trabajo(tarea)
+        except TareaCancelada:
+            self.cola.put(('cancelada', tarea, None))
+        except Exception as e:
+            self.cola.put(('error', tarea, e))
+        else:
+            self.cola.put(('cancelada' if tarea.cancelada else 'terminada', tarea, resultado))
+
+    def _revisar_cola(self):
+        """Entrega en el hilo de Tk los mensajes pendientes de los trabajos"""
+        try:
+            while True:
+                tipo, tarea, valor = self.cola.get_nowait()
+                if tipo == 'progreso':
+                    if tarea.al_progresar and not tarea.cancelada:
+                        tarea.al_progresar(tarea, *valor)
+                    continue
+
+                self.tareas.discard(tarea)
+                if tipo == 'terminada':
+                    tarea.al_terminar(tarea, valor)
+                elif tarea.al_fallar:
+                    tarea.al_fallar(tarea, valor)
+        except queue.Empty:
+            pass
+        finally:
+            # Un error en un callback no debe detener la revisión de la cola
+            self._id_revision = self.root.after(self.intervalo_ms, self._revisar_cola)
+
+    def ocupado(self):
+        return bool(self.tareas)
+
+    def cerrar(self):
+        """Cancela lo pendiente y deja de revisar la cola (al cerrar la ventana)"""
+        for tarea in self.tareas:
+            tarea.cancelar()
+        self.root.after_cancel(self._id_revision)
+        self.ejecutor.shutdown(wait=False)
+
 
 # ==============================
 # 🪟 Interfaz gráfica
@@ -28,19 +146,110 @@ class AplicacionCalificador:
         # Variables globales
         self.preguntas_personalizadas = []
         self.calificador = CalificadorAutomatico()
+        self.tareas = EjecutorSegundoPlano(self.root)
+        self.tarea_actual = None
+        self.miniaturas = CacheMiniaturas()
         
         self.crear_interfaz()
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar_aplicacion)
     
     def crear_interfaz(self):
+        # Barra de estado de las tareas en segundo plano (se empaqueta primero para que no se oculte)
+        self.crear_barra_estado()
+        
         # Notebook para pestañas
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Crear pestañas
         self.crear_pestana_calificacion_automatica()
+        self.crear_pestana_lote()
         self.crear_pestana_personalizado()
         self.crear_pestana_cargar_json()
     
+    def crear_barra_estado(self):
+        """Barra inferior con el estado, el progreso y la cancelación de la tarea en curso"""
+        frame_estado = tk.Frame(self.root, bg="#f7f7f7")
+        frame_estado.pack(side="bottom", fill="x", padx=10, pady=(0, 10))
+        
+        self.label_estado_tarea = tk.Label(frame_estado, text="Listo", bg="#f7f7f7", anchor="w")
+        self.label_estado_tarea.pack(side="left", fill="x", expand=True)
+        
+        self.btn_cancelar_tarea = tk.Button(frame_estado, text="⛔ Cancelar", command=self.cancelar_tarea,
+                                            state="disabled")
+        self.btn_cancelar_tarea.pack(side="right", padx=(10, 0))
+        
+        self.barra_progreso = ttk.Progressbar(frame_estado, length=220, mode="determinate", maximum=1.0)
+        self.barra_progreso.pack(side="right")
+    
+    # ==============================
+    # Tareas en segundo plano
+    # ==============================
+    
+    def iniciar_tarea(self, descripcion, trabajo, al_terminar, determinada=False, mensaje_error=None):
+        """
+        Ejecuta `trabajo(tarea)` en segundo plano mostrando el progreso; al
+        terminar llama a `al_terminar(resultado)` en el hilo de Tk. Solo se
+        permite una tarea a la vez
+        """
+        if self.tareas.ocupado():
+            messagebox.showinfo("Información", "Espera a que termine la tarea en curso o cancélala.")
+            return None
+        
+        def terminar(tarea, resultado):
+            self.finalizar_tarea("Listo")
+            al_terminar(resultado)
+        
+        def fallar(tarea, error):
+            if error is None:
+                self.finalizar_tarea("⛔ Tarea cancelada")
+            else:
+                self.finalizar_tarea("❌ Error en la tarea")
+                messagebox.showerror("Error", f"{mensaje_error or descripcion}:\n{str(error)}")
+        
+        self.tarea_actual = self.tareas.enviar(descripcion, trabajo, terminar, fallar, self.actualizar_progreso)
+        
+        self.label_estado_tarea.config(text=f"🔄 {descripcion}...")
+        self.btn_cancelar_tarea.config(state="normal")
+        if determinada:
+            self.barra_progreso.config(mode="determinate", value=0)
+        else:
+            self.barra_progreso.config(mode="indeterminate")
+            self.barra_progreso.start(15)
+        return self.tarea_actual
+    
+    def actualizar_progreso(self, tarea, fraccion, mensaje):
+        if fraccion is not None and str(self.barra_progreso.cget("mode")) == "determinate":
+            self.barra_progreso.config(value=fraccion)
+        if mensaje:
+            self.label_estado_tarea.config(text=f"🔄 {tarea.descripcion}: {mensaje}")
+    
+    def finalizar_tarea(self, mensaje):
+        self.tarea_actual = None
+        self.barra_progreso.stop()
+        self.barra_progreso.config(mode="determinate", value=0)
+        self.btn_cancelar_tarea.config(state="disabled")
+        self.label_estado_tarea.config(text=mensaje)
+    
+    def cancelar_tarea(self):
+        if self.tarea_actual is not None:
+            self.tarea_actual.cancelar()
+            self.label_estado_tarea.config(text="⛔ Cancelando...")
+            self.btn_cancelar_tarea.config(state="disabled")
+    
+    def cerrar_aplicacion(self):
+        self.tareas.cerrar()
+        self.root.destroy()
+    
+    def abrir_carpeta(self, carpeta):
+        """Pregunta si abrir la carpeta con los archivos generados y la abre"""
+        abrir = messagebox.askyesno("Abrir carpeta", "¿Deseas abrir la carpeta con los archivos generados?")
+        if abrir:
+            if os.name == 'nt':  # Windows
+                os.startfile(carpeta)
+            elif os.name == 'posix':  # macOS, Linux
+                os.system(f'open "{carpeta}"' if os.uname().sysname == 'Darwin' else f'xdg-open "{carpeta}"')
+    
     def crear_pestana_calificacion_automatica(self):
         """Crea la pestaña para calificación automática de exámenes"""
         frame_calificacion = ttk.Frame(self.notebook)
@@ -168,6 +377,78 @@ class AplicacionCalificador:
         tk.Label(frame_info, text="4. Revisa los resultados y guárdalos si es necesario", 
                 bg="#e8f4f8", wraplength=320, justify="left").pack(anchor="w", padx=20, pady=(2,10))
     
+    def crear_pestana_lote(self):
+        """Crea la pestaña para calificar una carpeta o lista de hojas en paralelo"""
+        frame_lote = ttk.Frame(self.notebook)
+        self.notebook.add(frame_lote, text="📚 Calificar Lote")
+        
+        self.rutas_lote = []
+        self.cola_lote = queue.Queue()
+        self.inicio_lote = None
+        
+        # Controles
+        frame_controles = tk.Frame(frame_lote, bg="#f7f7f7")
+        frame_controles.pack(fill="x", padx=10, pady=10)
+        
+        tk.Button(frame_controles, text="📂 Seleccionar Carpeta", 
+                 command=self.seleccionar_carpeta_lote).pack(side="left", padx=(0, 5))
+        tk.Button(frame_controles, text="🗂️ Seleccionar Archivos", 
+                 command=self.seleccionar_archivos_lote).pack(side="left", padx=(0, 15))
+        tk.Button(frame_controles, text="📐 Cargar Layout", 
+                 command=self.cargar_layout_lote).pack(side="left", padx=(0, 5))
+        tk.Button(frame_controles, text="👥 Lista de Alumnos", 
+                 command=self.cargar_lista_alumnos_lote).pack(side="left", padx=(0, 5))
+        tk.Button(frame_controles, text="🔀 Cargar Versiones", 
+                 command=self.cargar_variantes_lote).pack(side="left", padx=(0, 15))
+        
+        tk.Label(frame_controles, text="Procesos:", bg="#f7f7f7").pack(side="left")
+        self.var_procesos_lote = tk.IntVar(value=os.cpu_count() or 1)
+        tk.Spinbox(frame_controles, from_=1, to=64, width=4, 
+                  textvariable=self.var_procesos_lote).pack(side="left", padx=(2, 15))
+        
+        self.var_almacen_lote = tk.BooleanVar(value=True)
+        tk.Checkbutton(frame_controles, text=f"Registrar en {os.path.basename(RUTA_ALMACEN)}", variable=self.var_almacen_lote,
+                      bg="#f7f7f7").pack(side="left", padx=(0, 15))
+        
+        tk.Button(frame_controles, text="🚀 Calificar Lote", command=self.calificar_lote_gui, 
+                 bg="#2196F3", fg="white", font=("Arial", 10, "bold")).pack(side="left")
+        
+        self.label_info_lote = tk.Label(frame_controles, text="No se han seleccionado hojas (usa la clave de la pestaña 🎯)", 
+                                       bg="#f7f7f7")
+        self.label_info_lote.pack(side="left", padx=15)
+        
+        # Filtros
+        frame_filtros = tk.Frame(frame_lote, bg="#f7f7f7")
+        frame_filtros.pack(fill="x", padx=10)
+        
+        tk.Label(frame_filtros, text="Buscar archivo o alumno:", bg="#f7f7f7").pack(side="left")
+        self.var_filtro_lote = tk.StringVar()
+        self.var_filtro_lote.trace_add("write", lambda *_: self.aplicar_filtro_lote())
+        tk.Entry(frame_filtros, textvariable=self.var_filtro_lote, width=30).pack(side="left", padx=(5, 15))
+        
+        tk.Label(frame_filtros, text="Estado:", bg="#f7f7f7").pack(side="left")
+        self.var_estado_lote = tk.StringVar(value="Todos")
+        combo_estado = ttk.Combobox(frame_filtros, textvariable=self.var_estado_lote, width=10,
+                                    values=("Todos", "OK", "Error"), state="readonly")
+        combo_estado.pack(side="left", padx=5)
+        combo_estado.bind("<<ComboboxSelected>>", lambda e: self.aplicar_filtro_lote())
+        
+        self.label_estadisticas_lote = tk.Label(frame_filtros, text="", bg="#f7f7f7", font=("Arial", 10, "bold"))
+        self.label_estadisticas_lote.pack(side="right")
+        
+        # Tabla de resultados (solo se dibujan las filas visibles)
+        self.tabla_lote = TablaVirtual(frame_lote, [
+            ("numero", "#", 60, None),
+            ("archivo", "Archivo", 260, None),
+            ("matricula", "Matrícula", 100, None),
+            ("alumno", "Alumno", 200, None),
+            ("variante", "Versión", 70, letra_variante),
+            ("puntaje", "Puntaje", 90, lambda v: f"{v:.2f}%"),
+            ("estado", "Estado", 260, None),
+            ("latencia", "Latencia (ms)", 110, lambda v: f"{v:.0f}")
+        ], filas_visibles=22)
+        self.tabla_lote.pack(fill="both", expand=True, padx=10, pady=10)
+    
     def crear_pestana_personalizado(self):
         # Pestaña 2: Cuestionarios Personalizados
         frame_personalizado = ttk.Frame(self.notebook)
@@ -320,6 +601,11 @@ class AplicacionCalificador:
                                             bg="#dc3545", fg="white", command=self.generar_pdf_personalizado)
         btn_generar_personalizado.pack(side="left", padx=5, pady=5)
         
+        tk.Label(frame_botones_guardar, text="Versiones:", bg="#f7f7f7").pack(side="left", padx=(15, 2))
+        self.var_variantes_pers = tk.IntVar(value=1)
+        tk.Spinbox(frame_botones_guardar, from_=1, to=MAX_VARIANTES, width=4,
+                  textvariable=self.var_variantes_pers).pack(side="left")
+        
         # Actualizar campos cuando cambie el número de opciones
         self.var_opciones_pers.trace('w', lambda *args: self.actualizar_campos_opciones())
         
@@ -425,12 +711,22 @@ class AplicacionCalificador:
                                             bg="#f7f7f7", font=("Arial", 10, "bold"))
         frame_lista_guardados.pack(fill="both", expand=True, pady=10)
         
-        # Treeview para cuestionarios guardados
+        # Búsqueda (se resuelve con el índice de la carpeta, sin abrir los JSON)
+        frame_buscar_guardados = tk.Frame(frame_lista_guardados, bg="#f7f7f7")
+        frame_buscar_guardados.pack(fill="x", padx=5, pady=(5, 0))
+        tk.Label(frame_buscar_guardados, text="Buscar:", bg="#f7f7f7").pack(side="left")
+        self.var_buscar_guardados = tk.StringVar()
+        self.var_buscar_guardados.trace_add("write", lambda *_: self.mostrar_lista_guardados())
+        tk.Entry(frame_buscar_guardados, textvariable=self.var_buscar_guardados, width=30).pack(side="left", padx=5)
+        
+        # Treeview para cuestionarios guardados (clic en el encabezado para ordenar)
         tree_columns_guardados = ("Título", "Tema", "Preguntas", "Archivo", "Fecha")
+        campos_guardados = ("titulo", "tema", "total_preguntas", "archivo", "fecha_creacion")
+        self.orden_guardados = ("titulo", False)
         self.tree_guardados = ttk.Treeview(frame_lista_guardados, columns=tree_columns_guardados, show="headings", height=8)
         
-        for col in tree_columns_guardados:
-            self.tree_guardados.heading(col, text=col)
+        for col, campo in zip(tree_columns_guardados, campos_guardados):
+            self.tree_guardados.heading(col, text=col, command=lambda campo=campo: self.ordenar_lista_guardados(campo))
             self.tree_guardados.column(col, width=120)
         
         scroll_tree_guardados = ttk.Scrollbar(frame_lista_guardados, orient="vertical", command=self.tree_guardados.yview)
@@ -472,6 +768,8 @@ class AplicacionCalificador:
         if ruta:
             try:
                 if self.calificador.cargar_clave_desde_json(ruta):
+                    # Una clave cargada a mano es de un examen sin versiones
+                    self.calificador.variantes = None
                     self.ruta_clave_json = ruta
                     info = f"✅ Clave cargada: {self.calificador.num_preguntas} preguntas\n{os.path.basename(ruta)}"
                     self.label_info_clave.config(text=info, fg="green")
@@ -494,26 +792,16 @@ class AplicacionCalificador:
             # Mostrar vista previa de la imagen
             self.mostrar_vista_previa_imagen(ruta)
     
+    def tamaño_visor(self):
+        """Tamaño máximo disponible para la imagen en el visor"""
+        return (self.label_imagen_examen.winfo_width() or 600,
+                self.label_imagen_examen.winfo_height() or 400)
+    
     def mostrar_vista_previa_imagen(self, ruta_imagen):
-        """Muestra una vista previa de la imagen del examen"""
+        """Muestra una vista previa de la imagen del examen (desde la caché de miniaturas)"""
         try:
-            imagen = cv2.imread(ruta_imagen)
-            if imagen is not None:
-                # Redimensionar para vista previa
-                imagen_rgb = cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
-                h, w = imagen_rgb.shape[:2]
-                
-                # Calcular tamaño máximo para el label
-                max_w = self.label_imagen_examen.winfo_width() or 600
-                max_h = self.label_imagen_examen.winfo_height() or 400
-                
-                scale = min(max_w / w, max_h / h, 1.0)  # No escalar más allá del 100%
-                new_w, new_h = int(w * scale), int(h * scale)
-                
-                imagen_redimensionada = cv2.resize(imagen_rgb, (new_w, new_h))
-                imagen_pil = Image.fromarray(imagen_redimensionada)
-                imagen_tk = ImageTk.PhotoImage(imagen_pil)
-                
+            imagen_tk = self.miniaturas.obtener(ruta_imagen, *self.tamaño_visor())
+            if imagen_tk is not None:
                 self.label_imagen_examen.config(image=imagen_tk, text="")
                 self.label_imagen_examen.image = imagen_tk  # Mantener referencia
             else:
@@ -532,13 +820,34 @@ class AplicacionCalificador:
             messagebox.showerror("Error", "Primero selecciona una imagen del examen.")
             return
         
-        # Mostrar mensaje de procesamiento
-        self.label_imagen_examen.config(text="🔄 Procesando imagen...", image="")
-        self.root.update()
+        ruta_imagen = self.ruta_imagen_examen
+        ancho_visor, alto_visor = self.tamaño_visor()
+        # Copia del calificador: el hilo de trabajo no comparte estado con la interfaz
+        configuracion = self.calificador.obtener_configuracion()
+        # Solo resultados: la imagen anotada se genera al tamaño del visor (y al guardar)
+        configuracion['generar_imagen_resultado'] = False
         
-        try:
-            # Calificar examen
-            puntaje, imagen_procesada, resultados, error = self.calificador.procesar_hoja_respuestas(self.ruta_imagen_examen)
+        def trabajo(tarea):
+            calificador = CalificadorAutomatico.desde_configuracion(configuracion)
+            
+            # Cada etapa del pipeline informa el avance y es un punto de cancelación
+            def avance(evento):
+                tarea.revisar_cancelacion()
+                if evento.numero is not None:
+                    tarea.informar_progreso(evento.numero / NUM_VISTAS, evento.titulo)
+            
+            calificador.agregar_gancho(avance)
+            puntaje, _, resultados, error = calificador.procesar_hoja_respuestas(ruta_imagen)
+            tarea.revisar_cancelacion()
+            
+            esquinas = calificador.esquinas_hoja
+            miniatura = None
+            if not error:
+                miniatura = crear_miniatura_resultado(ruta_imagen, resultados, esquinas, ancho_visor, alto_visor)
+            return puntaje, miniatura, resultados, error, esquinas
+        
+        def al_terminar(resultado):
+            puntaje, miniatura, resultados, error, esquinas = resultado
             
             if error:
                 messagebox.showerror("Error", f"No se pudo calificar el examen:\n{error}")
@@ -546,37 +855,28 @@ class AplicacionCalificador:
                 return
             
             # Mostrar resultados
-            self.mostrar_resultados_calificacion(puntaje, imagen_procesada, resultados)
+            self.mostrar_resultados_calificacion(puntaje, miniatura, resultados)
             
-            # Guardar referencia a los resultados actuales
+            # Guardar referencia a los resultados actuales (la imagen anotada
+            # completa se vuelve a generar con las esquinas solo al guardar)
+            self.ruta_imagen_calificada = ruta_imagen
             self.resultados_actuales = resultados
             self.puntaje_actual = puntaje
-            self.imagen_procesada_actual = imagen_procesada
+            self.esquinas_actuales = esquinas
             
             messagebox.showinfo("Calificación completada", 
                               f"✅ Examen calificado correctamente\n\nPuntaje: {puntaje:.2f}%")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error inesperado:\n{str(e)}")
-            self.label_imagen_examen.config(text="❌ Error inesperado", image="")
+        
+        # Mostrar mensaje de procesamiento
+        if self.iniciar_tarea("Calificando examen", trabajo, al_terminar, determinada=True,
+                              mensaje_error="Error inesperado"):
+            self.label_imagen_examen.config(text="🔄 Procesando imagen...", image="")
     
-    def mostrar_resultados_calificacion(self, puntaje, imagen_procesada, resultados):
+    def mostrar_resultados_calificacion(self, puntaje, miniatura, resultados):
         """Muestra los resultados de la calificación en la interfaz"""
-        # Mostrar imagen procesada
-        if imagen_procesada is not None:
-            imagen_rgb = cv2.cvtColor(imagen_procesada, cv2.COLOR_BGR2RGB)
-            h, w = imagen_rgb.shape[:2]
-            
-            max_w = self.label_imagen_examen.winfo_width() or 600
-            max_h = self.label_imagen_examen.winfo_height() or 400
-            
-            scale = min(max_w / w, max_h / h, 1.0)
-            new_w, new_h = int(w * scale), int(h * scale)
-            
-            imagen_redimensionada = cv2.resize(imagen_rgb, (new_w, new_h))
-            imagen_pil = Image.fromarray(imagen_redimensionada)
-            imagen_tk = ImageTk.PhotoImage(imagen_pil)
-            
+        # Mostrar la miniatura de la hoja calificada (PIL, ya del tamaño del visor)
+        if miniatura is not None:
+            imagen_tk = ImageTk.PhotoImage(miniatura)
             self.label_imagen_examen.config(image=imagen_tk, text="")
             self.label_imagen_examen.image = imagen_tk
         
@@ -606,6 +906,177 @@ class AplicacionCalificador:
             
             self.tree_resultados.insert("", "end", values=(preg, selec, correcta, estado))
     
+    # ==============================
+    # Métodos de la pestaña Calificar Lote
+    # ==============================
+    
+    def seleccionar_carpeta_lote(self):
+        carpeta = filedialog.askdirectory(title="Seleccionar carpeta con hojas escaneadas")
+        if carpeta:
+            rutas = sorted(os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta)
+                           if nombre.lower().endswith(EXTENSIONES_IMAGEN))
+            self.usar_rutas_lote(rutas, os.path.basename(carpeta))
+    
+    def seleccionar_archivos_lote(self):
+        rutas = filedialog.askopenfilenames(
+            title="Seleccionar hojas escaneadas",
+            filetypes=[("Imágenes", "*.jpg *.jpeg *.png *.bmp *.tif *.tiff")]
+        )
+        if rutas:
+            self.usar_rutas_lote(list(rutas), "archivos seleccionados")
+    
+    def cargar_layout_lote(self):
+        """Carga el manifiesto de layout de las hojas (necesario para leer la matrícula)"""
+        ruta = filedialog.askopenfilename(title="Seleccionar layout de la hoja",
+                                          filetypes=[("Layout JSON", "*_layout.json"), ("JSON", "*.json")])
+        if ruta:
+            if self.calificador.cargar_layout(ruta):
+                texto = "con matrícula" if self.calificador.layout.get('matricula') else "sin matrícula"
+                messagebox.showinfo("Layout", f"Layout cargado ({texto}): {os.path.basename(ruta)}")
+            else:
+                messagebox.showerror("Error", "No se pudo cargar el layout")
+    
+    def cargar_lista_alumnos_lote(self):
+        """Carga la lista de alumnos (CSV) para mostrar el nombre de cada matrícula leída"""
+        ruta = filedialog.askopenfilename(title="Seleccionar lista de alumnos",
+                                          filetypes=[("CSV", "*.csv")])
+        if ruta:
+            if self.calificador.cargar_lista_alumnos(ruta):
+                messagebox.showinfo("Lista de alumnos", f"{len(self.calificador.alumnos)} alumnos cargados")
+            else:
+                messagebox.showerror("Error", "No se pudo cargar la lista de alumnos")
+    
+    def cargar_variantes_lote(self):
+        """Carga las versiones barajadas del examen; reemplaza la clave por la del orden original"""
+        ruta = filedialog.askopenfilename(title="Seleccionar versiones del examen",
+                                          filetypes=[("Versiones", "variantes_*.npz"), ("NPZ", "*.npz")])
+        if ruta:
+            if self.calificador.cargar_variantes(ruta):
+                self.ruta_clave_json = ruta
+                self.label_info_clave.config(
+                    text=f"✅ Clave original: {self.calificador.num_preguntas} preguntas\n{os.path.basename(ruta)}",
+                    fg="green")
+                messagebox.showinfo("Versiones", f"{self.calificador.variantes.num_variantes} versiones cargadas; "
+                                                 "los resultados se muestran en el orden original")
+            else:
+                messagebox.showerror("Error", "No se pudieron cargar las versiones")
+    
+    def usar_rutas_lote(self, rutas, origen):
+        self.rutas_lote = rutas
+        self.label_info_lote.config(text=f"📚 {len(rutas)} hojas ({origen})")
+    
+    def aplicar_filtro_lote(self):
+        """Filtra la tabla por nombre de archivo y estado, sin tocar los datos"""
+        texto = self.var_filtro_lote.get().strip().lower()
+        estado = self.var_estado_lote.get()
+        
+        if not texto and estado == "Todos":
+            self.tabla_lote.filtrar(None)
+            return
+        
+        def filtro(fila):
+            if texto and not any(texto in (campo or "").lower() for campo in fila[1:4]):
+                return False
+            if estado == "OK":
+                return fila[6] == "✅ OK"
+            if estado == "Error":
+                return fila[6] != "✅ OK"
+            return True
+        
+        self.tabla_lote.filtrar(filtro)
+    
+    def calificar_lote_gui(self):
+        """Califica las hojas seleccionadas en paralelo, mostrando cada fila al terminar"""
+        if not hasattr(self, 'ruta_clave_json') or not self.ruta_clave_json:
+            messagebox.showerror("Error", "Primero carga un archivo JSON con las respuestas correctas.")
+            return
+        
+        if not self.rutas_lote:
+            messagebox.showerror("Error", "Primero selecciona una carpeta o una lista de hojas.")
+            return
+        
+        rutas = list(self.rutas_lote)
+        total = len(rutas)
+        num_procesos = max(1, self.var_procesos_lote.get())
+        configuracion = self.calificador.obtener_configuracion()
+        cola = self.cola_lote = queue.Queue()
+        registrar = self.var_almacen_lote.get()
+        examen = os.path.splitext(os.path.basename(self.ruta_clave_json))[0]
+        
+        def trabajo(tarea):
+            calificador = CalificadorAutomatico.desde_configuracion(configuracion)
+            # La conexión SQLite se abre en el hilo que la usa
+            almacen = AlmacenResultados() if registrar else None
+            lote = calificador.calificar_lote(rutas, num_procesos=num_procesos, almacen=almacen, examen=examen)
+            informado = 0.0
+            try:
+                for i, resultado in enumerate(lote):
+                    cola.put((i, resultado))
+                    # Avisar el avance cada 0.5% para no inundar la cola de la interfaz
+                    fraccion = (i + 1) / total
+                    if fraccion - informado >= 0.005 or i + 1 == total:
+                        informado = fraccion
+                        tarea.informar_progreso(fraccion)
+                    if tarea.cancelada:
+                        break
+            finally:
+                # Cerrar el generador cancela las hojas que aún no empezaron
+                lote.close()
+                if almacen is not None:
+                    almacen.cerrar()
+            tarea.revisar_cancelacion()
+            return total
+        
+        def al_terminar(resultado):
+            self.volcar_filas_lote()
+        
+        if self.iniciar_tarea("Calificando lote", trabajo, al_terminar, determinada=True,
+                              mensaje_error="No se pudo calificar el lote"):
+            self.tabla_lote.limpiar()
+            self.total_lote = total
+            self.inicio_lote = time.perf_counter()
+            self.root.after(100, self.volcar_filas_lote)
+    
+    def volcar_filas_lote(self):
+        """
+        Pasa a la tabla las filas que ya terminaron, en bloques, y actualiza el
+        rendimiento y el tiempo estimado. Se repite con after() mientras dure el lote
+        """
+        filas, etiquetas = [], []
+        try:
+            while len(filas) < 2000:
+                i, resultado = self.cola_lote.get_nowait()
+                error = resultado['error']
+                alumno = resultado.get('alumno')
+                filas.append((
+                    i + 1,
+                    os.path.basename(resultado['ruta']),
+                    resultado.get('matricula'),
+                    alumno['nombre'] if alumno else None,
+                    resultado.get('variante'),
+                    None if error else resultado['puntaje'],
+                    f"❌ {error}" if error else "✅ OK",
+                    resultado.get('tiempo_ms')
+                ))
+                etiquetas.append("error" if error else "")
+        except queue.Empty:
+            pass
+        
+        if filas:
+            self.tabla_lote.agregar(filas, etiquetas)
+        
+        hechas = len(self.tabla_lote.filas)
+        transcurrido = time.perf_counter() - self.inicio_lote
+        velocidad = hechas / transcurrido if transcurrido > 0 else 0.0
+        texto = f"{hechas}/{self.total_lote} hojas | {velocidad:.1f} hojas/s"
+        if velocidad > 0 and hechas < self.total_lote:
+            restante = int((self.total_lote - hechas) / velocidad)
+            texto += f" | ETA {restante // 60:02d}:{restante % 60:02d}"
+        self.label_estadisticas_lote.config(text=texto)
+        
+        if self.tarea_actual is not None or not self.cola_lote.empty():
+            self.root.after(100, self.volcar_filas_lote)
+    
     def guardar_resultados_calificacion(self):
         """Guarda los resultados de la calificación actual"""
         if not hasattr(self, 'resultados_actuales') or not self.resultados_actuales:
@@ -616,22 +1087,29 @@ class AplicacionCalificador:
         if not carpeta:
             return
         
-        try:
-            ruta_imagen, ruta_reporte = self.calificador.guardar_resultados(
-                self.ruta_imagen_examen,
-                self.imagen_procesada_actual,
-                self.resultados_actuales,
-                self.puntaje_actual,
-                carpeta
-            )
-            
+        ruta_imagen = self.ruta_imagen_calificada
+        resultados = self.resultados_actuales
+        puntaje = self.puntaje_actual
+        esquinas = self.esquinas_actuales
+        configuracion = self.calificador.obtener_configuracion()
+        
+        def trabajo(tarea):
+            # La imagen anotada a resolución completa solo existe mientras se guarda
+            calificador = CalificadorAutomatico.desde_configuracion(configuracion)
+            imagen_procesada = calificador.renderizar_resultado(ruta_imagen, resultados, esquinas)
+            if imagen_procesada is None:
+                raise ValueError("No se pudo generar la imagen calificada")
+            return calificador.guardar_resultados(ruta_imagen, imagen_procesada, resultados, puntaje, carpeta)
+        
+        def al_terminar(resultado):
+            ruta_guardada, ruta_reporte = resultado
             messagebox.showinfo("Éxito", 
                               f"✅ Resultados guardados en:\n{carpeta}\n\n"
-                              f"• Imagen calificada: {os.path.basename(ruta_imagen)}\n"
+                              f"• Imagen calificada: {os.path.basename(ruta_guardada)}\n"
                               f"• Reporte: {os.path.basename(ruta_reporte)}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron guardar los resultados:\n{str(e)}")
+        
+        self.iniciar_tarea("Guardando resultados", trabajo, al_terminar,
+                           mensaje_error="No se pudieron guardar los resultados")
     
     def convertir_txt_a_json(self):
         """Convierte un archivo TXT de claves a formato JSON"""
@@ -666,8 +1144,8 @@ class AplicacionCalificador:
             del self.resultados_actuales
         if hasattr(self, 'puntaje_actual'):
             del self.puntaje_actual
-        if hasattr(self, 'imagen_procesada_actual'):
-            del self.imagen_procesada_actual
+        if hasattr(self, 'esquinas_actuales'):
+            del self.esquinas_actuales
         
         self.label_info_clave.config(text="No se ha cargado ninguna clave", fg="black")
         self.label_info_examen.config(text="No se ha seleccionado ningún examen")
@@ -871,10 +1349,20 @@ class AplicacionCalificador:
         if not carpeta:
             return
         
-        try:
-            cuestionario_pdf, hoja_estudiante_pdf, hoja_profesor_pdf, clave = GeneradorPDF.generar_cuestionario_personalizado(
-                self.preguntas_personalizadas, titulo, self.var_opciones_pers.get(), carpeta
-            )
+        # Copia de las preguntas: la lista se puede seguir editando mientras se genera
+        preguntas = [dict(p) for p in self.preguntas_personalizadas]
+        num_opciones = self.var_opciones_pers.get()
+        num_variantes = max(1, min(self.var_variantes_pers.get(), MAX_VARIANTES))
+        
+        if num_variantes > 1:
+            self.generar_variantes_personalizado(preguntas, titulo, num_opciones, num_variantes, carpeta)
+            return
+        
+        def trabajo(tarea):
+            return GeneradorPDF.generar_cuestionario_personalizado(preguntas, titulo, num_opciones, carpeta)
+        
+        def al_terminar(resultado):
+            cuestionario_pdf, hoja_estudiante_pdf, hoja_profesor_pdf, clave = resultado
             
             messagebox.showinfo("Éxito", 
                             f"✅ Cuestionario personalizado generado:\n\n"
@@ -885,15 +1373,31 @@ class AplicacionCalificador:
                             f"• Banco de preguntas: preguntas_{titulo.lower().replace(' ', '_')}.json")
             
             # Preguntar si abrir la carpeta
-            abrir = messagebox.askyesno("Abrir carpeta", "¿Deseas abrir la carpeta con los archivos generados?")
-            if abrir:
-                if os.name == 'nt':  # Windows
-                    os.startfile(carpeta)
-                elif os.name == 'posix':  # macOS, Linux
-                    os.system(f'open "{carpeta}"' if os.uname().sysname == 'Darwin' else f'xdg-open "{carpeta}"')
+            self.abrir_carpeta(carpeta)
+        
+        self.iniciar_tarea("Generando cuestionario", trabajo, al_terminar,
+                           mensaje_error="No se pudo generar el cuestionario")
+    
+    def generar_variantes_personalizado(self, preguntas, titulo, num_opciones, num_variantes, carpeta):
+        """Genera varias versiones barajadas del cuestionario en segundo plano"""
+        def trabajo(tarea):
+            return GeneradorPDF.generar_examen_variantes(titulo, preguntas, len(preguntas), num_opciones,
+                                                         num_variantes, carpeta)
+        
+        def al_terminar(resultado):
+            archivos, ruta_layout, ruta_variantes, ruta_clave, clave = resultado
             
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el cuestionario:\n{str(e)}")
+            messagebox.showinfo("Éxito", 
+                            f"✅ {len(archivos)} versiones generadas (A-{letra_variante(len(archivos) - 1)}):\n\n"
+                            f"• Cuestionario, hoja y clave de corrección por versión\n"
+                            f"• Layout de la hoja: {os.path.basename(ruta_layout)}\n"
+                            f"• Versiones para calificar: {os.path.basename(ruta_variantes)}\n"
+                            f"• Clave en el orden original: {os.path.basename(ruta_clave)}")
+            
+            self.abrir_carpeta(carpeta)
+        
+        self.iniciar_tarea("Generando versiones", trabajo, al_terminar,
+                           mensaje_error="No se pudieron generar las versiones")
     
     # ==============================
     # Métodos de la pestaña Cargar JSON (se mantienen igual)
@@ -924,10 +1428,24 @@ class AplicacionCalificador:
                 messagebox.showerror("Error", f"No se pudo cargar el archivo JSON:\n{str(e)}")
     
     def actualizar_lista_guardados(self):
-        """Actualiza la lista de cuestionarios guardados"""
+        """Actualiza la lista de cuestionarios guardados (solo se leen los JSON nuevos o modificados)"""
+        GestorCuestionarios.indice_carpeta().actualizar()
+        self.mostrar_lista_guardados()
+    
+    def ordenar_lista_guardados(self, campo):
+        """Ordena la lista por un campo; volver a elegirlo invierte el orden"""
+        campo_actual, descendente = self.orden_guardados
+        self.orden_guardados = (campo, not descendente if campo == campo_actual else False)
+        self.mostrar_lista_guardados()
+    
+    def mostrar_lista_guardados(self):
+        """Vuelve a llenar la lista desde el índice en memoria, con el orden y la búsqueda actuales"""
         self.tree_guardados.delete(*self.tree_guardados.get_children())
         
-        cuestionarios = GestorCuestionarios.listar_cuestionarios_guardados()
+        campo, descendente = self.orden_guardados
+        cuestionarios = GestorCuestionarios.indice_carpeta().listar(
+            campo, descendente, self.var_buscar_guardados.get()
+        )
         
         for cuestionario in cuestionarios:
             self.tree_guardados.insert("", "end", values=(
@@ -975,10 +1493,15 @@ class AplicacionCalificador:
         if not carpeta:
             return
         
-        try:
-            cuestionario_pdf, hoja_estudiante_pdf, hoja_profesor_pdf, clave = GeneradorPDF.generar_desde_json(
-                self.archivo_json_cargado, carpeta
-            )
+        self.generar_pdf_en_segundo_plano(self.archivo_json_cargado, carpeta)
+    
+    def generar_pdf_en_segundo_plano(self, archivo_json, carpeta):
+        """Genera los PDFs de un cuestionario JSON en segundo plano"""
+        def trabajo(tarea):
+            return GeneradorPDF.generar_desde_json(archivo_json, carpeta)
+        
+        def al_terminar(resultado):
+            cuestionario_pdf, hoja_estudiante_pdf, hoja_profesor_pdf, clave = resultado
             
             messagebox.showinfo("Éxito", 
                             f"✅ Cuestionario generado desde JSON:\n\n"
@@ -988,15 +1511,10 @@ class AplicacionCalificador:
                             f"• Archivos adicionales generados en la carpeta")
             
             # Preguntar si abrir la carpeta
-            abrir = messagebox.askyesno("Abrir carpeta", "¿Deseas abrir la carpeta con los archivos generados?")
-            if abrir:
-                if os.name == 'nt':  # Windows
-                    os.startfile(carpeta)
-                elif os.name == 'posix':  # macOS, Linux
-                    os.system(f'open "{carpeta}"' if os.uname().sysname == 'Darwin' else f'xdg-open "{carpeta}"')
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el cuestionario:\n{str(e)}")
+            self.abrir_carpeta(carpeta)
+        
+        self.iniciar_tarea("Generando cuestionario", trabajo, al_terminar,
+                           mensaje_error="No se pudo generar el cuestionario")
     
     def generar_desde_lista(self):
         """Genera PDFs directamente desde un cuestionario de la lista"""
@@ -1012,28 +1530,7 @@ class AplicacionCalificador:
         if not carpeta:
             return
         
-        try:
-            cuestionario_pdf, hoja_estudiante_pdf, hoja_profesor_pdf, clave = GeneradorPDF.generar_desde_json(
-                archivo, carpeta
-            )
-            
-            messagebox.showinfo("Éxito", 
-                            f"✅ Cuestionario generado desde JSON:\n\n"
-                            f"• Cuestionario: {os.path.basename(cuestionario_pdf)}\n"
-                            f"• Hoja de respuestas: {os.path.basename(hoja_estudiante_pdf)}\n"
-                            f"• Clave de corrección: {os.path.basename(hoja_profesor_pdf)}\n"
-                            f"• Archivos adicionales generados en la carpeta")
-            
-            # Preguntar si abrir la carpeta
-            abrir = messagebox.askyesno("Abrir carpeta", "¿Deseas abrir la carpeta con los archivos generados?")
-            if abrir:
-                if os.name == 'nt':  # Windows
-                    os.startfile(carpeta)
-                elif os.name == 'posix':  # macOS, Linux
-                    os.system(f'open "{carpeta}"' if os.uname().sysname == 'Darwin' else f'xdg-open "{carpeta}"')
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el cuestionario:\n{str(e)}")
+        self.generar_pdf_en_segundo_plano(archivo, carpeta)
 
 # Inicio de la aplicación
 if __name__ == "__main__":
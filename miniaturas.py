@@ -0,0 +1,143 @@
+# [file name]: miniaturas.py
+# ================================================
+# 🖼️ MINIATURAS PARA LA INTERFAZ
+# Vistas previas del tamaño del visor, decodificadas ya
+# reducidas (IMREAD_REDUCED_*) y guardadas en una caché
+# LRU para que cambiar entre hojas no vuelva a decodificar.
+# ================================================
+
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from imutils.perspective import four_point_transform
+
+from calificador_automatico import FLAGS_LECTURA, elegir_factor_reduccion, renderizar_anotaciones
+
+
+def ajustar_tamaño(ancho, alto, ancho_max, alto_max):
+    """Tamaño que cabe en (ancho_max, alto_max) conservando la proporción, sin ampliar"""
+    escala = min(ancho_max / ancho, alto_max / alto, 1.0)
+    return max(1, int(ancho * escala)), max(1, int(alto * escala))
+
+
+def miniatura_desde_arreglo(imagen, ancho_max, alto_max):
+    """
+    Convierte una imagen BGR (o en grises) de OpenCV a una miniatura RGB de PIL
+    que cabe en (ancho_max, alto_max). Se puede llamar desde cualquier hilo
+    """
+    alto, ancho = imagen.shape[:2]
+    nuevo_ancho, nuevo_alto = ajustar_tamaño(ancho, alto, ancho_max, alto_max)
+    if (nuevo_ancho, nuevo_alto) != (ancho, alto):
+        imagen = cv2.resize(imagen, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_AREA)
+
+    if imagen.ndim == 2:
+        return Image.fromarray(imagen)
+    return Image.fromarray(cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB))
+
+
+def leer_reducida(ruta_imagen, ancho_max, alto_max):
+    """
+    Decodifica una imagen en color directamente reducida, con el mayor factor
+    cuya versión reducida todavía cubre (ancho_max, alto_max)
+
+    Returns:
+        tuple: (imagen BGR, factor de reducción); la imagen es None si no se pudo leer
+    """
+    try:
+        with Image.open(ruta_imagen) as cabecera:
+            ancho, alto = cabecera.size
+    except Exception:
+        return None, 1
+
+    # Basta con que el lado mayor de la versión reducida cubra el de la miniatura
+    factor = elegir_factor_reduccion(ruta_imagen, max(ajustar_tamaño(ancho, alto, ancho_max, alto_max)))
+    return cv2.imread(ruta_imagen, FLAGS_LECTURA[factor][1]), factor
+
+
+def crear_miniatura(ruta_imagen, ancho_max, alto_max):
+    """
+    Miniatura de una imagen que cabe en (ancho_max, alto_max), decodificada ya reducida
+
+    Returns:
+        PIL.Image: Miniatura RGB, o None si no se pudo leer la imagen
+    """
+    imagen, _ = leer_reducida(ruta_imagen, ancho_max, alto_max)
+    if imagen is None:
+        return None
+    return miniatura_desde_arreglo(imagen, ancho_max, alto_max)
+
+
+def crear_miniatura_resultado(ruta_imagen, resultados_detallados, esquinas, ancho_max, alto_max):
+    """
+    Miniatura de la hoja calificada sin pasar por la imagen anotada a resolución
+    completa: se decodifica reducida, se endereza con las esquinas (en píxeles de
+    la imagen original) y se anota con la geometría de los resultados
+
+    Returns:
+        PIL.Image: Miniatura RGB, o None si no se pudo leer la imagen
+    """
+    imagen, factor = leer_reducida(ruta_imagen, ancho_max, alto_max)
+    if imagen is None:
+        return None
+
+    hoja = four_point_transform(imagen, np.asarray(esquinas, dtype=np.float32) / factor)
+    return miniatura_desde_arreglo(renderizar_anotaciones(hoja, resultados_detallados), ancho_max, alto_max)
+
+
+class CacheMiniaturas:
+    """
+    Caché LRU de miniaturas listas para Tk (ImageTk.PhotoImage), con llave
+    (ruta, fecha de modificación, tamaño pedido). Solo se usa desde el hilo de Tk
+    """
+
+    def __init__(self, max_entradas=32):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def calcular_llave(ruta_imagen, ancho_max, alto_max):
+        ruta_absoluta = os.path.abspath(ruta_imagen)
+        return (ruta_absoluta, os.stat(ruta_absoluta).st_mtime_ns, ancho_max, alto_max)
+
+    def obtener(self, ruta_imagen, ancho_max, alto_max):
+        """
+        Devuelve la miniatura de una imagen, decodificándola solo si no está en la
+        caché o si el archivo cambió
+
+        Returns:
+            ImageTk.PhotoImage: Miniatura, o None si no se pudo leer la imagen
+        """
+        try:
+            llave = self.calcular_llave(ruta_imagen, ancho_max, alto_max)
+        except OSError:
+            return None
+
+        foto = self.entradas.get(llave)
+        if foto is not None:
+            self.entradas.move_to_end(llave)
+            self.aciertos += 1
+            return foto
+
+        self.fallos += 1
+        miniatura = crear_miniatura(ruta_imagen, ancho_max, alto_max)
+        if miniatura is None:
+            return None
+
+        foto = ImageTk.PhotoImage(miniatura)
+        self.guardar(llave, foto)
+        return foto
+
+    def guardar(self, llave, foto):
+        """Guarda una miniatura y desaloja la usada hace más tiempo si se supera el máximo"""
+        self.entradas[llave] = foto
+        self.entradas.move_to_end(llave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+
+    def limpiar(self):
+        self.entradas.clear()
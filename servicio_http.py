@@ -0,0 +1,431 @@
+# [file name]: servicio_http.py
+# ================================================
+# 🌐 SERVICIO HTTP DE CALIFICACIÓN
+# Califica hojas bajo demanda para otras herramientas
+# locales: recibe los bytes de la imagen y el id de la
+# clave, y reparte el trabajo entre procesos ya
+# arrancados que mantienen las claves cargadas. Si la
+# cola está llena responde 429 en lugar de acumular.
+# Solo usa la biblioteca estándar (asyncio).
+# ================================================
+
+import os
+import json
+import time
+import base64
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import cv2
+import numpy as np
+
+from calificador_automatico import CalificadorAutomatico
+from clave_respuestas import cargar_clave
+from lista_alumnos import leer_lista_alumnos, indice_alumnos
+
+ESTADOS_HTTP = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error"
+}
+
+
+class ErrorHTTP(Exception):
+    """Error que se responde al cliente con un código de estado"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+def cargar_claves_carpeta(carpeta):
+    """
+    Compila todas las claves (JSON o TXT) de una carpeta
+
+    Returns:
+        dict: {id_clave: ClaveRespuestas}, donde el id es el nombre del archivo sin extensión
+    """
+    claves = {}
+    for nombre in sorted(os.listdir(carpeta)):
+        id_clave, extension = os.path.splitext(nombre)
+        if extension.lower() not in (".json", ".txt"):
+            continue
+        try:
+            claves[id_clave] = cargar_clave(os.path.join(carpeta, nombre))
+        except Exception as e:
+            print(f"⚠️ Clave ignorada ({nombre}): {str(e)}")
+    return claves
+
+
+# ------------------------------------------------
+# 👷 Procesos trabajadores
+# ------------------------------------------------
+def _inicializar_trabajador(configuracion, claves, hilos_opencv):
+    """Prepara un proceso: limita los hilos de OpenCV y deja las claves cargadas"""
+    global _calificador_trabajador, _claves_trabajador
+    cv2.setNumThreads(hilos_opencv)
+    _calificador_trabajador = CalificadorAutomatico.desde_configuracion(configuracion)
+    _claves_trabajador = claves
+
+
+def _calentar_trabajador(espera):
+    """
+    Tarea casi vacía para que el pool arranque sus procesos antes de la primera
+    hoja; la espera evita que un solo proceso ya listo las atienda todas
+    """
+    time.sleep(espera)
+    return os.getpid()
+
+
+def _calificar_bytes(id_clave, datos, pagina):
+    """Decodifica y califica una imagen recibida como bytes (solo resultados)"""
+    inicio = time.perf_counter()
+    calificador = _calificador_trabajador
+    calificador.usar_clave(_claves_trabajador[id_clave])
+
+    flags = cv2.IMREAD_COLOR if calificador.generar_imagen_resultado else cv2.IMREAD_GRAYSCALE
+    imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), flags)
+    if imagen is None:
+        return {'puntaje': 0, 'resultados': [], 'esquinas': None, 'matricula': None, 'alumno': None,
+                'variante': None, 'pagina': None, 'error': "No se pudo decodificar la imagen"}
+
+    puntaje, _, resultados, error = calificador.procesar_hoja_respuestas(imagen, pagina)
+
+    return {
+        'puntaje': puntaje,
+        'resultados': resultados,
+        'esquinas': calificador.esquinas_hoja if not error else None,
+        'matricula': calificador.matricula,
+        'alumno': calificador.buscar_alumno(calificador.matricula),
+        'variante': calificador.variante,
+        'pagina': calificador.pagina,
+        'error': error,
+        'tiempo_ms': (time.perf_counter() - inicio) * 1000
+    }
+
+
+# ------------------------------------------------
+# 🌐 Servicio
+# ------------------------------------------------
+class ServicioCalificacion:
+    """Servidor HTTP asíncrono que reparte las hojas entre procesos ya arrancados"""
+
+    def __init__(self, claves, layout=None, num_procesos=None, max_pendientes=32,
+                 hilos_opencv=1, max_bytes=32 * 1024 * 1024, alumnos=None):
+        """
+        Args:
+            claves (dict): {id_clave: ClaveRespuestas}; se copian una sola vez a cada proceso
+            layout (dict): Manifiesto de layout común a todas las claves (opcional)
+            num_procesos (int): Procesos trabajadores (por defecto, número de núcleos)
+            max_pendientes (int): Hojas en cola o en proceso a partir de las cuales se responde 429
+            hilos_opencv (int): Hilos internos de OpenCV por proceso
+            max_bytes (int): Tamaño máximo del cuerpo de una petición
+            alumnos (dict): Lista de alumnos indexada (lista_alumnos.indice_alumnos) para
+                            devolver el alumno de la matrícula leída (opcional)
+        """
+        self.claves = claves
+        self.num_procesos = num_procesos or os.cpu_count() or 1
+        self.max_pendientes = max_pendientes
+        self.hilos_opencv = hilos_opencv
+        self.max_bytes = max_bytes
+        self.pendientes = 0
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.reinicios = 0
+
+        calificador = CalificadorAutomatico()
+        calificador.layout = layout
+        if layout is not None:
+            calificador.num_opciones = layout['num_opciones']
+        calificador.alumnos = alumnos or {}
+        # El servicio solo devuelve resultados: nunca se decodifica ni anota el color
+        calificador.generar_imagen_resultado = False
+        self.configuracion = calificador.obtener_configuracion()
+        self.ejecutor = None
+        self.arranque = None  # Futuro del arranque del pool en curso (ver _arrancar_trabajadores)
+        self.servidor = None
+
+    def iniciar_trabajadores(self):
+        """Arranca el pool y espera a que todos los procesos hayan cargado las claves"""
+        self.ejecutor = ProcessPoolExecutor(max_workers=self.num_procesos,
+                                            initializer=_inicializar_trabajador,
+                                            initargs=(self.configuracion, self.claves, self.hilos_opencv))
+        futuros = [self.ejecutor.submit(_calentar_trabajador, 0.2) for _ in range(self.num_procesos)]
+        pids = {futuro.result() for futuro in futuros}
+        print(f"🔥 {len(pids)} procesos listos con {len(self.claves)} claves cargadas")
+
+    def detener(self):
+        """Detiene el servidor y el pool de procesos"""
+        if self.servidor is not None:
+            self.servidor.close()
+        if self.ejecutor is not None:
+            self.ejecutor.shutdown(wait=True)
+            self.ejecutor = None
+
+    async def iniciar(self, host="127.0.0.1", puerto=8765):
+        """Arranca los trabajadores y empieza a aceptar conexiones"""
+        if self.ejecutor is None:
+            await self._arrancar_trabajadores()
+        self.servidor = await asyncio.start_server(self.atender_conexion, host, puerto)
+        return self.servidor
+
+    async def _arrancar_trabajadores(self):
+        """Arranca y calienta el pool en un hilo, sin bloquear el bucle de eventos"""
+        loop = asyncio.get_event_loop()
+        self.arranque = loop.run_in_executor(None, self.iniciar_trabajadores)
+        try:
+            await self.arranque
+        finally:
+            self.arranque = None
+
+    async def _ejecutor_listo(self):
+        """Pool en el que enviar una hoja; espera si se está arrancando"""
+        if self.arranque is not None:
+            await self.arranque
+        return self.ejecutor
+
+    async def _reiniciar_trabajadores(self, roto):
+        """
+        Reemplaza un pool que quedó inutilizable (BrokenProcessPool) porque un proceso
+        terminó de forma inesperada. Solo la primera petición que lo detecta lo reinicia;
+        las demás esperan al nuevo
+        """
+        if self.ejecutor is not roto:
+            await self._ejecutor_listo()
+            return
+
+        print("⚠️ Un proceso trabajador terminó inesperadamente: reiniciando el pool")
+        self.reinicios += 1
+        self.ejecutor = None
+        roto.shutdown(wait=False)
+        await self._arrancar_trabajadores()
+
+    # ------------------------------------------------
+    # Calificación
+    # ------------------------------------------------
+    def _reservar(self, cantidad):
+        """Reserva lugar en la cola para `cantidad` hojas o rechaza con 429"""
+        if cantidad > self.max_pendientes:
+            raise ErrorHTTP(413, f"El lote supera el máximo de {self.max_pendientes} hojas")
+        if self.pendientes + cantidad > self.max_pendientes:
+            self.rechazadas += 1
+            raise ErrorHTTP(429, f"Servicio saturado: {self.pendientes} hojas pendientes")
+        self.pendientes += cantidad
+
+    def _validar_clave(self, id_clave):
+        if not id_clave:
+            raise ErrorHTTP(400, "Falta el parámetro 'clave'")
+        if id_clave not in self.claves:
+            raise ErrorHTTP(404, f"Clave desconocida: {id_clave}")
+
+    async def _calificar(self, id_clave, datos, pagina):
+        """Envía una hoja ya reservada al pool y libera su lugar al terminar"""
+        loop = asyncio.get_event_loop()
+        try:
+            ejecutor = await self._ejecutor_listo()
+            try:
+                return await loop.run_in_executor(ejecutor, _calificar_bytes, id_clave, datos, pagina)
+            except BrokenProcessPool:
+                await self._reiniciar_trabajadores(ejecutor)
+                raise ErrorHTTP(500, "El proceso que calificaba la hoja terminó inesperadamente; "
+                                     "el servicio se reinició")
+        finally:
+            self.pendientes -= 1
+            self.atendidas += 1
+
+    async def calificar(self, id_clave, datos, pagina=None):
+        """Califica una hoja (bytes de la imagen) con la clave indicada"""
+        self._validar_clave(id_clave)
+        self._reservar(1)
+        return await self._calificar(id_clave, datos, pagina)
+
+    async def calificar_lote(self, id_clave, imagenes, pagina=None):
+        """Califica varias hojas en paralelo; el lote completo se acepta o se rechaza"""
+        self._validar_clave(id_clave)
+        self._reservar(len(imagenes))
+        return await asyncio.gather(*[self._calificar(id_clave, datos, pagina) for datos in imagenes])
+
+    def estado(self):
+        return {
+            'estado': 'ok',
+            'procesos': self.num_procesos,
+            'pendientes': self.pendientes,
+            'max_pendientes': self.max_pendientes,
+            'atendidas': self.atendidas,
+            'rechazadas': self.rechazadas,
+            'reinicios': self.reinicios,
+            'claves': sorted(self.claves)
+        }
+
+    # ------------------------------------------------
+    # HTTP
+    # ------------------------------------------------
+    async def atender_conexion(self, lector, escritor):
+        """Atiende las peticiones de una conexión (con keep-alive) hasta que se cierre"""
+        try:
+            while True:
+                try:
+                    peticion = await self._leer_peticion(lector)
+                except ErrorHTTP as e:
+                    await self._responder(escritor, e.estado, {'error': e.mensaje}, mantener=False)
+                    break
+                if peticion is None:
+                    break
+
+                metodo, ruta, parametros, cabeceras, cuerpo, mantener = peticion
+                try:
+                    estado, respuesta = await self.despachar(metodo, ruta, parametros, cuerpo)
+                except ErrorHTTP as e:
+                    estado, respuesta = e.estado, {'error': e.mensaje}
+                except Exception as e:
+                    estado, respuesta = 500, {'error': f"Error interno: {str(e)}"}
+
+                await self._responder(escritor, estado, respuesta, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _leer_peticion(self, lector):
+        """Lee una petición HTTP/1.1; devuelve None si el cliente cerró la conexión"""
+        linea = await lector.readline()
+        if not linea:
+            return None
+
+        partes = linea.decode('latin-1').split()
+        if len(partes) != 3:
+            raise ErrorHTTP(400, "Línea de petición inválida")
+        metodo, objetivo, version = partes
+
+        cabeceras = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b"\r\n", b"\n", b""):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        longitud = int(cabeceras.get('content-length', 0) or 0)
+        if longitud > self.max_bytes:
+            raise ErrorHTTP(413, f"El cuerpo supera {self.max_bytes} bytes")
+        cuerpo = await lector.readexactly(longitud) if longitud else b""
+
+        conexion = cabeceras.get('connection', '').lower()
+        mantener = conexion != 'close' and (version == "HTTP/1.1" or conexion == 'keep-alive')
+
+        url = urlsplit(objetivo)
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return metodo.upper(), url.path, parametros, cabeceras, cuerpo, mantener
+
+    async def _responder(self, escritor, estado, datos, mantener):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=_convertir_json).encode('utf-8')
+        cabeceras = [
+            f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(cuerpo)}",
+            f"Connection: {'keep-alive' if mantener else 'close'}"
+        ]
+        if estado == 429:
+            cabeceras.append("Retry-After: 1")
+        escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode('latin-1') + cuerpo)
+        await escritor.drain()
+
+    async def despachar(self, metodo, ruta, parametros, cuerpo):
+        """
+        Rutas:
+            GET  /salud                          Estado del servicio y claves disponibles
+            POST /calificar?clave=ID&pagina=N    Cuerpo: bytes de la imagen
+            POST /lote?clave=ID&pagina=N         Cuerpo: {"imagenes": [base64, ...]} (la clave
+                                                 también puede ir en el JSON)
+        """
+        if ruta == "/salud":
+            if metodo != "GET":
+                raise ErrorHTTP(405, "Use GET")
+            return 200, self.estado()
+
+        if ruta not in ("/calificar", "/lote"):
+            raise ErrorHTTP(404, f"Ruta desconocida: {ruta}")
+        if metodo != "POST":
+            raise ErrorHTTP(405, "Use POST")
+
+        # Sin página se lee la fila "PÁGINA"; sin esa fila se rechaza en lugar de suponer la primera
+        try:
+            pagina = int(parametros['pagina']) if 'pagina' in parametros else None
+        except ValueError:
+            raise ErrorHTTP(400, "El parámetro 'pagina' debe ser un entero")
+
+        if ruta == "/calificar":
+            if not cuerpo:
+                raise ErrorHTTP(400, "El cuerpo debe contener la imagen")
+            return 200, await self.calificar(parametros.get('clave'), cuerpo, pagina)
+
+        try:
+            datos = json.loads(cuerpo.decode('utf-8'))
+            imagenes = [base64.b64decode(imagen) for imagen in datos['imagenes']]
+        except (ValueError, KeyError, TypeError):
+            raise ErrorHTTP(400, "El cuerpo debe ser {\"imagenes\": [base64, ...]}")
+
+        id_clave = parametros.get('clave') or datos.get('clave')
+        return 200, {'resultados': await self.calificar_lote(id_clave, imagenes, pagina)}
+
+
+def _convertir_json(valor):
+    """Convierte escalares y arreglos de NumPy a tipos nativos al serializar"""
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+async def _ejecutar(servicio, host, puerto):
+    servidor = await servicio.iniciar(host, puerto)
+    print(f"🌐 Servicio de calificación en http://{host}:{puerto} (Ctrl+C para detener)")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+# ------------------------------------------------
+# 🚀 Ejecutar como servicio
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de calificación de hojas")
+    parser.add_argument("--claves", required=True,
+                        help="Carpeta con las claves (JSON o TXT); el id de cada clave es su nombre de archivo")
+    parser.add_argument("--layout", help="Manifiesto de layout de la hoja (opcional)")
+    parser.add_argument("--alumnos", help="Lista de alumnos CSV para identificar cada hoja por su matrícula")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en la que escuchar")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto en el que escuchar")
+    parser.add_argument("--procesos", type=int, help="Procesos trabajadores (por defecto, núcleos)")
+    parser.add_argument("--max-pendientes", type=int, default=32,
+                        help="Hojas pendientes a partir de las cuales se responde 429")
+    args = parser.parse_args()
+
+    claves = cargar_claves_carpeta(args.claves)
+    if not claves:
+        print(f"❌ No se encontraron claves en: {args.claves}")
+        raise SystemExit(1)
+
+    layout = None
+    if args.layout:
+        with open(args.layout, 'r', encoding='utf-8') as f:
+            layout = json.load(f)
+
+    alumnos = indice_alumnos(leer_lista_alumnos(args.alumnos)) if args.alumnos else None
+
+    servicio = ServicioCalificacion(claves, layout=layout, num_procesos=args.procesos,
+                                    max_pendientes=args.max_pendientes, alumnos=alumnos)
+    try:
+        asyncio.run(_ejecutar(servicio, args.host, args.puerto))
+    except KeyboardInterrupt:
+        print("\n🛑 Servicio detenido")
+    finally:
+        servicio.detener()
@@ -0,0 +1,158 @@
+# [file name]: variantes.py
+# ================================================
+# 🔀 VERSIONES BARAJADAS DE UN EXAMEN
+# Cada versión muestra las mismas preguntas con otro
+# orden de preguntas y de opciones. Las permutaciones se
+# guardan en un .npz compacto para que el calificador
+# devuelva cualquier hoja al orden original (canónico)
+# y los resultados de todas las versiones se comparen.
+# ================================================
+
+import hashlib
+
+import numpy as np
+
+MAX_VARIANTES = 8
+
+
+def letra_variante(id_variante):
+    """Letra con la que se imprime una versión (0 -> 'A')"""
+    return chr(65 + id_variante)
+
+
+class AlmacenVariantes:
+    """
+    Permutaciones de todas las versiones de un examen
+
+    Atributos:
+        clave (ndarray): Opción correcta de cada pregunta en el orden canónico (int8, -1 sin respuesta)
+        orden_preguntas (ndarray): (V, Q) pregunta canónica impresa en cada posición de cada versión
+        orden_opciones (ndarray): (V, Q, O) opción canónica impresa en cada posición; la fila
+                                  i corresponde a la pregunta impresa en la posición i
+        posicion_opciones (ndarray): (V, Q, O) inversa de orden_opciones: posición impresa
+                                     de cada opción canónica
+        claves (ndarray): (V, Q) clave de cada versión en su orden impreso
+    """
+
+    def __init__(self, clave, orden_preguntas, orden_opciones):
+        self.clave = np.asarray(clave, dtype=np.int8).reshape(-1)
+        self.orden_preguntas = np.asarray(orden_preguntas, dtype=np.int16)
+        self.orden_opciones = np.asarray(orden_opciones, dtype=np.int8)
+        self.posicion_opciones = np.argsort(self.orden_opciones, axis=-1).astype(np.int8)
+
+        # La clave impresa de cada versión se calcula una vez para todas las hojas
+        correctas = self.clave[self.orden_preguntas]
+        posiciones = np.take_along_axis(self.posicion_opciones, np.maximum(correctas, 0)[..., None], axis=2)[..., 0]
+        self.claves = np.where(correctas >= 0, posiciones, -1).astype(np.int8)
+
+    def __repr__(self):
+        return f"AlmacenVariantes({self.num_variantes} versiones, {self.num_preguntas} preguntas)"
+
+    @property
+    def num_variantes(self):
+        return self.orden_preguntas.shape[0]
+
+    @property
+    def num_preguntas(self):
+        return self.orden_preguntas.shape[1]
+
+    @property
+    def num_opciones(self):
+        return self.orden_opciones.shape[2]
+
+    @classmethod
+    def crear(cls, clave, num_opciones, num_variantes, semilla=None, opciones_por_pregunta=None):
+        """
+        Baraja preguntas y opciones para cada versión
+
+        Args:
+            clave (array): Opción correcta de cada pregunta (orden canónico)
+            num_opciones (int): Opciones de la hoja de respuestas
+            num_variantes (int): Número de versiones (máximo MAX_VARIANTES)
+            semilla (int): Semilla para repetir las mismas versiones
+            opciones_por_pregunta (array): Opciones reales de cada pregunta; las posiciones
+                                           sobrantes no se barajan (por defecto, todas)
+        """
+        if not 1 <= num_variantes <= MAX_VARIANTES:
+            raise ValueError(f"El número de versiones debe estar entre 1 y {MAX_VARIANTES}")
+
+        clave = np.asarray(clave, dtype=np.int8).reshape(-1)
+        num_preguntas = len(clave)
+        rng = np.random.default_rng(semilla)
+
+        orden_preguntas = np.argsort(rng.random((num_variantes, num_preguntas)), axis=1)
+
+        # Ordenar claves aleatorias baraja cada fila; a las opciones que la pregunta
+        # no tiene se les da una llave mayor a 1 para que queden al final, en orden
+        llaves = rng.random((num_variantes, num_preguntas, num_opciones))
+        if opciones_por_pregunta is not None:
+            reales = np.asarray(opciones_por_pregunta).reshape(1, -1, 1)
+            posiciones = np.arange(num_opciones).reshape(1, 1, -1)
+            llaves = np.where(posiciones < reales, llaves, 1.0 + posiciones)
+        llaves = np.take_along_axis(llaves, orden_preguntas[:, :, None], axis=1)
+        orden_opciones = np.argsort(llaves, axis=2)
+
+        return cls(clave, orden_preguntas, orden_opciones)
+
+    # ------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------
+    def guardar(self, ruta):
+        """Guarda las permutaciones en un .npz comprimido (unos pocos KB por examen)"""
+        with open(ruta, 'wb') as f:
+            np.savez_compressed(f, version=np.int8(1), clave=self.clave,
+                                orden_preguntas=self.orden_preguntas, orden_opciones=self.orden_opciones)
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            return cls(datos['clave'], datos['orden_preguntas'], datos['orden_opciones'])
+
+    def hash(self):
+        """Hash del contenido (para las llaves de caché)"""
+        h = hashlib.sha256()
+        for arreglo in (self.clave, self.orden_preguntas, self.orden_opciones):
+            h.update(np.ascontiguousarray(arreglo).tobytes())
+        return h.hexdigest()
+
+    # ------------------------------------------------
+    # Consultas
+    # ------------------------------------------------
+    def clave_variante(self, id_variante):
+        """Clave {posición impresa: opción impresa} de una versión (hoja del profesor)"""
+        return {i: int(r) for i, r in enumerate(self.claves[id_variante]) if r >= 0}
+
+    def preguntas_variante(self, id_variante, preguntas):
+        """
+        Preguntas en el orden impreso de una versión, con las opciones barajadas
+        (y 'respuesta_correcta' ajustada si la pregunta la trae)
+        """
+        barajadas = []
+        for i, q in enumerate(self.orden_preguntas[id_variante]):
+            pregunta = dict(preguntas[q])
+            opciones = pregunta['opciones']
+            orden = [int(k) for k in self.orden_opciones[id_variante, i] if k < len(opciones)]
+            pregunta['opciones'] = [opciones[k] for k in orden]
+            if 'respuesta_correcta' in pregunta:
+                pregunta['respuesta_correcta'] = orden.index(pregunta['respuesta_correcta'])
+            barajadas.append(pregunta)
+        return barajadas
+
+    def a_canonico(self, id_variante, posiciones, seleccionadas):
+        """
+        Lleva respuestas leídas en el orden impreso de una versión al orden canónico
+
+        Args:
+            id_variante (int): Versión de la hoja
+            posiciones (array): Posición impresa (0..Q-1) de cada pregunta leída
+            seleccionadas (array): Opción impresa elegida en cada una (-1 si ninguna)
+
+        Returns:
+            tuple: (preguntas canónicas, opciones canónicas elegidas con -1 si ninguna)
+        """
+        posiciones = np.asarray(posiciones, dtype=np.intp)
+        seleccionadas = np.asarray(seleccionadas)
+        preguntas = self.orden_preguntas[id_variante, posiciones]
+        opciones = self.orden_opciones[id_variante, posiciones, np.maximum(seleccionadas, 0)]
+        return preguntas, np.where(seleccionadas >= 0, opciones, -1)
@@ -0,0 +1,304 @@
+# [file name]: vigilante_carpeta.py
+# ================================================
+# 📂 VIGILANTE DE CARPETA
+# Califica automáticamente las hojas que los escáneres
+# van dejando en una carpeta, sin volver a calificar
+# las que ya se procesaron (incluso tras reiniciar).
+# ================================================
+
+import os
+import json
+import time
+import argparse
+
+from calificador_automatico import CalificadorAutomatico, calcular_hash_archivo
+from almacen_resultados import AlmacenResultados
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+# Pueden traer varias hojas (alimentador del escáner): se califican página por página
+EXTENSIONES_MULTIPAGINA = (".tif", ".tiff")
+
+
+class VigilanteCarpeta:
+    """Revisa periódicamente una carpeta y califica solo los archivos nuevos o modificados"""
+
+    def __init__(self, calificador, carpeta_entrada, carpeta_salida, intervalo=2.0, espera_estable=3.0,
+                 almacen=None, examen=None):
+        """
+        Args:
+            calificador (CalificadorAutomatico): Calificador con la clave ya cargada
+            carpeta_entrada (str): Carpeta donde llegan las imágenes escaneadas
+            carpeta_salida (str): Carpeta para imágenes calificadas, reportes y estado
+            intervalo (float): Segundos entre revisiones de la carpeta
+            espera_estable (float): Segundos que un archivo debe permanecer sin cambios
+                                    (tamaño y fecha) antes de calificarlo
+            almacen (AlmacenResultados): Si se indica, las hojas se registran también en la
+                                         base de resultados (un lote por ejecución)
+            examen (str): Nombre del examen en la base de resultados
+        """
+        self.calificador = calificador
+        self.carpeta_entrada = carpeta_entrada
+        self.carpeta_salida = carpeta_salida
+        self.intervalo = intervalo
+        self.espera_estable = espera_estable
+        self.almacen = almacen
+        self.examen = examen
+        self.registro = None  # RegistroLote de esta ejecución (se crea con la primera hoja)
+
+        if not os.path.exists(carpeta_salida):
+            os.makedirs(carpeta_salida)
+
+        self.ruta_estado = os.path.join(carpeta_salida, ".estado_vigilante.json")
+        self.archivo_resultados = os.path.join(carpeta_salida, "resultados.txt")
+
+        # nombre -> {'tamaño', 'mtime', 'hash', 'puntaje', 'matricula', 'error'}; un TIFF de
+        # varias páginas guarda además 'paginas', con esos datos por página
+        self.estado = self.cargar_estado()
+        self.estado_modificado = False  # Hay cambios en self.estado sin guardar
+        # nombre -> ((tamaño, mtime), instante en que se vio esa firma por primera vez)
+        self.pendientes = {}
+
+    def cargar_estado(self):
+        """Carga el estado guardado de una ejecución anterior"""
+        if not os.path.exists(self.ruta_estado):
+            return {}
+
+        try:
+            with open(self.ruta_estado, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer el estado anterior ({str(e)}), se empezará de cero")
+            return {}
+
+    def guardar_estado(self):
+        """Guarda el estado de forma atómica para sobrevivir a reinicios"""
+        ruta_temporal = self.ruta_estado + ".tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f, ensure_ascii=False, indent=2)
+        os.replace(ruta_temporal, self.ruta_estado)
+
+    def revisar(self):
+        """
+        Revisa la carpeta una vez y califica los archivos que ya están estables
+
+        Returns:
+            list: Nombres de los archivos calificados en esta revisión
+        """
+        calificados = []
+        vistos = set()
+        ahora = time.monotonic()
+
+        for entrada in os.scandir(self.carpeta_entrada):
+            if not entrada.is_file() or not entrada.name.lower().endswith(EXTENSIONES_IMAGEN):
+                continue
+
+            nombre = entrada.name
+            vistos.add(nombre)
+
+            try:
+                info = entrada.stat()
+            except OSError:
+                continue
+
+            firma = (info.st_size, info.st_mtime_ns)
+            previo = self.estado.get(nombre)
+
+            # Sin cambios desde la última calificación
+            if previo and (previo['tamaño'], previo['mtime']) == firma:
+                self.pendientes.pop(nombre, None)
+                continue
+
+            # Esperar a que el escáner termine de escribir el archivo
+            pendiente = self.pendientes.get(nombre)
+            if info.st_size == 0 or pendiente is None or pendiente[0] != firma:
+                self.pendientes[nombre] = (firma, ahora)
+                continue
+            if ahora - pendiente[1] < self.espera_estable:
+                continue
+
+            del self.pendientes[nombre]
+            ruta = entrada.path
+
+            try:
+                hash_actual = calcular_hash_archivo(ruta)
+            except OSError as e:
+                print(f"⚠️ No se pudo leer {nombre}: {str(e)}")
+                continue
+
+            # Cambió la fecha pero no el contenido: no hace falta volver a calificar
+            if previo and previo['hash'] == hash_actual:
+                previo['tamaño'], previo['mtime'] = firma
+                self.estado_modificado = True
+                continue
+
+            self.calificar_archivo(nombre, ruta, firma, hash_actual)
+            calificados.append(nombre)
+
+        # Las hojas de esta revisión se escriben en la base en una sola transacción
+        self.confirmar()
+
+        # Olvidar pendientes de archivos que desaparecieron
+        for nombre in list(self.pendientes):
+            if nombre not in vistos:
+                del self.pendientes[nombre]
+
+        return calificados
+
+    def calificar_archivo(self, nombre, ruta, firma, hash_archivo):
+        """Califica un archivo, guarda sus resultados y actualiza el estado"""
+        print(f"🧾 Procesando: {nombre}")
+
+        if nombre.lower().endswith(EXTENSIONES_MULTIPAGINA):
+            # Un TIFF del alimentador trae varias hojas: cada página se registra por separado
+            hojas = list(self.calificador.procesar_multipagina(ruta, self.carpeta_salida))
+            if len(hojas) == 1:
+                self.registrar_hoja(nombre, ruta, hojas[0])
+            else:
+                for hoja in hojas:
+                    self.registrar_hoja(f"{nombre} p.{hoja['pagina'] + 1}", f"{ruta}#p{hoja['pagina'] + 1}", hoja)
+
+            paginas = [{'puntaje': hoja['puntaje'], 'matricula': hoja['matricula'], 'error': hoja['error']}
+                       for hoja in hojas]
+            resumen = paginas[0] if len(paginas) == 1 else {
+                'puntaje': None, 'matricula': None, 'error': None, 'paginas': paginas
+            }
+        else:
+            puntaje, imagen_procesada, resultados, error = self.calificador.procesar_hoja_respuestas(ruta)
+
+            if not error and imagen_procesada is not None:
+                try:
+                    self.calificador.guardar_resultados(ruta, imagen_procesada, resultados, puntaje,
+                                                        self.carpeta_salida)
+                except Exception as e:
+                    error = f"Error al guardar resultados: {str(e)}"
+
+            matricula = self.calificador.matricula
+            self.registrar_hoja(nombre, ruta, {'puntaje': puntaje, 'resultados': resultados, 'error': error,
+                                               'matricula': matricula,
+                                               'alumno': self.calificador.buscar_alumno(matricula),
+                                               'variante': self.calificador.variante})
+            resumen = {'puntaje': puntaje, 'matricula': matricula, 'error': error}
+
+        # Se registra también si hubo error, para no reintentar hasta que el archivo cambie
+        self.estado[nombre] = dict(resumen, **{
+            'tamaño': firma[0],
+            'mtime': firma[1],
+            'hash': hash_archivo
+        })
+        self.estado_modificado = True
+        # Con base de resultados el estado se guarda después de escribir la hoja (ver confirmar)
+        if self.almacen is None:
+            self.confirmar()
+
+    def registrar_hoja(self, etiqueta, ruta, hoja):
+        """
+        Escribe una hoja calificada en resultados.txt y, si hay base de resultados,
+        la deja pendiente en el lote de esta ejecución
+
+        Args:
+            etiqueta (str): Nombre con el que aparece en el reporte (archivo y página)
+            ruta (str): Ruta con la que se registra en la base
+            hoja (dict): {'puntaje', 'resultados', 'error', 'matricula', 'alumno', 'variante'}
+        """
+        error = hoja['error']
+        puntaje = hoja['puntaje']
+
+        # Con cuadrícula de matrícula en el layout, la línea identifica al alumno
+        matricula = hoja['matricula']
+        alumno = hoja['alumno']
+        identificacion = ""
+        if matricula is not None:
+            identificacion = f" [{matricula}{' ' + alumno['nombre'] if alumno else ''}]"
+
+        if self.almacen is not None:
+            if self.registro is None:
+                hash_clave = self.calificador.hash_clave()
+                self.registro = self.almacen.iniciar_lote(self.examen or f"clave_{hash_clave[:12]}", hash_clave,
+                                                          origen=self.carpeta_entrada)
+            # Se guarda al terminar la revisión (ver revisar)
+            self.registro.agregar(dict(hoja, ruta=ruta))
+
+        with open(self.archivo_resultados, 'a', encoding='utf-8') as f:
+            if error:
+                f.write(f"{etiqueta}{identificacion}: ERROR - {error}\n")
+            else:
+                f.write(f"{etiqueta}{identificacion}: {puntaje:.2f}%\n")
+
+        if error:
+            print(f"❌ {etiqueta}: {error}")
+        else:
+            print(f"✅ {etiqueta}: {puntaje:.2f}%")
+
+    def confirmar(self):
+        """
+        Escribe en la base las hojas pendientes y después guarda el estado, para
+        que ninguna hoja quede marcada como calificada sin estar registrada
+        """
+        if self.registro is not None:
+            self.registro.guardar()
+        if self.estado_modificado:
+            self.guardar_estado()
+            self.estado_modificado = False
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra la base de resultados"""
+        try:
+            self.confirmar()
+        finally:
+            if self.almacen is not None:
+                self.almacen.cerrar()
+                self.almacen = None
+                self.registro = None
+
+    def ejecutar(self, max_revisiones=None):
+        """Revisa la carpeta indefinidamente (o `max_revisiones` veces) hasta Ctrl+C"""
+        print(f"👀 Vigilando: {self.carpeta_entrada} (cada {self.intervalo:.1f} s)")
+        revisiones = 0
+
+        try:
+            while max_revisiones is None or revisiones < max_revisiones:
+                self.revisar()
+                revisiones += 1
+                time.sleep(self.intervalo)
+        except KeyboardInterrupt:
+            print("\n🛑 Vigilancia detenida")
+        finally:
+            self.cerrar()
+
+
+# ------------------------------------------------
+# 🚀 Ejecutar como servicio
+# ------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Califica automáticamente las hojas que llegan a una carpeta")
+    parser.add_argument("carpeta_entrada", nargs="?", default="examenes_sin_calificar")
+    parser.add_argument("--clave", help="Archivo JSON con la clave de respuestas")
+    parser.add_argument("--salida", default="resultados_examenes", help="Carpeta de resultados")
+    parser.add_argument("--layout", help="Manifiesto de layout de la hoja (opcional)")
+    parser.add_argument("--alumnos", help="Lista de alumnos CSV para identificar cada hoja por su matrícula")
+    parser.add_argument("--variantes", help="Versiones barajadas del examen (variantes_*.npz); reemplaza la clave")
+    parser.add_argument("--almacen", help="Base SQLite de resultados en la que registrar las hojas (opcional)")
+    parser.add_argument("--examen", help="Nombre del examen en la base de resultados")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre revisiones")
+    parser.add_argument("--espera", type=float, default=3.0, help="Segundos sin cambios antes de calificar")
+    args = parser.parse_args()
+    if not args.clave and not args.variantes:
+        parser.error("se necesita --clave o --variantes")
+
+    calificador = CalificadorAutomatico()
+    if args.variantes:
+        if not calificador.cargar_variantes(args.variantes):
+            raise SystemExit(1)
+    elif not calificador.cargar_clave_desde_json(args.clave):
+        raise SystemExit(1)
+    if args.layout and not calificador.cargar_layout(args.layout):
+        raise SystemExit(1)
+    if args.alumnos and not calificador.cargar_lista_alumnos(args.alumnos):
+        raise SystemExit(1)
+
+    almacen = AlmacenResultados(args.almacen) if args.almacen else None
+
+    vigilante = VigilanteCarpeta(calificador, args.carpeta_entrada, args.salida,
+                                 intervalo=args.intervalo, espera_estable=args.espera,
+                                 almacen=almacen, examen=args.examen)
+    vigilante.ejecutar()